@@ -0,0 +1,51 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Throughput of the batch typechecking (programs per second) in the current process and with 1, 2, 4, ...
+worker processes up to the number of the cores. The batch consists of the examples
+(with the fibonacci template filled in) and generated chains of let-bound functions over records.
+
+Usage: python -m benchmarks.bench_batch [number of programs]
+"""
+import os
+import sys
+import time
+
+from benchmarks.common import EXAMPLES, numeral
+from src.batch import typecheck_batch
+
+
+def generated(i: int) -> str:
+    """ A chain of functions over records, each passing a wider record to the previous one. """
+    depth = i % 8 + 1
+    functions = "let g0 = \\r:{a:Nat, b:Bool}. {a = succ r.a, b = r.b} in " + "".join(
+        f"let g{k} = \\r:{{a:Nat, b:Bool}}. g{k - 1} {{a = r.a, b = iszero r.a, c = unit}} in "
+        for k in range(1, depth))
+    return f"{functions}(g{depth - 1} {{a = {numeral(i % 7)}, b = true}}).a"
+
+
+def sources(n: int) -> list[tuple[str, str]]:
+    examples = [(path.name, path.read_text().replace("{{input}}", numeral(5))) for path in sorted(EXAMPLES.glob("*.tl"))]
+    programs = examples + [(f"generated_{i}", generated(i)) for i in range(n - len(examples))]
+    return [programs[i % len(programs)] for i in range(n)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    batch = sources(n)
+    cores = os.cpu_count()
+    worker_counts = [0] + [w for w in [1, 2, 4, 8, 16, 32, 64] if w < cores] + [cores]
+    print(f"{n} programs, {cores} cores")
+    print(f"{'workers':>8} {'seconds':>8} {'programs/s':>11}")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        results = list(typecheck_batch(batch, workers))
+        elapsed = time.perf_counter() - start
+        assert len(results) == n
+        print(f"{workers:>8} {elapsed:8.3f} {n / elapsed:11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Compares the interpreter, the python code generator and a hand-written python version of `11_letrec_fibonacci.tl`.
+
+Usage: python -m benchmarks.bench_compiler
+"""
+from benchmarks.common import load_example, numeral, run_to_value, timed
+from src.semantics.compiler import PythonCompiler
+
+
+def plus(x: int, y: int) -> int:
+    return x if y == 0 else plus(x + 1, y - 1)
+
+
+def fib(i: int) -> int:
+    if i == 0:
+        return 0
+    if i - 1 == 0:
+        return 1
+    return plus(fib(i - 1), fib(i - 2))
+
+
+def main():
+    compiler = PythonCompiler()
+    print(f"{'n':>4} {'interpreter':>12} {'compiled':>12} {'python':>12} {'compiled/python':>16}")
+    for n in [5, 8, 12, 14, 16]:
+        program = load_example("11_letrec_fibonacci.tl", input=numeral(n))
+        compiled = compiler.compile(program)
+        interpreted = f"{timed(lambda: run_to_value(program), repeat=1)[0]:12.4f}" if n <= 8 else f"{'-':>12}"
+        compiled_time, _ = timed(compiled.run)
+        python_time, _ = timed(lambda: fib(n))
+        print(f"{n:>4} {interpreted} {compiled_time:12.4f} {python_time:12.4f} {compiled_time / python_time:16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Measures the cost of a single evaluation step for every kind of term handled by the rule table.
+The terms are small, so the time is dominated by finding the rule rather than by substitution.
+
+Usage: python -m benchmarks.bench_dispatch
+"""
+from benchmarks.common import load_program, timed
+from src.semantics.evaluator import TypedLambdaEvaluator
+
+PROGRAMS = {
+    "TmApp": "(\\x: Nat. x) 0",
+    "TmIf": "if true then 0 else succ 0",
+    "TmSucc": "succ (pred 0)",
+    "TmPred": "pred succ 0",
+    "TmIsZero": "iszero 0",
+    "TmLet": "let x = 0 in x",
+    "TmFix": "fix (\\x: Nat. 0)",
+    "TmRecord": "{a = 0, b = pred 0}",
+    "TmProjection": "{a = 0, b = true}.b",
+    "TmTagging": "<a = pred 0>",
+    "TmCase": "case <a = 0> of <a = x> => x | <b = y> => 0",
+    "TmReference": "ref 0",
+    "TmDereference": "!(ref 0)",
+    "TmAssignment": "(ref 0) := succ 0",
+}
+
+STEPS = 20_000
+
+
+def main():
+    print(f"{'term':<16} {'rule':<12} {'us/step':>8}")
+    for name, raw_program in PROGRAMS.items():
+        program = load_program(raw_program, typecheck=False)
+        evaluator = TypedLambdaEvaluator(program.name_context)
+        state = program.state
+        rule = evaluator.single_step(state).rule
+
+        def run():
+            for _ in range(STEPS):
+                evaluator.single_step(state)
+
+        best, _ = timed(run)
+        print(f"{name:<16} {str(rule):<12} {best / STEPS * 1e6:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
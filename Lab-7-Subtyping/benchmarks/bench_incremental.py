@@ -0,0 +1,87 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Single node edits in a generated program of ~50k nodes: a chain of let-bound functions
+    let f1 = \\x:Nat. if iszero x then succ (f0 (pred x)) else pred (f0 (succ x)) in ...
+where every edit swaps succ/pred in a random function.
+Compares typechecking every edited program from scratch with the IncrementalTypechecker.
+
+Usage: python -m benchmarks.bench_incremental
+"""
+import random
+import time
+
+from benchmarks.common import timed
+from src.lambda_program import TypedLambdaProgram, LambdaProgramState
+from src.semantics.incremental import IncrementalTypechecker
+from src.semantics.term_utils import term_replace_at, term_size
+from src.semantics.typechecker import TypedLambdaTypechecker
+from src.term import Term, TmAbs, TmApp, TmIf, TmIsZero, TmLet, TmPred, TmSucc, TmVar, TmZero, Info
+from src.type import BaseType
+
+INFO = Info.dummy_info()
+# path from a function (a let rvalue) to the `succ` of its `then` branch: abstraction body, if_true
+THEN_BRANCH = [0, 1]
+
+
+def function(depth: int) -> Term:
+    """ The function body sees `depth` let-bound functions and its argument (index 0). """
+    def call(arg: Term) -> Term:
+        return TmApp(INFO, TmVar(INFO, 1, depth + 1), arg)
+
+    x = TmVar(INFO, 0, depth + 1)
+    body = TmIf(INFO, TmIsZero(INFO, x), TmSucc(INFO, call(TmPred(INFO, x))), TmPred(INFO, call(TmSucc(INFO, x))))
+    return TmAbs(INFO, "x", BaseType.Nat, body)
+
+
+def program(functions: int) -> Term:
+    term = TmApp(INFO, TmVar(INFO, 0, functions + 1), TmZero(INFO))
+    for depth in reversed(range(1, functions + 1)):
+        term = TmLet(INFO, f"f{depth}", function(depth), term)
+    identity = TmAbs(INFO, "x", BaseType.Nat, TmVar(INFO, 0, 1))
+    return TmLet(INFO, "f0", identity, term)
+
+
+def edit(term: Term, rnd: random.Random, functions: int) -> Term:
+    position = rnd.randrange(1, functions + 1)
+    path = [1] * position + [0] + THEN_BRANCH
+    target = term
+    for step in path:
+        target = [target.rvalue, target.body][step] if isinstance(target, TmLet) else \
+            target.body if isinstance(target, TmAbs) else target.if_true
+    replacement = TmPred(INFO, target.number) if isinstance(target, TmSucc) else TmSucc(INFO, target.number)
+    return term_replace_at(term, path, replacement)
+
+
+def as_program(term: Term) -> TypedLambdaProgram:
+    return TypedLambdaProgram(LambdaProgramState(term), [])
+
+
+def measure(functions: int, edits: int) -> None:
+    rnd = random.Random(functions)
+    term = program(functions)
+    full, _ = timed(lambda: TypedLambdaTypechecker().typecheck(as_program(term)), repeat=1)
+    typechecker = IncrementalTypechecker()
+    first, _ = timed(lambda: typechecker.typecheck(as_program(term)), repeat=1)
+    incremental_time, rechecked = 0.0, 0
+    for _ in range(edits):
+        term = edit(term, rnd, functions)
+        start = time.perf_counter()
+        result = typechecker.typecheck(as_program(term))
+        incremental_time += time.perf_counter() - start
+        rechecked += typechecker.rechecked
+    assert result == TypedLambdaTypechecker().typecheck(as_program(term))
+    print(f"{functions:>9} {term_size(term):>7} {full:>10.3f} {first:>10.3f} "
+          f"{incremental_time / edits:>12.4f} {rechecked / edits:>10.1f}")
+
+
+def main():
+    print(f"{'functions':>9} {'nodes':>7} {'full':>10} {'first':>10} {'incremental':>12} {'rechecked':>10}")
+    for functions in [400, 1_600, 3_400]:
+        measure(functions, edits=50)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Times the subtyping lattice operations of the typechecker on random type trees of growing width
+(number of the record/variant fields) and depth, checking the lattice laws on the way:
+    - idempotence: a \\/ a = a and a /\\ a = a
+    - commutativity: a \\/ b and b \\/ a are equivalent (the same up to the order of the fields), the same for /\\
+    - bounds: a, b <: a \\/ b and a /\\ b <: a, b (if the meet exists)
+    - absorption: a \\/ (a /\\ b) = a (if the meet exists)
+    - witnesses: the subtyping flags returned with the join and meet agree with `_is_subtype`
+The second type of every pair is a random mutation of the first one (a widened, narrowed, reordered
+or retyped copy), so the operations don't stop at the top level. Every timed call uses a fresh typechecker,
+so the memo tables don't help (the best of 3 calls is taken). The pairs depend only on the seed, so the reports of different commits
+can be compared: the JSON report goes to the given file (or stdout), the table to stderr.
+
+Exits with status 1 if any of the laws is violated.
+
+Usage: python -m benchmarks.bench_lattice [report.json [baseline.json]]
+"""
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Optional
+
+from src.semantics.typechecker import TypedLambdaTypechecker
+from src.type import LambdaType, BaseType, ArrowType, RecordType, VariantType, ReferenceType, FieldMap
+
+SEED = 2021
+PAIRS = 200
+REPEAT = 3
+GRID = [(2, 1), (2, 4), (8, 1), (8, 3), (32, 1), (32, 2)]
+BASE_TYPES = [BaseType.Nat, BaseType.Bool, BaseType.Unit, BaseType.Top]
+
+# operation name -> (constructor required at the top level of both types or None, call)
+OPERATIONS: dict[str, tuple[Optional[type], Callable]] = {
+    'is_subtype': (None, lambda tc, a, b: tc._is_subtype(a, b)),
+    'join': (None, lambda tc, a, b: tc._join(a, b)),
+    'meet': (None, lambda tc, a, b: tc._meet(a, b)),
+    'join_arrows': (ArrowType, lambda tc, a, b: tc._join_arrows(a, b)),
+    'meet_arrows': (ArrowType, lambda tc, a, b: tc._meet_arrows(a, b)),
+    'join_records': (RecordType, lambda tc, a, b: tc._join_records(a, b)),
+    'meet_records': (RecordType, lambda tc, a, b: tc._meet_records(a, b)),
+    'join_variants': (VariantType, lambda tc, a, b: tc._join_variants(a, b)),
+    'meet_variants': (VariantType, lambda tc, a, b: tc._meet_variants(a, b)),
+}
+
+
+def random_type(rnd: random.Random, width: int, depth: int, constructor: Optional[type] = None) -> LambdaType:
+    if depth == 0:
+        return rnd.choice(BASE_TYPES)
+    constructor = constructor or rnd.choice([ArrowType, RecordType, RecordType, VariantType, VariantType,
+                                             ReferenceType])
+    if constructor is ArrowType:
+        return ArrowType(random_type(rnd, width, depth - 1), random_type(rnd, width, depth - 1))
+    if constructor is ReferenceType:
+        return ReferenceType(random_type(rnd, width, depth - 1))
+    labels = rnd.sample(range(2 * width), rnd.randint(1, width))
+    return constructor(FieldMap((f"l{l}", random_type(rnd, width, depth - 1)) for l in labels))
+
+
+def mutate(rnd: random.Random, t: LambdaType, width: int, depth: int) -> LambdaType:
+    """ A random variation of the type, sharing most of its structure. """
+    if rnd.random() < 0.3:
+        return t
+    match t:
+        case ArrowType(left, right):
+            return ArrowType(mutate(rnd, left, width, depth - 1), mutate(rnd, right, width, depth - 1))
+        case RecordType(fields) | VariantType(fields):
+            items = [(l, mutate(rnd, ft, width, depth - 1)) for l, ft in fields.items()]
+            if len(items) > 1 and rnd.random() < 0.3:
+                del items[rnd.randrange(len(items))]
+            if rnd.random() < 0.3:
+                label = f"l{rnd.randrange(2 * width)}"
+                if label not in fields:
+                    items.append((label, random_type(rnd, width, depth - 1)))
+            if rnd.random() < 0.3:
+                rnd.shuffle(items)
+            return type(t)(FieldMap(items))
+        case _:
+            return random_type(rnd, width, min(depth, 1))
+
+
+def type_size(t: LambdaType) -> int:
+    match t:
+        case ArrowType(left, right):
+            return 1 + type_size(left) + type_size(right)
+        case ReferenceType(stored):
+            return 1 + type_size(stored)
+        case RecordType(fields) | VariantType(fields):
+            return 1 + sum(type_size(ft) for ft in fields.values())
+        case _:
+            return 1
+
+
+def pairs(width: int, depth: int, constructor: Optional[type]) -> list[tuple[LambdaType, LambdaType]]:
+    rnd = random.Random(f"{SEED}-{width}-{depth}-{constructor and constructor.__name__}")
+    result = []
+    for _ in range(PAIRS):
+        t = random_type(rnd, width, depth, constructor)
+        result.append((t, mutate(rnd, t, width, depth)))
+    return result
+
+
+class LawChecker:
+    LAWS = ['idempotence', 'commutativity', 'bounds', 'absorption', 'witnesses']
+
+    def __init__(self):
+        self.checked = {law: 0 for law in self.LAWS}
+        self.violations: dict[str, list[list[str]]] = {law: [] for law in self.LAWS}
+        self.tc = TypedLambdaTypechecker()
+
+    def law(self, name: str, holds: bool, *types: Optional[LambdaType]) -> None:
+        self.checked[name] += 1
+        if not holds:
+            self.violations[name].append([str(t) for t in types])
+
+    def equivalent(self, a: Optional[LambdaType], b: Optional[LambdaType]) -> bool:
+        if a is None or b is None:
+            return a is b
+        return self.tc._is_subtype(a, b) and self.tc._is_subtype(b, a)
+
+    def check(self, a: LambdaType, b: LambdaType) -> None:
+        tc = self.tc
+        join, meet = tc._join(a, b), tc._meet(a, b)
+        self.law('idempotence', tc._join(a, a) is a and tc._meet(a, a) is a, a)
+        self.law('commutativity', self.equivalent(join, tc._join(b, a)) and self.equivalent(meet, tc._meet(b, a)),
+                 a, b)
+        self.law('bounds', tc._is_subtype(a, join) and tc._is_subtype(b, join), a, b, join)
+        if meet is not None:
+            self.law('bounds', tc._is_subtype(meet, a) and tc._is_subtype(meet, b), a, b, meet)
+            self.law('absorption', tc._join(a, meet) is a, a, b, meet)
+        relation = (tc._is_subtype(a, b), tc._is_subtype(b, a))
+        self.law('witnesses', tc._join_relate(a, b)[1:] == relation == tc._meet_relate(a, b)[1:], a, b)
+
+    def report(self) -> dict:
+        return {law: {'checked': self.checked[law], 'violations': len(self.violations[law]),
+                      'examples': self.violations[law][:3]} for law in self.LAWS}
+
+
+def measure(width: int, depth: int, laws: LawChecker) -> list[dict]:
+    rows = []
+    for operation, (constructor, call) in OPERATIONS.items():
+        cases = pairs(width, depth, constructor)
+        elapsed = 0
+        for a, b in cases:
+            best = None
+            for _ in range(REPEAT):
+                typechecker = TypedLambdaTypechecker()
+                start = time.perf_counter_ns()
+                call(typechecker, a, b)
+                best = min(best or float("inf"), time.perf_counter_ns() - start)
+            elapsed += best
+        rows.append({
+            'operation': operation,
+            'width': width,
+            'depth': depth,
+            'calls': len(cases),
+            'mean_size': round(sum(type_size(a) + type_size(b) for a, b in cases) / len(cases), 1),
+            'mean_us': round(elapsed / len(cases) / 1000, 3),
+        })
+    for a, b in pairs(width, depth, None):
+        laws.check(a, b)
+    return rows
+
+
+def main():
+    output = sys.argv[1] if len(sys.argv) > 1 else None
+    baseline = {}
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as file:
+            baseline = {(r['operation'], r['width'], r['depth']): r['mean_us'] for r in json.load(file)['results']}
+    laws = LawChecker()
+    results = []
+    print(f"{'operation':>14} {'width':>6} {'depth':>6} {'size':>7} {'mean us':>9} {'baseline':>9}", file=sys.stderr)
+    for width, depth in GRID:
+        for row in measure(width, depth, laws):
+            results.append(row)
+            before = baseline.get((row['operation'], width, depth))
+            ratio = f"{row['mean_us'] / before:8.2f}x" if before else f"{'-':>9}"
+            print(f"{row['operation']:>14} {width:>6} {depth:>6} {row['mean_size']:>7} {row['mean_us']:>9.2f} {ratio}",
+                  file=sys.stderr)
+    report = {
+        'seed': SEED,
+        'pairs': PAIRS,
+        'python': platform.python_version(),
+        'results': results,
+        'laws': laws.report(),
+    }
+    for law, summary in report['laws'].items():
+        print(f"{law}: {summary['checked']} checked, {summary['violations']} violated", file=sys.stderr)
+    if output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+    if any(summary['violations'] for summary in report['laws'].values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Compares call-by-value (TypedLambdaEvaluator) with call-by-need (CallByNeedEvaluator)
+on programs, where an expensive argument is unused or used many times.
+
+Usage: python -m benchmarks.bench_lazy
+"""
+from benchmarks.common import load_program, numeral, run_to_value, timed
+from src.semantics.lazy_evaluator import CallByNeedEvaluator
+
+PRELUDE = """
+letrec plus: Nat -> (Nat -> Nat) =
+    \\x: Nat. \\y: Nat. if iszero y then x else (plus succ x) (pred y)
+in
+letrec fib: Nat -> Nat =
+    \\i: Nat. if iszero i then 0 else if iszero pred i then succ 0 else (plus (fib pred i)) (fib pred pred i)
+in
+"""
+
+PROGRAMS = {
+    "unused argument": "((\\x: Nat. \\y: Nat. y) (fib {n})) 0",
+    "unused let": "let x = fib {n} in 0",
+    "argument used once": "(\\x: Nat. x) (fib {n})",
+    "argument used 3 times": "(\\x: Nat. (plus x) ((plus x) x)) (fib {n})",
+    "let used 4 times": "let x = fib {n} in (plus ((plus x) x)) ((plus x) x)",
+}
+
+
+def run_by_need(program) -> int:
+    evaluator = CallByNeedEvaluator()
+    evaluator.evaluate(program)
+    return evaluator.steps
+
+
+def main():
+    print(f"{'program':<24} {'n':>3} {'cbv steps':>10} {'cbn steps':>10} {'cbv time':>10} {'cbn time':>10}")
+    for name, template in PROGRAMS.items():
+        for n in [4, 6]:
+            program = load_program(PRELUDE + template.format(n=numeral(n)))
+            cbv_time, (_, cbv_steps) = timed(lambda: run_to_value(program), repeat=1)
+            cbn_time, cbn_steps = timed(lambda: run_by_need(program))
+            print(f"{name:<24} {n:>3} {cbv_steps:>10} {cbn_steps:>10} {cbv_time:>10.4f} {cbn_time:>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
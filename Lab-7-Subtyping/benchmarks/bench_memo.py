@@ -0,0 +1,52 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Compares the plain step by step evaluation of the fibonacci example with the memoizing evaluator.
+The memoization removes the recomputation of the recursive calls (the number of the hits grows linearly with n),
+but the numbers are unary: adding them takes a step per `succ` and the result alone has fib(n) nodes,
+so the steps still grow exponentially with n — linearly with fib(n), as the `memo/fib` column shows,
+while the plain evaluation needs an extra factor growing with n.
+Past the cutoffs of MemoizingEvaluator (`max_term_size` for the numbers added by `plus`, `max_nesting`)
+the big applications aren't memoized at all, so the larger n aren't measured.
+
+Usage: python -m benchmarks.bench_memo
+"""
+from benchmarks.common import load_example, numeral, run_to_value, timed
+from src.semantics.evaluator import NoEvalRuleApplies
+from src.semantics.memo import MemoizingEvaluator
+
+
+def run_memoized(program) -> tuple[MemoizingEvaluator, int]:
+    evaluator = MemoizingEvaluator(program.name_context)
+    state = program.state
+    steps = 0
+    while True:
+        try:
+            state = evaluator.single_step(state).new_state
+            steps += 1
+        except NoEvalRuleApplies:
+            return evaluator, steps + evaluator.nested_steps
+
+
+def fib(n: int) -> int:
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+def main():
+    print(f"{'n':>3} {'fib':>5} {'plain steps':>12} {'memo steps':>11} {'plain/fib':>10} {'memo/fib':>9} {'hits':>6} "
+          f"{'plain time':>11} {'memo time':>10}")
+    for n in [4, 6, 8, 10, 12]:
+        program = load_example("11_letrec_fibonacci.tl", input=numeral(n))
+        plain_time, (_, plain_steps) = timed(lambda: run_to_value(program), repeat=1)
+        memo_time, (evaluator, memo_steps) = timed(lambda: run_memoized(program), repeat=1)
+        print(f"{n:>3} {fib(n):>5} {plain_steps:>12} {memo_steps:>11} {plain_steps / fib(n):>10.1f} "
+              f"{memo_steps / fib(n):>9.1f} {evaluator.hits:>6} {plain_time:>11.3f} {memo_time:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
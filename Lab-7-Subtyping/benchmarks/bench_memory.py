@@ -0,0 +1,86 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Measures the cost of the memory operations: n allocations followed by n assignments,
+keeping every intermediate memory alive (as the transitions of an evaluation do).
+The tuple based store from before the persistent vector is included for the comparison,
+as well as the mutable memory (with and without the undo log).
+The second table evaluates a program allocating n cells and then updating the counter n times,
+without printing the trace (as `--trace none`, where main.py disables the undo log).
+
+Usage: python -m benchmarks.bench_memory
+"""
+from benchmarks.common import timed, load_program
+from src.memory import Memory, MutableMemory
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies
+from src.term import TmZero, TmUnit, TmStoreLocation, Info
+
+
+class TupleMemory:
+    """ The previous implementation: every update copies the whole tuple. """
+    def __init__(self, space: tuple = ()):
+        self.space = space
+
+    def put(self, term):
+        return TupleMemory(self.space + (term,)), TmStoreLocation(Info.dummy_info(), len(self.space))
+
+    def replace(self, location, term):
+        return TupleMemory(self.space[:location.address] + (term,) + self.space[location.address + 1:])
+
+
+def allocate_and_assign(memory, n: int) -> int:
+    history = [memory]
+    locations = []
+    for _ in range(n):
+        memory, location = memory.put(TmZero(Info.dummy_info()))
+        locations.append(location)
+        history.append(memory)
+    for location in locations:
+        memory = memory.replace(location, TmUnit(Info.dummy_info()))
+        history.append(memory)
+    return len(history)
+
+
+PROGRAM = "letrec double: Nat -> Nat = \\x:Nat. if iszero x then 0 else succ (succ (double (pred x))) in " \
+          "let r = ref 0 in letrec loop: Nat -> Nat = \\x:Nat. if iszero x then !r " \
+          "else (\\c:Ref Nat. (c := x); (r := succ !r); loop (pred x)) (ref 0) in loop ({n})"
+
+
+def evaluate(program, memory) -> int:
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state.replace_memory(memory)
+    steps = 0
+    while True:
+        try:
+            state = evaluator.single_step(state).new_state
+            steps += 1
+        except NoEvalRuleApplies:
+            return steps
+
+
+def main():
+    print(f"{'n':>7} {'persistent':>11} {'mutable':>8} {'undo log':>9} {'tuple':>9}")
+    for n in [1_000, 10_000, 100_000]:
+        persistent_time, _ = timed(lambda: allocate_and_assign(Memory(), n), repeat=1)
+        mutable_time, _ = timed(lambda: allocate_and_assign(MutableMemory(undo_log=False), n), repeat=1)
+        undo_time, _ = timed(lambda: allocate_and_assign(MutableMemory(undo_log=True), n), repeat=1)
+        if n <= 10_000:
+            tuple_time, _ = timed(lambda: allocate_and_assign(TupleMemory(), n), repeat=1)
+            tuple_column = f"{tuple_time:>9.3f}"
+        else:
+            tuple_column = f"{'(skipped)':>9}"
+        print(f"{n:>7} {persistent_time:>11.3f} {mutable_time:>8.3f} {undo_time:>9.3f} {tuple_column}")
+
+    print(f"\n{'n':>7} {'steps':>7} {'persistent':>11} {'mutable':>8} {'undo log':>9}")
+    for k in [4, 6, 7]:
+        program = load_program(PROGRAM.format(n="(double " * k + "(succ 0)" + ")" * k), typecheck=False)
+        persistent_time, steps = timed(lambda: evaluate(program, Memory()))
+        mutable_time, _ = timed(lambda: evaluate(program, MutableMemory(undo_log=False)))
+        undo_time, _ = timed(lambda: evaluate(program, MutableMemory(undo_log=True)))
+        print(f"{1 << k:>7} {steps:>7} {persistent_time:>11.3f} {mutable_time:>8.3f} {undo_time:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
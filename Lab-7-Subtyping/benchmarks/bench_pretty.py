@@ -0,0 +1,42 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Measures the pretty printer on terms with d nested binders (all referring to the outermost one)
+and on long `succ` towers. The time per node should stay (roughly) constant as d grows.
+
+Usage: python -m benchmarks.bench_pretty
+"""
+from benchmarks.common import timed
+from src.lambda_program import LambdaProgramState
+from src.term import TmAbs, TmVar, TmSucc, TmZero, Info
+from src.type import BaseType
+
+
+def nested_binders(depth: int) -> LambdaProgramState:
+    info = Info.dummy_info()
+    term = TmVar(info, depth - 1, depth)
+    for i in reversed(range(depth)):
+        term = TmAbs(info, f"x{i}", BaseType.Nat, term)
+    return LambdaProgramState(term)
+
+
+def succ_tower(height: int) -> LambdaProgramState:
+    info = Info.dummy_info()
+    term = TmZero(info)
+    for _ in range(height):
+        term = TmSucc(info, term)
+    return LambdaProgramState(term)
+
+
+def main():
+    print(f"{'shape':>8} {'nodes':>7} {'time':>8} {'us/node':>8}")
+    for depth in [1_000, 4_000, 16_000]:
+        for shape, state in [("binders", nested_binders(depth)), ("succ", succ_tower(depth))]:
+            time, _ = timed(lambda: state.pretty_str([]))
+            print(f"{shape:>8} {depth:>7} {time:>8.3f} {time / depth * 1e6:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
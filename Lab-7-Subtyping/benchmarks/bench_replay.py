@@ -0,0 +1,45 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Compares the sizes of the binary trace storing all the states and the replayable trace storing
+only the paths to the redexes, and measures the random access to the states of the replayable trace.
+
+Usage: python -m benchmarks.bench_replay
+"""
+import os
+import random
+import tempfile
+
+from benchmarks.bench_trace import run_binary, run
+from benchmarks.common import load_example, numeral, timed
+from src.replay_trace import ReplayTraceWriter, TraceReplayer
+
+
+def run_replayable(program, path: str, keyframe_interval: int) -> int:
+    with ReplayTraceWriter.open(path, keyframe_interval) as writer:
+        return run(program, writer)
+
+
+def main():
+    program = load_example("11_letrec_fibonacci.tl", input=numeral(10))
+    with tempfile.TemporaryDirectory() as directory:
+        states_path = os.path.join(directory, "trace.bin")
+        steps = run_binary(program, states_path)
+        print(f"steps: {steps}, all states: {os.path.getsize(states_path)} bytes")
+        print(f"{'keyframes':>9} {'size':>8} {'bytes/step':>10} {'write':>7} {'random state_at':>16}")
+        replay_path = os.path.join(directory, "trace.rpl")
+        for keyframe_interval in [64, 256, 1024, 4096]:
+            write_time, _ = timed(lambda: run_replayable(program, replay_path, keyframe_interval), repeat=1)
+            size = os.path.getsize(replay_path)
+            with open(replay_path, "rb") as file:
+                replayer = TraceReplayer(file)
+                targets = [random.randrange(steps) for _ in range(20)]
+                access_time, _ = timed(lambda: [replayer.state_at(k) for k in targets], repeat=1)
+            print(f"{keyframe_interval:>9} {size:>8} {size / steps:>10.2f} {write_time:>7.3f} "
+                  f"{access_time / len(targets):>16.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Measures subtyping, join and meet of wide records and variants (thousands of labels, in shuffled orders)
+nested `depth` times, with the merge based typechecker and with the previous algorithm, which probes
+the fields one by one and checks the subtyping in both directions before every join/meet.
+Every query uses a fresh typechecker, so the memo tables don't help across the repetitions.
+
+Shapes:
+    - width: the left type has all the labels of the right one (plus the other half)
+    - conflict: both types have the same labels, the last nested field is Nat on the left and Bool on the right
+
+Usage: python -m benchmarks.bench_subtyping
+"""
+import random
+
+from benchmarks.common import timed
+from src.semantics.typechecker import TypedLambdaTypechecker, Lattice
+from src.type import LambdaType, BaseType, ArrowType, RecordType, VariantType, FieldMap
+
+
+class ProbingTypechecker(TypedLambdaTypechecker):
+    """ The previous algorithm: dictionary probing and the subtyping checks preceding the structural work. """
+    def _is_subtype_record(self, sub_cases: FieldMap, super_cases: FieldMap) -> bool:
+        return all(l in sub_cases and self._is_subtype(sub_cases[l], t) for l, t in super_cases.items())
+
+    def _is_subtype_variant(self, sub_cases: FieldMap, super_cases: FieldMap) -> bool:
+        return all(l in super_cases and self._is_subtype(t, super_cases[l]) for l, t in sub_cases.items())
+
+    def _join_relate(self, left: LambdaType, right: LambdaType) -> Lattice:
+        is_sub, is_super = self._is_subtype(left, right), self._is_subtype(right, left)
+        if is_sub:
+            return right, True, is_super
+        if is_super:
+            return left, False, True
+        match (left, right):
+            case (ArrowType(), ArrowType()):
+                meet = self._meet(left.left, right.left)
+                join = BaseType.Top if meet is None else ArrowType(meet, self._join(left.right, right.right))
+            case (RecordType(ls), RecordType(rs)):
+                join = RecordType(FieldMap((l, self._join(t, rs[l])) for l, t in ls.items() if l in rs))
+            case (VariantType(ls), VariantType(rs)):
+                cases = [(l, self._join(t, rs[l]) if l in rs else t) for l, t in ls.items()]
+                join = VariantType(FieldMap(cases + [(l, t) for l, t in rs.items() if l not in ls]))
+            case _:
+                join = BaseType.Top
+        return join, False, False
+
+    def _meet_relate(self, left: LambdaType, right: LambdaType) -> Lattice:
+        is_sub, is_super = self._is_subtype(left, right), self._is_subtype(right, left)
+        if is_sub:
+            return left, True, is_super
+        if is_super:
+            return right, False, True
+        match (left, right):
+            case (ArrowType(), ArrowType()):
+                meet = self._meet(left.right, right.right)
+                meet = None if meet is None else ArrowType(self._join(left.left, right.left), meet)
+            case (RecordType(ls), RecordType(rs)):
+                fields = [(l, self._meet(t, rs[l]) if l in rs else t) for l, t in ls.items()]
+                fields += [(l, t) for l, t in rs.items() if l not in ls]
+                meet = None if any(t is None for _, t in fields) else RecordType(FieldMap(fields))
+            case (VariantType(ls), VariantType(rs)):
+                cases = [(l, self._meet(t, rs[l])) for l, t in ls.items() if l in rs]
+                meet = None if any(t is None for _, t in cases) else VariantType(FieldMap(cases))
+            case _:
+                meet = None
+        return meet, False, False
+
+
+def nested(constructor, labels: list[str], depth: int, leaf: LambdaType, rnd: random.Random) -> LambdaType:
+    """ A type with the given labels (shuffled), the last one nests the same shape `depth` times. """
+    t = leaf
+    for _ in range(depth + 1):
+        fields = [(l, BaseType.Nat) for l in labels[:-1]]
+        rnd.shuffle(fields)
+        t = constructor(FieldMap(fields + [(labels[-1], t)]))
+    return t
+
+
+def pairs(width: int, depth: int) -> dict[str, tuple[LambdaType, LambdaType]]:
+    rnd = random.Random(width * 31 + depth)
+    labels = [f"l{i}" for i in range(width)]
+    half = labels[1::2]
+    return {
+        "record width": (nested(RecordType, labels, depth, BaseType.Nat, rnd),
+                         nested(RecordType, half, depth, BaseType.Nat, rnd)),
+        "record conflict": (nested(RecordType, labels, depth, BaseType.Nat, rnd),
+                            nested(RecordType, labels, depth, BaseType.Bool, rnd)),
+        "variant width": (nested(VariantType, half, depth, BaseType.Nat, rnd),
+                          nested(VariantType, labels, depth, BaseType.Nat, rnd)),
+        "variant conflict": (nested(VariantType, labels, depth, BaseType.Nat, rnd),
+                             nested(VariantType, labels, depth, BaseType.Bool, rnd)),
+    }
+
+
+def main():
+    print(f"{'shape':<17} {'width':>6} {'depth':>6} {'operation':>10} {'merge':>8} {'probing':>8}")
+    for width, depth in [(1_000, 0), (4_000, 0), (1_000, 4), (100, 30)]:
+        for shape, (left, right) in pairs(width, depth).items():
+            for operation in ["_is_subtype", "_join", "_meet"]:
+                times = []
+                for typechecker in [TypedLambdaTypechecker, ProbingTypechecker]:
+                    time, _ = timed(lambda: getattr(typechecker(), operation)(left, right))
+                    times.append(time)
+                print(f"{shape:<17} {width:>6} {depth:>6} {operation.strip('_'):>10} "
+                      f"{times[0]:>8.4f} {times[1]:>8.4f}")
+
+
+if __name__ == '__main__':
+    main()
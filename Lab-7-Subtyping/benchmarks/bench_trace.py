@@ -0,0 +1,62 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Compares the evaluation of the fibonacci example without a trace, with the textual trace
+(printed to /dev/null) and with the binary trace written to a temporary file.
+
+Usage: python -m benchmarks.bench_trace
+"""
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+from benchmarks.common import load_example, numeral, timed
+from src.binary_trace import BinaryTraceWriter
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies
+from src.trace import TracePrinter
+
+
+def run(program, sink) -> int:
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    if sink is not None:
+        sink.program(program)
+    steps = 0
+    while True:
+        try:
+            transition = evaluator.single_step(state)
+        except NoEvalRuleApplies:
+            return steps
+        if sink is not None:
+            sink.transition(transition)
+        state = transition.new_state
+        steps += 1
+
+
+def run_printed(program) -> int:
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        return run(program, TracePrinter())
+
+
+def run_binary(program, path: str) -> int:
+    with BinaryTraceWriter.open(path) as writer:
+        return run(program, writer)
+
+
+def main():
+    print(f"{'n':>3} {'steps':>6} {'no trace':>9} {'text':>8} {'binary':>8} {'file size':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.bin")
+        for n in [4, 6, 8]:
+            program = load_example("11_letrec_fibonacci.tl", input=numeral(n))
+            plain_time, steps = timed(lambda: run(program, None))
+            text_time, _ = timed(lambda: run_printed(program))
+            binary_time, _ = timed(lambda: run_binary(program, path))
+            print(f"{n:>3} {steps:>6} {plain_time:>9.3f} {text_time:>8.3f} {binary_time:>8.3f} "
+                  f"{os.path.getsize(path):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Typechecks generated chains of n nested lets (let x0 = 0 in let x1 = succ x0 in ... in x{n-1})
+with the persistent TypeContext and with a context copying the list of types at every binder.
+
+Usage: python -m benchmarks.bench_type_context
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from benchmarks.common import timed
+from src.semantics.typechecker import TypedLambdaTypechecker, TypeContext
+from src.term import Term, TmLet, TmVar, TmSucc, TmZero, Info
+from src.type import LambdaType
+
+
+class CopyingTypeContext:
+    """ The list based context: every extension copies all the types. """
+    def __init__(self, context: list[LambdaType]):
+        self._context = context
+
+    def type_of(self, index: int) -> Optional[LambdaType]:
+        return self._context[index] if index < len(self._context) else None
+
+    def extend_with_type(self, type: LambdaType) -> CopyingTypeContext:
+        return CopyingTypeContext([type] + self._context)
+
+
+def let_chain(n: int) -> Term:
+    info = Info.dummy_info()
+    term = TmVar(info, 0, n)
+    for i in reversed(range(1, n)):
+        term = TmLet(info, f"x{i}", TmSucc(info, TmVar(info, 0, i)), term)
+    return TmLet(info, "x0", TmZero(info), term)
+
+
+def main():
+    print(f"{'n':>6} {'persistent':>11} {'copying':>9}")
+    for n in [1_000, 2_500, 5_000, 10_000]:
+        term = let_chain(n)
+        typechecker = TypedLambdaTypechecker()
+        persistent, _ = timed(lambda: typechecker._typecheck(term, TypeContext.empty()))
+        copying, _ = timed(lambda: typechecker._typecheck(term, CopyingTypeContext([])))
+        print(f"{n:>6} {persistent:>11.3f} {copying:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
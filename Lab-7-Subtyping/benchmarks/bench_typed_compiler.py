@@ -0,0 +1,47 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+"""
+Compares the python code generated without and with the types of the subterms (PythonCompiler.specialize)
+on the record example projecting from a wider record and on a loop projecting from records of the exact (`loop`)
+and of a wider (`loop+extra`) layout. Each generated `_main` is called repeatedly (the best of 7 runs is taken),
+the `emit` columns time the code generation, which with `specialize` also typechecks the program again.
+
+Usage: python -m benchmarks.bench_typed_compiler
+"""
+from benchmarks.common import load_example, load_program, numeral, timed
+from src.semantics.compiler import PythonCompiler, RUNTIME
+
+LOOP = "letrec loop: {{n:Nat, acc:Nat}} -> Nat = \\s:{{n:Nat, acc:Nat}}. if iszero s.n then s.acc " \
+       "else loop {{n = pred s.n, acc = succ succ s.acc{extra}}} in loop {{n = {n}, acc = 0{extra}}}"
+
+
+def main_function(compiler: PythonCompiler, program):
+    namespace = dict(RUNTIME)
+    exec(compile(compiler.emit(program), "<lambda program>", "exec"), namespace)
+    return namespace['_main']
+
+
+def main():
+    programs = [("12_record", load_example("12_record.tl"), 200_000)]
+    programs.append(("loop", load_program(LOOP.format(n=numeral(50), extra="")), 20_000))
+    programs.append(("loop+extra", load_program(LOOP.format(n=numeral(50), extra=", extra = unit")), 20_000))
+    print(f"{'program':>12} {'calls':>7} {'generic':>9} {'typed':>9} {'speedup':>8} {'emit':>9} {'typed emit':>11}")
+    for name, program, calls in programs:
+        generic, typed = (main_function(PythonCompiler(specialize=specialize), program) for specialize in [False, True])
+        assert generic() == typed()
+
+        def run(f):
+            return lambda: [f() for _ in range(calls)]
+
+        generic_time, _ = timed(run(generic), repeat=7)
+        typed_time, _ = timed(run(typed), repeat=7)
+        emit_time, _ = timed(lambda: PythonCompiler(specialize=False).emit(program), repeat=7)
+        typed_emit_time, _ = timed(lambda: PythonCompiler(specialize=True).emit(program), repeat=7)
+        print(f"{name:>12} {calls:>7} {generic_time:9.4f} {typed_time:9.4f} {generic_time / typed_time:8.2f} "
+              f"{emit_time:9.5f} {typed_emit_time:11.5f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Callable
+
+from src.lambda_program import TypedLambdaProgram, LambdaProgramState
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies
+from src.semantics.macro import MacroSystem
+from src.semantics.typechecker import TypedLambdaTypechecker
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+def numeral(n: int) -> str:
+    return "succ " * n + "0"
+
+
+def load_program(raw_program: str, typecheck: bool = True) -> TypedLambdaProgram:
+    ast = TypedLambdaParser().parse(raw_program)
+    program = MacroSystem().expand(DebruijnIndexer().remove_names(ast))
+    if typecheck:
+        TypedLambdaTypechecker().typecheck(program)
+    return program
+
+
+def load_example(name: str, **template) -> TypedLambdaProgram:
+    raw_program = (EXAMPLES / name).read_text()
+    for key, value in template.items():
+        raw_program = raw_program.replace("{{" + key + "}}", value)
+    return load_program(raw_program)
+
+
+def run_to_value(program: TypedLambdaProgram) -> tuple[LambdaProgramState, int]:
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    steps = 0
+    while True:
+        try:
+            state = evaluator.single_step(state).new_state
+            steps += 1
+        except NoEvalRuleApplies:
+            return state, steps
+
+
+def timed(f: Callable[[], object], repeat: int = 3) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
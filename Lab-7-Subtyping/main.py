@@ -3,6 +3,8 @@
 #     It would be nice however if you mentioned me somewhere.
 #     Still, no pressure - have a nice day!
 
+import json
+
 import click
 from typing import TextIO
 
@@ -12,60 +14,184 @@ from src.semantics.typechecker import LambdaTypeError, TypedLambdaTypechecker
 from src.parser import TypedLambdaParser
 from src.semantics.debruijn_indexer import DebruijnIndexer
 from src.sprdpl.parse import ParseError
-from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies, Transition
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies, EvaluationBudgetExceeded, Diverges
 from src.lambda_program import TypedLambdaProgram
+from src.semantics.compiler import PythonCompiler, CompilationError
+from src.semantics.lazy_evaluator import CallByNeedEvaluator, LazyEvaluationError
+from src.semantics.stats import EvalStats
+from src.semantics.memo import MemoizingEvaluator
+from src.semantics.cycles import CycleDetector
+from src.semantics.store_gc import StoreCollector
+from src.memory import MutableMemory
+from src.trace import TracePrinter, SampledTracePrinter
+from src.binary_trace import BinaryTraceWriter
+from src.replay_trace import ReplayTraceWriter
 
 
-def evaluate(program: TypedLambdaProgram):
-    evaluator = TypedLambdaEvaluator(program.name_context)
+def evaluate(program: TypedLambdaProgram, evaluator: TypedLambdaEvaluator, stats: EvalStats | None = None,
+             detector: CycleDetector | None = None, collector: StoreCollector | None = None,
+             printer: TracePrinter | SampledTracePrinter | BinaryTraceWriter | ReplayTraceWriter | None = None):
+    if printer is None:
+        printer = TracePrinter()
     current_state = program.state
-    print(program)
+    printer.program(program)
+    if stats is not None:
+        stats.observe_state(current_state)
     while True:
         try:
+            if detector is not None:
+                detector.observe(current_state)
             transition = evaluator.single_step(current_state)
-            print_transition(transition)
+            printer.transition(transition)
             current_state = transition.new_state
+            if stats is not None:
+                stats.record(transition)
+            if collector is not None:
+                current_state = collector.step(current_state)
         except NoEvalRuleApplies:
             if term_is_val(current_state.term):
-                print("---- finished successfully")
+                printer.message("---- finished successfully")
             else:
-                print("---- stuck")
+                printer.message("---- stuck")
+            return
+        except EvaluationBudgetExceeded as ebe:
+            printer.message(f"---- out of memory: {ebe}")
             return
+        except Diverges as d:
+            printer.message(f"---- diverges: {d}")
+            return
+
+
+def evaluate_with_stats(program: TypedLambdaProgram, evaluator: TypedLambdaEvaluator,
+                        detector: CycleDetector | None = None, collector: StoreCollector | None = None,
+                        printer: TracePrinter | SampledTracePrinter | BinaryTraceWriter | ReplayTraceWriter | None = None):
+    stats = EvalStats()
+    with stats.tracking():
+        evaluate(program, evaluator, stats, detector, collector, printer)
+    print(json.dumps(stats.report(), indent=2))
+
+def evaluate_by_need(program: TypedLambdaProgram):
+    evaluator = CallByNeedEvaluator()
+    print(program)
+    result = evaluator.evaluate(program)
+    print(f"-> {result.pretty_str([])}  [CallByNeed: {evaluator.steps} steps]")
+    print("---- finished successfully")
 
-def print_transition(t: Transition):
-    print(f'-> {t.new_state.pretty_str(t.name_context)}  [{t.rule.name}]')
-    print_witnesses(t)
 
+def run_compiled(program: TypedLambdaProgram, emit_python: bool):
+    compiler = PythonCompiler()
+    if emit_python:
+        print(compiler.emit(program))
+    print(program)
+    result = compiler.run(program)
+    if result is None:
+        print("-> <function>  [Compiled]")
+    else:
+        print(f"-> {result.pretty_str([])}  [Compiled]")
+    print("---- finished successfully")
 
-def print_witnesses(t: Transition, level: int = 0):
-    if len(t.witnesses) == 0:
-        return
 
-    tab = "   " * (level + 1)
-    deriv_symb = "|: "
-    for witness in t.witnesses:
-        print(f"{tab}{deriv_symb}{witness.old_state.pretty_str(witness.name_context)} -> {witness.new_state.pretty_str(witness.name_context)}  [{witness.rule.name}]")
-        print_witnesses(witness, level + 1)
+def parse_trace_spec(ctx, param, value: str) -> str:
+    try:
+        SampledTracePrinter.from_spec(value, TracePrinter())
+    except ValueError as ve:
+        raise click.BadParameter(str(ve))
+    return value
 
 
-def typecheck(parsing_result: TypedLambdaProgram):
-    TypedLambdaTypechecker().typecheck(parsing_result)
+def typecheck(parsing_result: TypedLambdaProgram, memo_stats: bool = False):
+    typechecker = TypedLambdaTypechecker()
+    typechecker.typecheck(parsing_result)
+    if memo_stats:
+        print(f"---- typecheck memo: {typechecker.memo_stats()}")
 
 
 @click.command()
 @click.argument('file', type=click.File('r'))
-def evaluate_file(file: TextIO) -> None:
+@click.option('--compile', 'compiled', is_flag=True, help='Run the program through the python code generator.')
+@click.option('--emit-python', is_flag=True, help='Print the python source generated for the program.')
+@click.option('--strategy', type=click.Choice(['value', 'need']), default='value',
+              help='Evaluation strategy: call-by-value (step by step) or call-by-need (pure programs only).')
+@click.option('--stack-budget', type=click.IntRange(min=1), default=1_000_000,
+              help='Maximal number of nested evaluation contexts in a single step.')
+@click.option('--stats', is_flag=True, help='Print evaluation statistics (as JSON) after the step by step evaluation.')
+@click.option('--memoize', is_flag=True, help='Memoize applications of closed, pure functions to values.')
+@click.option('--memo-size', type=click.IntRange(min=1), default=4096,
+              help='Maximal number of memoized applications (and 64 times more hash-consed term nodes).')
+@click.option('--detect-cycles', type=click.Choice(['off'] + list(CycleDetector.MODES)), default='off',
+              help='Stop the evaluation when a state repeats: remembering all states, with Brent\'s algorithm '
+                   'or a bounded sample of the states.')
+@click.option('--gc-interval', type=click.IntRange(min=0), default=0,
+              help='Collect unreachable memory cells every N steps (the addresses get compacted), 0 turns it off.')
+@click.option('--store', type=click.Choice(['persistent', 'mutable']), default='persistent',
+              help='Memory implementation: immutable or updated in place (old states are rebuilt from an undo log, '
+                   'kept only if the trace needs them).')
+@click.option('--trace-memory', type=click.Choice(list(TracePrinter.MEMORY_MODES)), default='full',
+              help='Print the whole memory in every state, or only the cells changed by each step.')
+@click.option('--trace-file', type=click.Path(dir_okay=False, writable=True),
+              help='Write the trace to a binary file instead of printing it (see render_trace.py).')
+@click.option('--trace-format', type=click.Choice(['states', 'replay']), default='states',
+              help='Format of the trace file: all the states (render_trace.py) '
+                   'or only the paths to the redexes with periodic keyframes (replay_trace.py).')
+@click.option('--keyframe-interval', type=click.IntRange(min=1), default=1024,
+              help='Number of steps between the keyframes of a replayable trace.')
+@click.option('--trace', default='full', callback=parse_trace_spec,
+              help='Which transitions to print: none, final, every:N, tail:K or full.')
+@click.option('--typecheck-stats', is_flag=True,
+              help='Print hit rates of the memoized subtyping checks, joins and meets.')
+def evaluate_file(file: TextIO, compiled: bool, emit_python: bool, strategy: str, stack_budget: int,
+                  stats: bool, memoize: bool, memo_size: int, detect_cycles: str, gc_interval: int,
+                  store: str, trace_memory: str, trace_file: str | None, trace_format: str,
+                  keyframe_interval: int, trace: str, typecheck_stats: bool) -> None:
     raw_program = file.read()
     try:
         ast = TypedLambdaParser().parse(raw_program)
         program = DebruijnIndexer().remove_names(ast)
         expanded_program = MacroSystem().expand(program)
-        typecheck(expanded_program)
-        evaluate(expanded_program)
+        typecheck(expanded_program, typecheck_stats)
+        if compiled or emit_python:
+            run_compiled(expanded_program, emit_python)
+        elif strategy == 'need':
+            evaluate_by_need(expanded_program)
+        else:
+            if memoize:
+                evaluator = MemoizingEvaluator(expanded_program.name_context, stack_budget, memo_size)
+            else:
+                evaluator = TypedLambdaEvaluator(expanded_program.name_context, stack_budget)
+            detector = CycleDetector(detect_cycles) if detect_cycles != 'off' else None
+            collector = StoreCollector(gc_interval) if gc_interval else None
+            if not trace_file:
+                printer = SampledTracePrinter.from_spec(trace, TracePrinter(trace_memory))
+            elif trace_format == 'replay':
+                printer = ReplayTraceWriter.open(trace_file, keyframe_interval)
+            else:
+                printer = BinaryTraceWriter.open(trace_file)
+            if store == 'mutable':
+                # the undo log rebuilds the states from before the steps, only the printers reading them need it
+                # (the replayable trace reads the state before a step, when the memory was collected before it)
+                undo_log = printer.reads_old_states or collector is not None and trace_format == 'replay'
+                mutable_state = expanded_program.state.replace_memory(MutableMemory(undo_log=undo_log))
+                expanded_program = TypedLambdaProgram(mutable_state, expanded_program.name_context)
+            try:
+                if stats:
+                    evaluate_with_stats(expanded_program, evaluator, detector, collector, printer)
+                else:
+                    evaluate(expanded_program, evaluator, detector=detector, collector=collector, printer=printer)
+            finally:
+                if trace_file:
+                    printer.close()
+            if memoize:
+                print(f"---- memo: {evaluator.memo_stats()}")
+            if collector is not None:
+                print(f"---- gc: {collector.gc_stats()}")
     except ParseError as pe:
         pe.print()
     except LambdaTypeError as lte:
         print(lte)
+    except CompilationError as ce:
+        print(ce)
+    except LazyEvaluationError as lee:
+        print(lee)
 
 
 if __name__ == '__main__':
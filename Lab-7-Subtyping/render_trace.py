@@ -0,0 +1,34 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+import click
+
+from src.binary_trace import read_trace, TraceFormatError
+from src.lambda_program import TypedLambdaProgram
+from src.semantics.evaluator import Transition
+from src.trace import TracePrinter
+
+
+@click.command()
+@click.argument('file', type=click.File('rb'))
+@click.option('--trace-memory', type=click.Choice(list(TracePrinter.MEMORY_MODES)), default='full',
+              help='Print the whole memory in every state, or only the cells changed by each step.')
+def render_trace(file, trace_memory: str) -> None:
+    printer = TracePrinter(trace_memory)
+    try:
+        for record in read_trace(file):
+            match record:
+                case TypedLambdaProgram():
+                    printer.program(record)
+                case Transition():
+                    printer.transition(record)
+                case str():
+                    printer.message(record)
+    except TraceFormatError as tfe:
+        print(tfe)
+
+
+if __name__ == '__main__':
+    render_trace()
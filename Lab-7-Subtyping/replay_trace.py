@@ -0,0 +1,38 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+import click
+
+from src.binary_trace import TraceFormatError
+from src.lambda_program import TypedLambdaProgram
+from src.replay_trace import TraceReplayer, ReplayError
+from src.trace import TracePrinter
+
+
+@click.command()
+@click.argument('file', type=click.File('rb'))
+@click.option('--step', type=click.IntRange(min=0), help='Print only the state before the given step.')
+@click.option('--trace-memory', type=click.Choice(list(TracePrinter.MEMORY_MODES)), default='full',
+              help='Print the whole memory in every state, or only the cells changed by each step.')
+def replay_trace(file, step: int | None, trace_memory: str) -> None:
+    try:
+        replayer = TraceReplayer(file)
+        if step is not None:
+            print(replayer.state_at(min(step, replayer.steps)).pretty_str(replayer.name_context))
+            return
+        printer = TracePrinter(trace_memory)
+        for k, state in enumerate(replayer.states()):
+            if k == 0:
+                printer.program(TypedLambdaProgram(state, replayer.name_context))
+            if k < replayer.steps:
+                printer.transition(replayer.evaluator.single_step(state))
+        for message in replayer.messages:
+            printer.message(message)
+    except (TraceFormatError, ReplayError) as error:
+        print(error)
+
+
+if __name__ == '__main__':
+    replay_trace()
@@ -0,0 +1,92 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+from __future__ import annotations
+
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.macro import MacroSystem
+from src.semantics.typechecker import TypedLambdaTypechecker, LambdaTypeError
+from src.sprdpl.parse import ParseError
+from src.term import TermBuildingError
+from src.type import TypeBuildingError
+
+'''
+Typechecking of many independent programs. A source is a pair (name, program text),
+its result is a JSON serializable dictionary with the name and either:
+- `type`: the printed type of the program
+- `error`: "parse" with `msg`, `line` and `column`
+- `error`: "term" with `msg`, `line` and `column` (see TermBuildingError and TypeBuildingError,
+  e.g. a repeated label of a record or of a record type)
+- `error`: "recursion" with `msg`, when the program is nested deeper than the python recursion limit
+- `error`: "type" with `error_type`, `msg`, `term`, `type_context` and `position` (see LambdaTypeError)
+'''
+
+Source = tuple[str, str]
+
+# parser and typechecker of the current process, created once by `init_worker`
+_parser: Optional[TypedLambdaParser] = None
+_typechecker: Optional[TypedLambdaTypechecker] = None
+
+
+def init_worker() -> None:
+    global _parser, _typechecker
+    _parser = TypedLambdaParser()
+    _typechecker = TypedLambdaTypechecker()
+    _parser.parse("(\\x:Nat. x) 0")
+
+
+def typecheck_source(name: str, raw_program: str) -> dict:
+    if _parser is None:
+        init_worker()
+    try:
+        program = MacroSystem().expand(DebruijnIndexer().remove_names(_parser.parse(raw_program)))
+        return {'name': name, 'type': str(_typechecker.typecheck(program))}
+    except ParseError as pe:
+        info = pe.info or pe.tokenizer.get_next_info()
+        return {'name': name, 'error': 'parse', 'msg': pe.msg, 'line': info.lineno, 'column': info.column}
+    except (TermBuildingError, TypeBuildingError) as be:
+        return {'name': name, 'error': 'term', 'msg': be.msg, 'line': be.info.lineno, 'column': be.info.column}
+    except LambdaTypeError as lte:
+        return {'name': name, 'error': 'type', 'error_type': lte.error_type.name, 'msg': lte.msg,
+                'term': str(lte.term), 'type_context': str(lte.type_context), 'position': str(lte.term.info)}
+    except RecursionError:
+        return {'name': name, 'error': 'recursion',
+                'msg': f"the program is nested too deeply (python recursion limit: {sys.getrecursionlimit()})"}
+
+
+def _typecheck_chunk(sources: list[Source]) -> list[dict]:
+    return [typecheck_source(name, raw_program) for name, raw_program in sources]
+
+
+def typecheck_batch(sources: Iterable[Source], workers: int, chunk_size: int = 8) -> Iterator[dict]:
+    """
+    Typechecks the programs in a pool of worker processes, each with its own pre-built parser.
+    Results are yielded in the order of the sources, as soon as all the preceding ones are ready.
+    The sources are read lazily: at most two chunks per worker are in flight.
+
+    :param sources: pairs (name, program text)
+    :param workers: number of the worker processes, 0 typechecks in the current process
+    :param chunk_size: number of the programs sent to a worker at once
+    :return: iterator over the results (see the module description)
+    """
+    if workers == 0:
+        for name, raw_program in sources:
+            yield typecheck_source(name, raw_program)
+        return
+    sources = iter(sources)
+    with ProcessPoolExecutor(workers, initializer=init_worker) as executor:
+        pending: deque[Future] = deque()
+        while chunk := list(islice(sources, chunk_size)):
+            pending.append(executor.submit(_typecheck_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,327 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+from __future__ import annotations
+
+import io
+import pickle
+import struct
+from typing import BinaryIO, Iterator
+
+from src.lambda_program import LambdaProgramState, TypedLambdaProgram
+from src.memory import Memory, MutableMemory
+from src.semantics.evaluator import Transition, eval_rule
+from src.semantics.term_utils import term_children, term_rebuild
+from src.term import BaseTerm, Term
+
+'''
+Binary trace format (little endian):
+- header: magic `LTRC` and the format version (u16)
+- records, each starting with a single byte tag:
+    - `S` state: payload length (u32) and the encoded state (see StateEncoder),
+          states are numbered from 0 in the order of appearance
+    - `P` program: name context length (u32), pickled name context and the id (u32) of the initial state
+    - `T` transition: step number (u32), number of nodes (u32) and the nodes of the transition tree in preorder,
+          each node is: depth (u32), rule (u8), old state id (u32), new state id (u32)
+    - `M` message: length (u32) and utf-8 encoded text
+    - `R` reset: the following states don't refer to the term nodes of the previous ones
+
+All the states between the resets are encoded by a single StateEncoder (and decoded by a single StateDecoder),
+so a subterm shared by several states (e.g. an unchanged part of the term or a memory cell) is stored only once.
+'''
+
+MAGIC = b"LTRC"
+VERSION = 2
+_HEADER = struct.Struct("<4sH")
+_LENGTH = struct.Struct("<I")
+_STEP = struct.Struct("<II")
+_NODE = struct.Struct("<IBII")
+
+
+class TraceFormatError(Exception):
+    def __init__(self, msg: str):
+        self.msg = msg
+
+    def __str__(self):
+        return f"[Trace Error] {self.msg}"
+
+
+class _StatePickler(pickle.Pickler):
+    """
+    Pickles the terms as the numbers of their nodes in the encoder's table
+    and the mutable memories as their immutable snapshots — the store would change after the dump.
+    """
+    def __init__(self, file: BinaryIO, encoder: StateEncoder):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.encoder = encoder
+
+    def persistent_id(self, obj):
+        if isinstance(obj, BaseTerm):
+            return self.encoder.node(obj)
+        return None
+
+    def reducer_override(self, obj):
+        if isinstance(obj, MutableMemory):
+            return Memory, (obj.freeze().space,)
+        return NotImplemented
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, file, nodes: list[Term]):
+        super().__init__(file)
+        self.nodes = nodes
+
+    def persistent_load(self, pid):
+        return self.nodes[pid]
+
+
+class _PickleStream:
+    """ File-like object feeding an unpickler with the consecutive pickles of the records. """
+    def __init__(self):
+        self.data = b""
+        self.position = 0
+
+    def feed(self, data: bytes) -> None:
+        self.data = self.data[self.position:] + data
+        self.position = 0
+
+    def read(self, n: int = -1) -> bytes:
+        end = len(self.data) if n < 0 else self.position + n
+        chunk = self.data[self.position:end]
+        self.position += len(chunk)
+        return chunk
+
+    def readline(self) -> bytes:
+        end = self.data.find(b"\n", self.position)
+        end = len(self.data) if end < 0 else end + 1
+        return self.read(end - self.position)
+
+
+class StateEncoder:
+    '''
+    Encodes objects containing terms (e.g. states) without recursing over the terms, so a term of any depth
+    can be written. The terms are flattened into a table of nodes in post-order: each entry is a copy
+    of the node without its subterms (see `term_rebuild`) and the numbers of the entries of the subterms.
+    A record contains the entries new to the encoder, pickled first, and the pickle of the object,
+    where the terms are replaced by the numbers of their nodes.
+    The table and the memos of the picklers are kept by the encoder, so a part shared with the objects encoded
+    before (e.g. an unchanged subterm or memory cell) is stored only once. They are released with the encoder:
+    the records have to be decoded by a single StateDecoder, in the same order.
+
+    Attributes:
+        - size: int
+            number of the nodes in the table
+
+    Methods:
+        - node(t: Term) -> int
+            number of the term's node, adds the missing nodes to the table
+        - encode(obj) -> bytes
+            returns the record encoding the object
+    '''
+    _ENTRIES_LENGTH = struct.Struct("<I")
+
+    def __init__(self):
+        self._numbers: dict[int, int] = {}
+        # keeps the encoded terms alive, so their ids stay unique
+        self._terms: list[Term] = []
+        self._entries: list[tuple[Term, tuple[int, ...]]] = []
+        self._buffer = io.BytesIO()
+        self._entries_pickler = pickle.Pickler(self._buffer, protocol=pickle.HIGHEST_PROTOCOL)
+        self._pickler = _StatePickler(self._buffer, self)
+
+    @property
+    def size(self) -> int:
+        return len(self._terms)
+
+    def node(self, t: Term) -> int:
+        number = self._numbers.get(id(t))
+        if number is not None:
+            return number
+        stack: list[tuple[Term, bool]] = [(t, False)]
+        while stack:
+            term, expanded = stack.pop()
+            if id(term) in self._numbers:
+                continue
+            children = [child for child, _ in term_children(term)]
+            if children and not expanded:
+                stack.append((term, True))
+                stack.extend((child, False) for child in reversed(children) if id(child) not in self._numbers)
+                continue
+            shell = term_rebuild(term, [None] * len(children)) if children else term
+            self._entries.append((shell, tuple(self._numbers[id(child)] for child in children)))
+            self._numbers[id(term)] = len(self._terms)
+            self._terms.append(term)
+        return self._numbers[id(t)]
+
+    def _take(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def encode(self, obj) -> bytes:
+        self._pickler.dump(obj)
+        body = self._take()
+        self._entries_pickler.dump(self._entries)
+        self._entries = []
+        entries = self._take()
+        return self._ENTRIES_LENGTH.pack(len(entries)) + entries + body
+
+
+class StateDecoder:
+    ''' Decodes the records of a single StateEncoder, in the order they were encoded. '''
+    def __init__(self):
+        self._nodes: list[Term] = []
+        self._entries_stream = _PickleStream()
+        self._entries_unpickler = pickle.Unpickler(self._entries_stream)
+        self._stream = _PickleStream()
+        self._unpickler = _StateUnpickler(self._stream, self._nodes)
+
+    def decode(self, data: bytes):
+        length, = StateEncoder._ENTRIES_LENGTH.unpack_from(data)
+        start = StateEncoder._ENTRIES_LENGTH.size
+        self._entries_stream.feed(data[start:start + length])
+        for shell, children in self._entries_unpickler.load():
+            self._nodes.append(term_rebuild(shell, [self._nodes[i] for i in children]) if children else shell)
+        self._stream.feed(data[start + length:])
+        return self._unpickler.load()
+
+
+def dumps_state(obj) -> bytes:
+    """ Encodes an object containing states with a fresh encoder, so it can be loaded on its own. """
+    return StateEncoder().encode(obj)
+
+
+def loads_state(data: bytes):
+    """ Decodes the result of `dumps_state`. """
+    return StateDecoder().decode(data)
+
+
+class BinaryTraceWriter:
+    '''
+    Trace sink with the same interface as TracePrinter, writing binary records instead of the text.
+    States are interned — a state object (or a state built from the same term and memory objects)
+    is written only once and later referenced by its id.
+    Once the encoder's table of the term nodes exceeds `max_shared_nodes`, the encoder is replaced (and the interned
+    states are dropped) after writing a reset record, so the memory used by the writer doesn't grow with the whole trace.
+
+    Methods:
+        - program(program: TypedLambdaProgram) -> None
+        - transition(t: Transition) -> None
+        - message(text: str) -> None
+        - close() -> None
+    '''
+    reads_old_states = True
+
+    def __init__(self, file: BinaryIO, max_shared_nodes: int = 1 << 18):
+        self.file = file
+        self.steps = 0
+        self.max_shared_nodes = max_shared_nodes
+        self._encoder = StateEncoder()
+        # (id of the term, id of the memory) -> (state id, state), the states are kept alive, so the ids stay unique
+        self._states: dict[tuple[int, int], tuple[int, LambdaProgramState]] = {}
+        self._state_count = 0
+        self.file.write(_HEADER.pack(MAGIC, VERSION))
+
+    @classmethod
+    def open(cls, path: str, buffer_size: int = 1 << 20) -> BinaryTraceWriter:
+        """ Opens the file with a large buffer, so the records are written in big chunks. """
+        return cls(open(path, "wb", buffering=buffer_size))
+
+    def _state_id(self, state: LambdaProgramState) -> int:
+        key = (id(state.term), id(state.memory))
+        interned = self._states.get(key)
+        if interned is not None:
+            return interned[0]
+        if self._encoder.size > self.max_shared_nodes:
+            self._encoder = StateEncoder()
+            self._states.clear()
+            self.file.write(b"R")
+        state_id = self._state_count
+        self._state_count += 1
+        self._states[key] = (state_id, state)
+        data = self._encoder.encode(state)
+        self.file.write(b"S" + _LENGTH.pack(len(data)) + data)
+        return state_id
+
+    def program(self, program: TypedLambdaProgram) -> None:
+        state_id = self._state_id(program.state)
+        data = pickle.dumps(program.name_context, protocol=pickle.HIGHEST_PROTOCOL)
+        self.file.write(b"P" + _LENGTH.pack(len(data)) + data + _LENGTH.pack(state_id))
+
+    def transition(self, t: Transition) -> None:
+        nodes = []
+        pending = [(t, 0)]
+        while pending:
+            node, depth = pending.pop()
+            nodes.append(_NODE.pack(depth, node.rule.value, self._state_id(node.old_state),
+                                    self._state_id(node.new_state)))
+            pending.extend((w, depth + 1) for w in reversed(node.witnesses))
+        self.file.write(b"T" + _STEP.pack(self.steps, len(nodes)) + b"".join(nodes))
+        self.steps += 1
+
+    def message(self, text: str) -> None:
+        data = text.encode()
+        self.file.write(b"M" + _LENGTH.pack(len(data)) + data)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> BinaryTraceWriter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_trace(file: BinaryIO) -> Iterator[TypedLambdaProgram | Transition | str]:
+    """
+    Reads the trace back.
+
+    :param file: binary file containing the trace
+    :return: the program, the transitions and the messages in the order they were written
+    """
+    magic, version = _HEADER.unpack(file.read(_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise TraceFormatError("not a trace file or unsupported version")
+    decoder = StateDecoder()
+    states: list[LambdaProgramState] = []
+    name_context: list[str] = []
+    while tag := file.read(1):
+        match tag:
+            case b"S":
+                states.append(decoder.decode(file.read(_LENGTH.unpack(file.read(_LENGTH.size))[0])))
+            case b"R":
+                decoder = StateDecoder()
+            case b"P":
+                name_context = pickle.loads(file.read(_LENGTH.unpack(file.read(_LENGTH.size))[0]))
+                state_id, = _LENGTH.unpack(file.read(_LENGTH.size))
+                yield TypedLambdaProgram(states[state_id], name_context)
+            case b"T":
+                _, count = _STEP.unpack(file.read(_STEP.size))
+                nodes = list(_NODE.iter_unpack(file.read(_NODE.size * count)))
+                yield _rebuild_transition(nodes, states, name_context)
+            case b"M":
+                yield file.read(_LENGTH.unpack(file.read(_LENGTH.size))[0]).decode()
+            case _:
+                raise TraceFormatError(f"unknown record: {tag!r}")
+
+
+def _rebuild_transition(nodes: list[tuple[int, int, int, int]], states: list[LambdaProgramState],
+                        name_context: list[str]) -> Transition:
+    roots: list[Transition] = []
+    open_nodes: list[tuple[tuple[int, int, int, int], list[Transition]]] = []
+
+    def close() -> None:
+        (_, rule, old_id, new_id), witnesses = open_nodes.pop()
+        transition = Transition(states[old_id], states[new_id], eval_rule(rule), name_context, tuple(witnesses))
+        (open_nodes[-1][1] if open_nodes else roots).append(transition)
+
+    for node in nodes:
+        while len(open_nodes) > node[0]:
+            close()
+        open_nodes.append((node, []))
+    while open_nodes:
+        close()
+    return roots[0]
@@ -34,6 +34,8 @@ class LambdaProgramState(Generic[T]):
         creates a new state with a replaced memory
     pretty_str(name_context: list[str]) -> str:
         prints the current state in a pretty way given names of the free variables
+    pretty_term_str(name_context: list[str]) -> str:
+        prints only the current term in a pretty way
     """
     term: T
     memory: Memory = Memory()
@@ -45,98 +47,133 @@ class LambdaProgramState(Generic[T]):
         return LambdaProgramState(self.term, memory)
 
     def pretty_str(self, name_context: list[str]) -> str:
-        def _pick_fresh_name(context: list[str], suggestion: str) -> tuple[list[str], str]:
-            """
-                This method generates new fresh name based on the suggestion and and list of already used names.
-
-                :param context: already used variable names in the scope
-                :param suggestion: suggested name
-                :return: tuple containing new context and fresh name
-            """
+        return f"({self.pretty_term_str(name_context)} | {self.memory})"
+
+    def pretty_term_str(self, name_context: list[str]) -> str:
+        """
+            Prints the term with correct variable names.
+            It's based on the "printtm" function from page 85 in the TAPL book.
+
+            The term is walked with an explicit stack of pending actions: pieces of text, subterms,
+            and entering/leaving the scopes of the binders. Names of the bound variables are kept
+            on a single stack (the innermost one last) with a multiset of the used names,
+            so both the lookup and the freshness check take constant time.
+        """
+        parts: list[str] = []
+        names: list[str] = []
+        used: dict[str, int] = {}
+
+        def _bind(name: str) -> None:
+            names.append(name)
+            used[name] = used.get(name, 0) + 1
+
+        def _unbind() -> None:
+            name = names.pop()
+            used[name] -= 1
+            if not used[name]:
+                del used[name]
+
+        def _pick_fresh_name(suggestion: str) -> str:
             fresh_name = suggestion
-            while fresh_name in context:
+            while fresh_name in used:
                 fresh_name = f"{fresh_name}'"
-            new_context = [fresh_name] + context
-            return new_context, fresh_name
-
-        def _find_name(context: list[str], index: int) -> str:
-            """
-                This method finds a variable name based on the list of the used names.
-
-                :param context: already used variable names in the scope
-                :param index: index of a variable
-                :return: name corresponding the the index
-            """
-            if index < len(context):
-                return context[index]
-            else:
-                return name_context[index - len(context)]
-
-        def _pretty_str(context: list[str], term: T) -> str:
-            """
-                This method prints the term with correct variable names.
-                It's based on the "printtm" function from page 85 in the TAPL book.
-
-                :param context: already used variable names in the scope
-                :param term: term to be printed
-                :return: pretty textual representation
-            """
-            match term:
+            return fresh_name
+
+        pending: list = [self.term]
+        while pending:
+            action = pending.pop()
+            if isinstance(action, str):
+                parts.append(action)
+                continue
+            if isinstance(action, tuple):
+                match action:
+                    case (_Scope.ENTER, name):
+                        _bind(name)
+                    case (_Scope.LEAVE,):
+                        _unbind()
+                    case (_Scope.BRANCH, label, var, branch):
+                        name = _pick_fresh_name(var)
+                        parts.append(f"<{label}={name}> => ")
+                        pending.extend([(_Scope.LEAVE,), branch, (_Scope.ENTER, name)])
+                continue
+            match action:
                 case TmAbs(_, arg, arg_type, body):
-                    new_context, name = _pick_fresh_name(context, arg)
-                    return f"(\\{name}:{arg_type}.{_pretty_str(new_context, body)})"
+                    name = _pick_fresh_name(arg)
+                    parts.append(f"(\\{name}:{arg_type}.")
+                    pending.extend([")", (_Scope.LEAVE,), body, (_Scope.ENTER, name)])
                 case TmLet(_, var, rvalue, body):
-                    new_context, name = _pick_fresh_name(context, var)
-                    return f"(let {name} = {_pretty_str(context, rvalue)} in {_pretty_str(new_context, body)}"
+                    name = _pick_fresh_name(var)
+                    parts.append(f"(let {name} = ")
+                    pending.extend([(_Scope.LEAVE,), body, (_Scope.ENTER, name), " in ", rvalue])
                 case TmApp(_, function, arg):
-                    return f"({_pretty_str(context, function)} {_pretty_str(context, arg)})"
+                    parts.append("(")
+                    pending.extend([")", arg, " ", function])
                 case TmVar(_, index, ctx_length):
-                    assert ctx_length == len(context), f"{index}: {ctx_length} != {len(context)}"
-                    return _find_name(context, index)
+                    assert ctx_length == len(names), f"{index}: {ctx_length} != {len(names)}"
+                    if index < len(names):
+                        parts.append(names[-1 - index])
+                    else:
+                        parts.append(name_context[index - len(names)])
                 case TmZero() | TmFalse() | TmTrue() | TmUnit() | TmStoreLocation():
-                    return str(term)
+                    parts.append(str(action))
                 case TmIf(_, cond, if_act, else_act):
-                    pretty_cond = _pretty_str(context, cond)
-                    pretty_if_act = _pretty_str(context, if_act)
-                    pretty_else_act = _pretty_str(context, else_act)
-                    return f"if {pretty_cond} then {pretty_if_act} else {pretty_else_act}"
+                    parts.append("if ")
+                    pending.extend([else_act, " else ", if_act, " then ", cond])
                 case TmIsZero(_, arg):
-                    return f"iszero {_pretty_str(context, arg)}"
+                    parts.append("iszero ")
+                    pending.append(arg)
                 case TmPred(_, arg):
-                    return f"pred {_pretty_str(context, arg)}"
+                    parts.append("pred ")
+                    pending.append(arg)
                 case TmSucc(_, arg):
-                    return f"succ {_pretty_str(context, arg)}"
+                    parts.append("succ ")
+                    pending.append(arg)
                 case TmFix(_, arg):
-                    return f"fix {_pretty_str(context, arg)}"
+                    parts.append("fix ")
+                    pending.append(arg)
                 case TmLetRec(_, var, vartype, fun, body):
-                    new_context, name = _pick_fresh_name(context, var)
-                    return f"(letrec {name} : {vartype} = {_pretty_str(new_context, fun)} in {_pretty_str(new_context, body)}"
+                    name = _pick_fresh_name(var)
+                    _bind(name)
+                    parts.append(f"(letrec {name} : {vartype} = ")
+                    pending.extend([(_Scope.LEAVE,), body, " in ", fun])
                 case TmRecord(_, records):
-                    return "{" + ", ".join([f"{l} = {_pretty_str(context, v)}" for l, v in records.items()]) + "}"
+                    parts.append("{")
+                    pending.append("}")
+                    for position, (l, v) in reversed(list(enumerate(records.items()))):
+                        pending.append(v)
+                        pending.append(f"{', ' if position else ''}{l} = ")
                 case TmProjection(_, t, label):
-                    return f"{t}.{label}"
+                    parts.append(f"{t}.{label}")
                 case TmTagging(_, label, term):
-                    return f"<{label}:{_pretty_str(context, term)}>"
+                    parts.append(f"<{label}:")
+                    pending.extend([">", term])
                 case TmCase(_, term, vars, branches):
-                    str_repr = f"case {_pretty_str(context, term)} of "
-                    str_cases = []
-                    for label, var in vars.items():
-                        branch = branches[label]
-                        new_context, name = _pick_fresh_name(context, var)
-                        str_cases.append(f"<{label}={name}> => {_pretty_str(new_context, branch)}")
-                    str_repr += " | ".join(str_cases)
-                    return str_repr
+                    parts.append("case ")
+                    for position, (label, var) in reversed(list(enumerate(vars.items()))):
+                        pending.append((_Scope.BRANCH, label, var, branches[label]))
+                        if position:
+                            pending.append(" | ")
+                    pending.extend([" of ", term])
                 case TmReference(_, term):
-                    return f"ref {_pretty_str(context, term)}"
+                    parts.append("ref ")
+                    pending.append(term)
                 case TmDereference(_, term):
-                    return f"!({_pretty_str(context, term)})"
+                    parts.append("!(")
+                    pending.extend([")", term])
                 case TmAssignment(_, left, right):
-                    return f"{_pretty_str(context, left)} := {_pretty_str(context, right)}"
+                    pending.extend([right, " := ", left])
                 case TmSequence(_, head, tail):
-                    return f"{head}; {tail}"
+                    parts.append(f"{head}; {tail}")
+                case _:
+                    parts.append("None")
+        return "".join(parts)
 
-        empty_context: list[str] = []
-        return f"({_pretty_str(empty_context, self.term)} | {self.memory})"
+
+class _Scope:
+    """ Markers of the scope related actions of the pretty printer. """
+    ENTER = 0
+    LEAVE = 1
+    BRANCH = 2
 
 
 @dataclass(frozen=True)
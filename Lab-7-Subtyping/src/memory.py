@@ -6,6 +6,9 @@ from __future__ import annotations
 
 from copy import copy
 from dataclasses import dataclass, field
+from typing import Iterator
+
+from src.persistent_vector import PersistentVector
 from src.term import Term, TmStoreLocation, Info
 
 
@@ -17,8 +20,9 @@ class Memory:
 
     Attributes:
     ===========
-    space: tuple[Term]
-        an indexed storage, nothing fancy
+    space: PersistentVector
+        an indexed storage, a persistent vector so the updates cost O(log n)
+        and consecutive memories share most of their cells
 
     Methods:
     ========
@@ -29,21 +33,173 @@ class Memory:
         creates a new memory with a replaced term stored at the given address
     def dereference(location: TmStoreLocation) -> Term:
         return term stored at the given address
+    def cleared() -> Memory:
+        returns an empty memory of the same kind
+    def changed_addresses(older: Memory) -> list[int]:
+        returns addresses of the cells written or allocated since the older memory
     '''
-    space: tuple[Term] = tuple()
+    space: PersistentVector = PersistentVector()
 
     def put(self, term: Term) -> tuple[Memory, TmStoreLocation]:
-        new_space = self.space + (term,)
+        new_space = self.space.append(term)
         return Memory(new_space), TmStoreLocation(Info.dummy_info(), len(self.space))
 
     def replace(self, location: TmStoreLocation, term: Term) -> Memory:
-        return Memory(self.space[:location.address] + (term,) + self.space[location.address+1:])
+        return Memory(self.space.set(location.address, term))
 
     def dereference(self, location: TmStoreLocation) -> Term:
         return self.space[location.address]
 
+    def cleared(self) -> Memory:
+        return Memory()
+
+    def changed_addresses(self, older: Memory | MutableMemory) -> list[int]:
+        if isinstance(older, Memory):
+            return self.space.changed_indices(older.space)
+        return _changed_cells(list(self), list(older))
+
+    def __len__(self) -> int:
+        return len(self.space)
+
+    def __iter__(self) -> Iterator[Term]:
+        return iter(self.space)
+
     def __str__(self) -> str:
         return "{" + ", ".join([f"@{i} <- {v}" for i, v in enumerate(self.space)]) + "}"
 
 
+def _changed_cells(cells: list[Term], older_cells: list[Term]) -> list[int]:
+    changed = [i for i, (a, b) in enumerate(zip(cells, older_cells)) if a is not b]
+    changed.extend(range(len(older_cells), len(cells)))
+    return changed
+
+
+class StaleMemoryError(Exception):
+    def __init__(self, version: int, current_version: int):
+        self.version = version
+        self.current_version = current_version
+
+    def __str__(self):
+        return f"Memory version {self.version} is no longer available (current version: {self.current_version})"
+
+
+class _MutableStore:
+    '''
+    Storage shared by all versions of a MutableMemory.
+
+    Attributes:
+    ===========
+    cells: list[Term]
+        current contents of the memory, updated in place
+    version: int
+        number of the performed updates
+    undo_log: list[tuple[int, Term | None]] | None
+        for every update: the address and the overwritten term (None for an allocation),
+        None if the old versions shouldn't be reconstructible
+    '''
+    __slots__ = ('cells', 'version', 'undo_log')
 
+    def __init__(self, undo_log: bool):
+        self.cells: list[Term] = []
+        self.version = 0
+        self.undo_log: list[tuple[int, Term | None]] | None = [] if undo_log else None
+
+
+class MutableMemory:
+    '''
+    Memory with the same interface as Memory, but updated in place: `put` appends to a python list
+    and `replace` overwrites a single cell. The returned "new memory" is just a handle with a new version
+    number. The latest version reads the list directly. Older versions (kept e.g. by the transitions)
+    are reconstructed on demand from the undo log, or raise StaleMemoryError if the log is disabled.
+    Only the latest version can be updated — the evaluation must be linear.
+
+    Methods:
+    ========
+    the ones of Memory, and:
+    freeze() -> Memory
+        creates an immutable copy of this version of the memory
+    '''
+    __slots__ = ('_store', '_version')
+
+    def __init__(self, undo_log: bool = True):
+        self._store = _MutableStore(undo_log)
+        self._version = 0
+
+    @classmethod
+    def _at(cls, store: _MutableStore, version: int) -> MutableMemory:
+        memory = cls.__new__(cls)
+        memory._store = store
+        memory._version = version
+        return memory
+
+    def _check_latest(self) -> _MutableStore:
+        store = self._store
+        if self._version != store.version:
+            raise StaleMemoryError(self._version, store.version)
+        return store
+
+    def _cells(self) -> list[Term]:
+        """ Contents of this version, the result mustn't be modified. """
+        store = self._store
+        if self._version == store.version:
+            return store.cells
+        if store.undo_log is None:
+            raise StaleMemoryError(self._version, store.version)
+        cells = list(store.cells)
+        for address, old_term in reversed(store.undo_log[self._version:]):
+            if old_term is None:
+                cells.pop()
+            else:
+                cells[address] = old_term
+        return cells
+
+    def put(self, term: Term) -> tuple[MutableMemory, TmStoreLocation]:
+        store = self._check_latest()
+        address = len(store.cells)
+        store.cells.append(term)
+        if store.undo_log is not None:
+            store.undo_log.append((address, None))
+        store.version += 1
+        return MutableMemory._at(store, store.version), TmStoreLocation(Info.dummy_info(), address)
+
+    def replace(self, location: TmStoreLocation, term: Term) -> MutableMemory:
+        store = self._check_latest()
+        if store.undo_log is not None:
+            store.undo_log.append((location.address, store.cells[location.address]))
+        store.cells[location.address] = term
+        store.version += 1
+        return MutableMemory._at(store, store.version)
+
+    def dereference(self, location: TmStoreLocation) -> Term:
+        return self._cells()[location.address]
+
+    def cleared(self) -> MutableMemory:
+        return MutableMemory(self._store.undo_log is not None)
+
+    def changed_addresses(self, older: Memory | MutableMemory) -> list[int]:
+        store = self._store
+        if isinstance(older, MutableMemory) and older._store is store and store.undo_log is not None \
+                and older._version <= self._version:
+            return sorted({address for address, _ in store.undo_log[older._version:self._version]})
+        return _changed_cells(self._cells(), list(older))
+
+    def freeze(self) -> Memory:
+        return Memory(PersistentVector(self._cells()))
+
+    def __len__(self) -> int:
+        return len(self._cells())
+
+    def __iter__(self) -> Iterator[Term]:
+        return iter(list(self._cells()))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MutableMemory):
+            return self._store is other._store and self._version == other._version or self.freeze() == other.freeze()
+        if isinstance(other, Memory):
+            return self.freeze() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __str__(self) -> str:
+        return "{" + ", ".join([f"@{i} <- {v}" for i, v in enumerate(self._cells())]) + "}"
@@ -97,7 +97,11 @@ class TypedLambdaParser:
                     return TmAbs(t.info, t.arg, t.arg_type, TmSequence(p[0].info, t.body, p[1][1]))
 
         def reduce_base_type(p: ParseResult) -> LambdaType:
-            return BaseType.from_text(p[0])
+            # invalid annotations are reported right away, pointing at the unknown name
+            base_type = BaseType.from_text(p[0])
+            if base_type.invalid:
+                p.error(f"invalid type annotation '{p[0]}', expected one of: {', '.join(t.value for t in BaseType)}", 0)
+            return base_type
 
         def reduce_type(p: ParseResult) -> LambdaType:
             if p[1] is None:
@@ -176,9 +180,11 @@ class TypedLambdaParser:
             ['type_p', 'ARROW type', '{}']
         ]
 
+        # both are reusable, building them is several times more expensive than parsing a small program
+        self._lexer = lex.Lexer(self.tokens)
+        self._parser = parse.Parser(self.grammar, 'term')
+
     def parse(self, input: str) -> NamedTerm:
-        lexer = lex.Lexer(self.tokens)
-        parser = parse.Parser(self.grammar, 'term')
-        tokens = lexer.input(input)
-        named_term = parser.parse(tokens)
+        tokens = self._lexer.input(input)
+        named_term = self._parser.parse(tokens)
         return named_term
@@ -0,0 +1,160 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+from __future__ import annotations
+
+from typing import Any, Iterable, Iterator
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+class PersistentVector:
+    '''
+    Immutable vector implemented as a 32-way trie (as in Clojure), with the last (incomplete) leaf kept aside
+    in the `tail`. Updates copy only the path from the root to the changed leaf, so they cost O(log32 n)
+    and the new vector shares all the other nodes with the old one.
+
+    Nodes are tuples: the inner ones hold up to 32 children, the leaves up to 32 elements.
+
+    Methods:
+    ========
+    append(item: Any) -> PersistentVector
+        returns a new vector with the item added at the end
+    set(index: int, item: Any) -> PersistentVector
+        returns a new vector with the item at the given index replaced
+    '''
+    __slots__ = ('_count', '_shift', '_root', '_tail')
+
+    def __init__(self, items: Iterable[Any] = ()):
+        self._count = 0
+        self._shift = BITS
+        self._root: tuple = ()
+        self._tail: tuple = ()
+        for item in items:
+            self._append_in_place(item)
+
+    @classmethod
+    def _make(cls, count: int, shift: int, root: tuple, tail: tuple) -> PersistentVector:
+        vector = cls.__new__(cls)
+        vector._count = count
+        vector._shift = shift
+        vector._root = root
+        vector._tail = tail
+        return vector
+
+    def _tail_offset(self) -> int:
+        return 0 if self._count < WIDTH else ((self._count - 1) >> BITS) << BITS
+
+    def _leaf_for(self, index: int) -> tuple:
+        if index >= self._tail_offset():
+            return self._tail
+        node = self._root
+        for level in range(self._shift, 0, -BITS):
+            node = node[(index >> level) & MASK]
+        return node
+
+    def __getitem__(self, index: int) -> Any:
+        if not 0 <= index < self._count:
+            raise IndexError(f"index {index} out of range")
+        return self._leaf_for(index)[index & MASK]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Any]:
+        for start in range(0, self._count, WIDTH):
+            yield from self._leaf_for(start)
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, PersistentVector):
+            return NotImplemented
+        return self._count == other._count and all(a == b for a, b in zip(self, other))
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return f"PersistentVector({list(self)!r})"
+
+    def changed_indices(self, older: PersistentVector) -> list[int]:
+        """
+        Finds indices of the elements that were replaced or appended since the older vector.
+        Elements are compared by identity. Subtrees shared by both vectors are skipped,
+        so the cost depends on the number of the changes rather than the length of the vectors.
+
+        :param older: a vector this one was derived from
+        :return: sorted list of the changed indices
+        """
+        common = min(self._count, older._count)
+        changed: list[int] = []
+        start = 0
+        if self._shift == older._shift:
+            start = min(self._tail_offset(), older._tail_offset())
+            stack = [(self._root, older._root, self._shift, 0)]
+            while stack:
+                node, older_node, level, base = stack.pop()
+                if node is older_node:
+                    continue
+                if level == 0:
+                    changed.extend(base + i for i, (a, b) in enumerate(zip(node, older_node))
+                                   if a is not b and base + i < start)
+                else:
+                    stack.extend((a, b, level - BITS, base + (i << level))
+                                 for i, (a, b) in enumerate(zip(node, older_node)))
+        changed.extend(i for i in range(start, common) if self[i] is not older[i])
+        changed.sort()
+        changed.extend(range(common, self._count))
+        return changed
+
+    def _push_tail(self, level: int, parent: tuple, leaf: tuple) -> tuple:
+        index = ((self._count - 1) >> level) & MASK
+        if level == BITS:
+            node = leaf
+        elif index < len(parent):
+            node = self._push_tail(level - BITS, parent[index], leaf)
+        else:
+            node = _new_path(level - BITS, leaf)
+        return parent[:index] + (node,) + parent[index + 1:]
+
+    def _appended(self, item: Any) -> tuple[int, tuple, tuple]:
+        if self._count - self._tail_offset() < WIDTH:
+            return self._shift, self._root, self._tail + (item,)
+        if (self._count >> BITS) > (1 << self._shift):
+            root = (self._root, _new_path(self._shift, self._tail))
+            return self._shift + BITS, root, (item,)
+        return self._shift, self._push_tail(self._shift, self._root, self._tail), (item,)
+
+    def _append_in_place(self, item: Any) -> None:
+        # used only while constructing a new vector, before anybody can observe it
+        self._shift, self._root, self._tail = self._appended(item)
+        self._count += 1
+
+    def append(self, item: Any) -> PersistentVector:
+        shift, root, tail = self._appended(item)
+        return self._make(self._count + 1, shift, root, tail)
+
+    def set(self, index: int, item: Any) -> PersistentVector:
+        if not 0 <= index < self._count:
+            raise IndexError(f"index {index} out of range")
+        if index >= self._tail_offset():
+            tail = self._tail[:index & MASK] + (item,) + self._tail[(index & MASK) + 1:]
+            return self._make(self._count, self._shift, self._root, tail)
+        return self._make(self._count, self._shift, _assoc(self._shift, self._root, index, item), self._tail)
+
+
+def _new_path(level: int, node: tuple) -> tuple:
+    while level > 0:
+        node = (node,)
+        level -= BITS
+    return node
+
+
+def _assoc(level: int, node: tuple, index: int, item: Any) -> tuple:
+    position = (index >> level) & MASK
+    new_child = item if level == 0 else _assoc(level - BITS, node[position], index, item)
+    return node[:position] + (new_child,) + node[position + 1:]
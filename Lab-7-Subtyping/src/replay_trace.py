@@ -0,0 +1,323 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+from __future__ import annotations
+
+import pickle
+import struct
+import zlib
+from bisect import bisect_right
+from typing import BinaryIO, Iterator
+
+from src.binary_trace import dumps_state, loads_state, TraceFormatError
+from src.lambda_program import LambdaProgramState, TypedLambdaProgram
+from src.semantics.evaluator import Transition, Rule, EvalRule, eval_rule, TypedLambdaEvaluator, NoEvalRuleApplies
+from src.semantics.term_utils import term_children, term_rebuild
+
+'''
+Replayable trace format (little endian):
+- header: magic `LRPL`, format version (u16)
+- `P` program: payload length (u32) and the pickled name context
+- `K` keyframe: step number (u32), payload length (u32) and the zlib compressed state before that step
+      (see `dumps_state`)
+- `B` block of steps following the last keyframe: number of steps (u32), payload length (u32) and
+      the zlib compressed paths, each path is: depth (varint), `depth` pairs of a congruence rule (u8)
+      and the index of the evaluated subterm (varint), and finally the axiom rule (u8)
+- `M` message: payload length (u32) and utf-8 encoded text
+- `I` index: number of keyframes (u32) and pairs (step: u32, file offset: u64) of the keyframes
+- footer: number of steps (u32) and file offset of the index (u64)
+'''
+
+MAGIC = b"LRPL"
+VERSION = 2
+_HEADER = struct.Struct("<4sH")
+_U32 = struct.Struct("<I")
+_KEYFRAME = struct.Struct("<II")
+_INDEX_ENTRY = struct.Struct("<IQ")
+_FOOTER = struct.Struct("<IQ")
+
+Path = tuple[tuple[tuple[Rule, int], ...], Rule]
+
+
+class ReplayError(Exception):
+    def __init__(self, step: int, msg: str):
+        self.step = step
+        self.msg = msg
+
+    def __str__(self):
+        return f"[Replay Error] step {self.step}: {self.msg}"
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def transition_path(t: Transition) -> Path:
+    """
+    Finds the path to the redex of the transition: the congruence rules with the indices
+    (in the `term_children` order) of the subterms they evaluate, followed by the applied axiom.
+    Raises TraceFormatError if a congruence evaluates a term that is not among the `term_children`.
+    """
+    congruences = []
+    while t.witnesses:
+        witness = t.witnesses[0]
+        children = term_children(t.old_state.term)
+        index = next((i for i, (child, _) in enumerate(children) if child is witness.old_state.term), None)
+        if index is None:
+            raise TraceFormatError(f"{t.rule} at {t.old_state.term.info} evaluates a term "
+                                   f"that is not a direct subterm of its redex")
+        congruences.append((t.rule, index))
+        t = witness
+    return tuple(congruences), t.rule
+
+
+class ReplayTraceWriter:
+    '''
+    Trace sink (with the interface of TracePrinter) storing only the paths to the redexes.
+    Every `keyframe_interval` steps, and whenever a step doesn't start from the result of the previous one
+    (e.g. the memory was collected in between), the whole state is stored as a keyframe.
+    The periodic keyframes are taken from the result of a step as soon as it's known, so the old states are read
+    only in the latter case (`reads_old_states` doesn't cover it, see MutableMemory).
+    The result of an E-AppMemo step (see MemoizingEvaluator) is always stored as a keyframe, as the replayer
+    can't recompute it with a single step of the plain evaluator.
+
+    Methods:
+        - program(program: TypedLambdaProgram) -> None
+        - transition(t: Transition) -> None
+        - message(text: str) -> None
+        - close() -> None
+    '''
+    reads_old_states = False
+
+    def __init__(self, file: BinaryIO, keyframe_interval: int = 1024):
+        self.file = file
+        self.keyframe_interval = keyframe_interval
+        self.steps = 0
+        self._offset = 0
+        self._keyframes: list[tuple[int, int]] = []
+        self._block = bytearray()
+        self._block_steps = 0
+        self._last_state: LambdaProgramState | None = None
+        self._due_keyframe: bytes | None = None
+        self._write(_HEADER.pack(MAGIC, VERSION))
+
+    @classmethod
+    def open(cls, path: str, keyframe_interval: int = 1024) -> ReplayTraceWriter:
+        return cls(open(path, "wb", buffering=1 << 20), keyframe_interval)
+
+    def _write(self, data: bytes) -> None:
+        self.file.write(data)
+        self._offset += len(data)
+
+    def _flush_block(self) -> None:
+        if self._block_steps:
+            data = zlib.compress(bytes(self._block))
+            self._write(b"B" + _KEYFRAME.pack(self._block_steps, len(data)) + data)
+            self._block.clear()
+            self._block_steps = 0
+
+    @staticmethod
+    def _snapshot(state: LambdaProgramState) -> bytes:
+        return zlib.compress(dumps_state(state))
+
+    def _keyframe(self, data: bytes) -> None:
+        self._flush_block()
+        self._keyframes.append((self.steps, self._offset))
+        self._write(b"K" + _KEYFRAME.pack(self.steps, len(data)) + data)
+
+    def program(self, program: TypedLambdaProgram) -> None:
+        data = pickle.dumps(program.name_context)
+        self._write(b"P" + _U32.pack(len(data)) + data)
+        self._keyframe(self._snapshot(program.state))
+        self._last_state = program.state
+
+    def transition(self, t: Transition) -> None:
+        if t.old_state is not self._last_state:
+            self._keyframe(self._snapshot(t.old_state))
+        elif self._due_keyframe is not None:
+            self._keyframe(self._due_keyframe)
+        self._due_keyframe = None
+        congruences, axiom = transition_path(t)
+        _write_varint(self._block, len(congruences))
+        for rule, index in congruences:
+            self._block.append(rule.value)
+            _write_varint(self._block, index)
+        self._block.append(axiom.value)
+        self._block_steps += 1
+        self._last_state = t.new_state
+        self.steps += 1
+        if axiom is EvalRule.AppMemo:
+            self._keyframe(self._snapshot(t.new_state))
+        elif self.steps % self.keyframe_interval == 0:
+            # written only if another step follows, like the other keyframes
+            self._due_keyframe = self._snapshot(t.new_state)
+
+    def message(self, text: str) -> None:
+        self._flush_block()
+        data = text.encode()
+        self._write(b"M" + _U32.pack(len(data)) + data)
+
+    def close(self) -> None:
+        self._flush_block()
+        index_offset = self._offset
+        self._write(b"I" + _U32.pack(len(self._keyframes))
+                    + b"".join(_INDEX_ENTRY.pack(step, offset) for step, offset in self._keyframes))
+        self._write(_FOOTER.pack(self.steps, index_offset))
+        self.file.close()
+
+    def __enter__(self) -> ReplayTraceWriter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _parse_paths(data: bytes) -> list[Path]:
+    paths = []
+    position = 0
+    while position < len(data):
+        depth, position = _read_varint(data, position)
+        congruences = []
+        for _ in range(depth):
+            rule = eval_rule(data[position])
+            index, position = _read_varint(data, position + 1)
+            congruences.append((rule, index))
+        paths.append((tuple(congruences), eval_rule(data[position])))
+        position += 1
+    return paths
+
+
+class TraceReplayer:
+    '''
+    Reconstructs the states of a replayable trace. A state is obtained from the closest preceding keyframe
+    by replaying the recorded steps: the path leads straight to the redex, so no rules are searched for
+    and only the recorded axiom is checked.
+
+    Attributes:
+        - steps: int
+            number of the recorded steps
+        - name_context: list[str]
+            names of the free variables of the program
+        - messages: list[str]
+            recorded messages (e.g. the final status)
+
+    Methods:
+        - state_at(step: int) -> LambdaProgramState
+            state before the given step (`steps` gives the final state)
+        - transition_at(step: int) -> Transition
+            the given step with all its witnesses (recomputed by the plain evaluator,
+            so a memoized application is reported as its E-AppAbs step)
+        - states() -> Iterator[LambdaProgramState]
+            all the states in order
+    '''
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        magic, version = _HEADER.unpack(file.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise TraceFormatError("not a replayable trace file or unsupported version")
+        file.seek(-_FOOTER.size, 2)
+        self.steps, index_offset = _FOOTER.unpack(file.read(_FOOTER.size))
+        file.seek(index_offset)
+        if file.read(1) != b"I":
+            raise TraceFormatError("missing keyframe index")
+        count, = _U32.unpack(file.read(_U32.size))
+        entries = list(_INDEX_ENTRY.iter_unpack(file.read(_INDEX_ENTRY.size * count)))
+        self._keyframe_steps = [step for step, _ in entries]
+        self._keyframe_offsets = [offset for _, offset in entries]
+        self.name_context: list[str] = []
+        self.messages: list[str] = []
+        self._scan_header_and_messages(index_offset)
+        self.evaluator = TypedLambdaEvaluator(self.name_context)
+
+    def _scan_header_and_messages(self, end: int) -> None:
+        self.file.seek(_HEADER.size)
+        while self.file.tell() < end:
+            tag = self.file.read(1)
+            match tag:
+                case b"P":
+                    self.name_context = pickle.loads(self.file.read(_U32.unpack(self.file.read(_U32.size))[0]))
+                case b"M":
+                    self.messages.append(self.file.read(_U32.unpack(self.file.read(_U32.size))[0]).decode())
+                case b"K" | b"B":
+                    _, length = _KEYFRAME.unpack(self.file.read(_KEYFRAME.size))
+                    self.file.seek(length, 1)
+                case _:
+                    raise TraceFormatError(f"unknown record: {tag!r}")
+
+    def _segment(self, keyframe: int) -> tuple[LambdaProgramState, list[Path]]:
+        """ Reads the keyframe with the given number and the steps recorded after it. """
+        self.file.seek(self._keyframe_offsets[keyframe])
+        if self.file.read(1) != b"K":
+            raise TraceFormatError("broken keyframe index")
+        _, length = _KEYFRAME.unpack(self.file.read(_KEYFRAME.size))
+        state = loads_state(zlib.decompress(self.file.read(length)))
+        paths = []
+        while (tag := self.file.read(1)) == b"B":
+            _, length = _KEYFRAME.unpack(self.file.read(_KEYFRAME.size))
+            paths.extend(_parse_paths(zlib.decompress(self.file.read(length))))
+        return state, paths
+
+    def replay_step(self, state: LambdaProgramState, path: Path, step: int = 0) -> LambdaProgramState:
+        congruences, axiom = path
+        contexts = []
+        term = state.term
+        for rule, index in congruences:
+            children = [child for child, _ in term_children(term)]
+            if index >= len(children):
+                raise ReplayError(step, f"{rule} expects a subterm that doesn't exist")
+            contexts.append((term, children, index))
+            term = children[index]
+        try:
+            transition = self.evaluator.reduce_redex(state.replace_term(term))
+        except NoEvalRuleApplies:
+            raise ReplayError(step, f"the recorded redex of {axiom} is not a redex")
+        if transition.rule != axiom:
+            raise ReplayError(step, f"recorded {axiom}, but {transition.rule} applies")
+        new_state = transition.new_state
+        for parent, children, index in reversed(contexts):
+            children[index] = new_state.term
+            new_state = new_state.replace_term(term_rebuild(parent, children))
+        return new_state
+
+    def state_at(self, step: int) -> LambdaProgramState:
+        if not 0 <= step <= self.steps:
+            raise IndexError(f"step {step} out of range")
+        keyframe = bisect_right(self._keyframe_steps, step) - 1
+        if keyframe < 0:
+            raise TraceFormatError("the trace contains no states")
+        first_step = self._keyframe_steps[keyframe]
+        state, paths = self._segment(keyframe)
+        for offset, path in enumerate(paths[:step - first_step]):
+            state = self.replay_step(state, path, first_step + offset)
+        return state
+
+    def transition_at(self, step: int) -> Transition:
+        if not 0 <= step < self.steps:
+            raise IndexError(f"step {step} out of range")
+        return self.evaluator.single_step(self.state_at(step))
+
+    def states(self) -> Iterator[LambdaProgramState]:
+        last_keyframe = len(self._keyframe_steps) - 1
+        for keyframe, first_step in enumerate(self._keyframe_steps):
+            state, paths = self._segment(keyframe)
+            yield state
+            # the state after the last step of a segment is the next keyframe
+            replayed = paths if keyframe == last_keyframe else paths[:-1]
+            for offset, path in enumerate(replayed):
+                state = self.replay_step(state, path, first_step + offset)
+                yield state
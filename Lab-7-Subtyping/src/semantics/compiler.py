@@ -0,0 +1,341 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from __future__ import annotations
+
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import CodeType
+from typing import Any, NamedTuple, Optional
+
+from src.lambda_program import TypedLambdaProgram, LambdaProgramState
+from src.memory import Memory
+from src.semantics.term_utils import term_structural_key
+from src.semantics.typechecker import TypedLambdaTypechecker, TypeAnnotations
+from src.term import Term, TmAbs, TmVar, TmApp, TmTrue, TmFalse, TmZero, TmSucc, TmIf, TmIsZero, TmPred, TmLet, \
+    TmFix, TmUnit, TmRecord, TmProjection, TmTagging, TmCase, TmReference, TmDereference, TmAssignment, Info
+from src.type import RecordType
+
+
+class CompilationError(Exception):
+    def __init__(self, msg: str, term: Term):
+        self.msg = msg
+        self.term = term
+
+    def __str__(self):
+        return f"[Compilation Error] {self.msg}\n" \
+               f"- program: {self.term}\n" \
+               f"- position: {self.term.info}"
+
+
+class NonTermination(Exception):
+    """ Raised by the compiled code, when a `fix` point is forced before being defined. """
+    pass
+
+
+'''
+Runtime representation of the values:
+- Nat: a non negative int
+- Bool: bool
+- Unit: None
+- records: instances of the tuple subclasses created by `record_layout`, one per a sequence of labels
+- variants: Tagged tuples
+- references: single element lists
+- abstractions: python functions
+'''
+
+
+class Tagged(NamedTuple):
+    label: str
+    value: Any
+
+
+class RecordValue(tuple):
+    '''
+    Base class for the runtime records. Each layout (ordered sequence of labels) gets its own subclass,
+    where the `slots` dictionary maps the labels to the precomputed tuple indexes.
+    '''
+    labels: tuple[str, ...] = ()
+    slots: dict[str, int] = {}
+
+
+_layouts: dict[tuple[str, ...], type[RecordValue]] = {}
+
+
+def record_layout(labels: tuple[str, ...]) -> type[RecordValue]:
+    if labels not in _layouts:
+        slots = {l: i for i, l in enumerate(labels)}
+        _layouts[labels] = type(f"Record{len(_layouts)}", (RecordValue,), {'labels': labels, 'slots': slots,
+                                                                           '__slots__': ()})
+    return _layouts[labels]
+
+
+def project(record: RecordValue, label: str) -> Any:
+    return record[record.slots[label]]
+
+
+class _Blackhole:
+    """ Placeholder stored in a `fix` cell until the fixed point gets computed. """
+    def __call__(self, *args):
+        raise NonTermination()
+
+    def __getitem__(self, item):
+        raise NonTermination()
+
+    def __getattr__(self, item):
+        raise NonTermination()
+
+
+RUNTIME = {
+    '_record_layout': record_layout,
+    '_proj': project,
+    '_Tagged': Tagged,
+    '_blackhole': _Blackhole(),
+}
+
+
+@dataclass(frozen=True)
+class CompiledProgram:
+    '''
+    Result of the compilation.
+
+    Attributes:
+    ===========
+    source: str
+        generated python source
+    code: CodeType
+        compiled module, defining a `_main` function
+    '''
+    source: str
+    code: CodeType
+
+    def run(self) -> Any:
+        namespace = dict(RUNTIME)
+        exec(self.code, namespace)
+        return namespace['_main']()
+
+
+class _Emitter:
+    '''
+    Helper accumulating the python source of a single program.
+    Terms are translated into expressions, while the abstractions are hoisted into `def` statements
+    preceding the expression that uses them. Python closures are late binding,
+    so a hoisted `def` may safely refer to a variable assigned later in the same expression.
+    Given the types of the subterms, a projection from a record reads the slot its static type assigns to the label,
+    guarded by a layout check — thanks to the subtyping the runtime record may have more (or permuted) fields.
+    '''
+    def __init__(self, types: Optional[TypeAnnotations] = None):
+        self.counter = 0
+        self.layouts: dict[tuple[str, ...], str] = {}
+        self.types = types
+
+    def fresh(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def layout(self, labels: tuple[str, ...]) -> str:
+        if labels not in self.layouts:
+            self.layouts[labels] = f"_L{len(self.layouts)}"
+        return self.layouts[labels]
+
+    def function(self, name: str, param: str, body: Term, env: list[str], out: list[str], indent: str) -> None:
+        body_out: list[str] = []
+        body_expr = self.expr(body, [param] + env, body_out, indent + "    ")
+        out.append(f"{indent}def {name}({param}):")
+        out.extend(body_out)
+        out.append(f"{indent}    return {body_expr}")
+
+    def expr(self, term: Term, env: list[str], out: list[str], indent: str) -> str:
+        """
+        Translates the term into a python expression.
+
+        :param term: term to be translated
+        :param env: python expressions corresponding to the de Bruijn indices
+        :param out: statements that have to be executed before the expression
+        :param indent: indentation of the statements
+        :return: python expression computing value of the term
+        """
+        match term:
+            case TmVar(_, index, _):
+                if index >= len(env):
+                    raise CompilationError("free variables can't be compiled", term)
+                return env[index]
+            case TmTrue():
+                return "True"
+            case TmFalse():
+                return "False"
+            case TmZero():
+                return "0"
+            case TmUnit():
+                return "None"
+            case TmSucc(_, t1):
+                return f"({self.expr(t1, env, out, indent)} + 1)"
+            case TmPred(_, t1):
+                return f"max({self.expr(t1, env, out, indent)} - 1, 0)"
+            case TmIsZero(_, t1):
+                return f"({self.expr(t1, env, out, indent)} == 0)"
+            case TmIf(_, t1, t2, t3):
+                cond = self.expr(t1, env, out, indent)
+                return f"({self.expr(t2, env, out, indent)} if {cond} else {self.expr(t3, env, out, indent)})"
+            case TmAbs(_, _, _, body):
+                name = self.fresh("_fn")
+                self.function(name, self.fresh("v"), body, env, out, indent)
+                return name
+            case TmApp(_, t1, t2):
+                return f"{self.expr(t1, env, out, indent)}({self.expr(t2, env, out, indent)})"
+            case TmLet(_, _, rvalue, body):
+                var = self.fresh("v")
+                return f"({var} := {self.expr(rvalue, env, out, indent)}, {self.expr(body, [var] + env, out, indent)})[1]"
+            case TmFix(_, TmAbs(_, _, _, TmAbs(_, _, _, body))):
+                name = self.fresh("_rec")
+                self.function(name, self.fresh("v"), body, [name] + env, out, indent)
+                return name
+            case TmFix(_, TmAbs(_, _, _, body)):
+                cell = self.fresh("_cell")
+                out.append(f"{indent}{cell} = [_blackhole]")
+                return f"({cell}.__setitem__(0, {self.expr(body, [f'{cell}[0]'] + env, out, indent)}), {cell}[0])[1]"
+            case TmRecord(_, rs):
+                layout = self.layout(tuple(rs.keys()))
+                fields = "".join(f"{self.expr(t, env, out, indent)}, " for t in rs.values())
+                return f"{layout}(({fields}))"
+            case TmProjection(_, t1, l):
+                record = self.expr(t1, env, out, indent)
+                record_type = self.types.type_of(t1) if self.types is not None else None
+                if not isinstance(record_type, RecordType):
+                    return f"_proj({record}, {l!r})"
+                labels = tuple(record_type.records_types.keys())
+                if record.isidentifier():
+                    var, value = record, record
+                else:
+                    var = self.fresh("v")
+                    value = f"({var} := {record})"
+                return f"({var}[{labels.index(l)}] if {value}.__class__ is {self.layout(labels)} " \
+                       f"else {var}[{var}.slots[{l!r}]])"
+            case TmTagging(_, l, t1):
+                return f"_Tagged({l!r}, {self.expr(t1, env, out, indent)})"
+            case TmCase(_, t1, vs, bs):
+                var = self.fresh("v")
+                labels = list(vs.keys())
+                branches = [self.expr(bs[l], [f"{var}[1]"] + env, out, indent) for l in labels]
+                chain = branches[-1]
+                for label, branch in reversed(list(zip(labels[:-1], branches[:-1]))):
+                    chain = f"{branch} if {var}[0] == {label!r} else {chain}"
+                return f"({var} := {self.expr(t1, env, out, indent)}, {chain})[1]"
+            case TmReference(_, t1):
+                return f"[{self.expr(t1, env, out, indent)}]"
+            case TmDereference(_, t1):
+                return f"{self.expr(t1, env, out, indent)}[0]"
+            case TmAssignment(_, t1, t2):
+                return f"{self.expr(t1, env, out, indent)}.__setitem__(0, {self.expr(t2, env, out, indent)})"
+            case _:
+                raise CompilationError("term can't be compiled", term)
+
+
+class PythonCompiler:
+    '''
+        Compiles a (typechecked and expanded) program into python source,
+        which is later compiled with the builtin `compile` function.
+        The code objects are cached (at most CODE_CACHE_SIZE of them, least recently used are evicted)
+        with the structural key of the program, so running the same program twice doesn't pay for the code generation again.
+        The compiled code uses native python calls, so a program recursing deeper than the python recursion limit
+        is reported as a CompilationError.
+        With `specialize` set, the code is specialized using the types of the subterms (see TypeAnnotations).
+        It's off by default: it pays off only for projections from records of exactly the static layout,
+        while the code generation typechecks the program again (see benchmarks/bench_typed_compiler.py).
+
+        Methods:
+            - emit(program: TypedLambdaProgram[Term]) -> str
+                returns the generated python source
+            - compile(program: TypedLambdaProgram[Term]) -> CompiledProgram
+                returns the compiled program
+            - run(program: TypedLambdaProgram[Term]) -> LambdaProgramState | None
+                runs the program and reads back its result (None if the result is a function)
+    '''
+    CODE_CACHE_SIZE = 128
+    _code_cache: OrderedDict[tuple, CompiledProgram] = OrderedDict()
+
+    def __init__(self, specialize: bool = False):
+        self.specialize = specialize
+
+    def emit(self, program: TypedLambdaProgram[Term]) -> str:
+        emitter = _Emitter(TypedLambdaTypechecker().annotate(program) if self.specialize else None)
+        body: list[str] = []
+        result = emitter.expr(program.state.term, [], body, "    ")
+        lines = [f"{name} = _record_layout({labels!r})" for labels, name in emitter.layouts.items()]
+        lines.append("def _main():")
+        lines.extend(body)
+        lines.append(f"    return {result}")
+        return "\n".join(lines) + "\n"
+
+    def compile(self, program: TypedLambdaProgram[Term]) -> CompiledProgram:
+        key = (self.specialize, term_structural_key(program.state.term))
+        compiled = self._code_cache.get(key)
+        if compiled is None:
+            source = self.emit(program)
+            compiled = CompiledProgram(source, compile(source, "<lambda program>", "exec"))
+            self._code_cache[key] = compiled
+            if len(self._code_cache) > self.CODE_CACHE_SIZE:
+                self._code_cache.popitem(last=False)
+        else:
+            self._code_cache.move_to_end(key)
+        return compiled
+
+    def run(self, program: TypedLambdaProgram[Term]) -> LambdaProgramState | None:
+        compiled = self.compile(program)
+        try:
+            return reify(compiled.run())
+        except RecursionError:
+            raise CompilationError(f"the compiled program exceeded the python recursion limit "
+                                   f"({sys.getrecursionlimit()} nested calls)", program.state.term)
+
+
+class _FunctionalValue(Exception):
+    pass
+
+
+def reify(value: Any) -> LambdaProgramState | None:
+    """
+    Reads back a runtime value as a program state.
+    References are put into a fresh memory in the order they are encountered.
+
+    :param value: value returned by a compiled program
+    :return: state containing a term corresponding to the value,
+             None if the value contains a function (they can't be read back)
+    """
+    memory = Memory()
+    locations: dict[int, Term] = {}
+
+    def _reify(v: Any) -> Term:
+        nonlocal memory
+        info = Info.dummy_info()
+        match v:
+            case bool():
+                return TmTrue(info) if v else TmFalse(info)
+            case int():
+                term = TmZero(info)
+                for _ in range(v):
+                    term = TmSucc(info, term)
+                return term
+            case None:
+                return TmUnit(info)
+            case RecordValue():
+                return TmRecord(info, OrderedDict(zip(v.labels, [_reify(f) for f in v])))
+            case Tagged(label, tagged):
+                return TmTagging(info, label, _reify(tagged))
+            case list():
+                if id(v) not in locations:
+                    memory, location = memory.put(TmUnit(info))
+                    locations[id(v)] = location
+                    memory = memory.replace(location, _reify(v[0]))
+                return locations[id(v)]
+            case _:
+                raise _FunctionalValue()
+
+    try:
+        term = _reify(value)
+    except _FunctionalValue:
+        return None
+    return LambdaProgramState(term, memory)
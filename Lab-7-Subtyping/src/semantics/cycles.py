@@ -0,0 +1,200 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from src.lambda_program import LambdaProgramState
+from src.memory import Memory, MutableMemory, StaleMemoryError, _changed_cells
+from src.persistent_vector import PersistentVector
+from src.semantics.evaluator import Diverges
+from src.semantics.hashcons import HashConser
+from src.semantics.term_utils import term_children, term_node_key
+from src.term import Term, TmStoreLocation, Info
+
+
+_MASK = (1 << 64) - 1
+
+
+@dataclass(frozen=True)
+class StateSnapshot:
+    '''
+    Immutable copy of a program state, kept to confirm that two states with equal fingerprints are really the same.
+
+    Attributes:
+    ===========
+    term: Term
+        term of the state (terms are immutable, so it's shared with the state)
+    cells: PersistentVector
+        contents of the memory, shared with the persistent memories and between the consecutive snapshots
+    '''
+    term: Term
+    cells: PersistentVector
+
+    def same_as(self, other: StateSnapshot) -> bool:
+        """ Compares the states structurally, ignoring the debug info and names of the bound variables. """
+        if len(self.cells) != len(other.cells):
+            return False
+        interner = HashConser()
+        return [interner.intern(t) for t in (self.term, *self.cells)] == \
+            [interner.intern(t) for t in (other.term, *other.cells)]
+
+
+class StateFingerprinter:
+    '''
+        Computes structural hashes of the program states (the term together with the memory).
+        Debug info and names of the bound variables don't matter, as they don't change the evaluation.
+
+        Hashes are incremental: the nodes of the previous term are remembered by their identity,
+        and a single step rebuilds only the path to the reduced subterm, so most of the new term is reused.
+        Only the nodes of the last term are kept, hence the memory stays proportional to the state size.
+        The memory hash is a sum of the hashes of (address, cell) pairs, updated only for the cells changed
+        since the previous state, so the unchanged cells aren't visited at all.
+
+        The fingerprints may collide, so `snapshot` returns a copy of the last state for the structural comparison.
+    '''
+    def __init__(self):
+        self._cache: dict[int, tuple[Term, int]] = {}
+        self._memory: Memory | MutableMemory | None = None
+        self._cells = PersistentVector()
+        self._cell_hashes: list[int] = []
+        self._memory_hash = 0
+        self._term: Term | None = None
+
+    def fingerprint(self, state: LambdaProgramState) -> int:
+        changed = self._changed_addresses(state.memory)
+        cells = [state.memory.dereference(TmStoreLocation(Info.dummy_info(), a)) for a in changed]
+        term_hash, *cell_hashes = self._hash_terms([state.term, *cells])
+        for address, cell, cell_hash in zip(changed, cells, cell_hashes):
+            if address < len(self._cell_hashes):
+                self._memory_hash -= self._cell_hashes[address]
+                self._cell_hashes[address] = hash((address, cell_hash))
+                self._cells = self._cells.set(address, cell)
+            else:
+                self._cell_hashes.append(hash((address, cell_hash)))
+                self._cells = self._cells.append(cell)
+            self._memory_hash = (self._memory_hash + self._cell_hashes[address]) & _MASK
+        self._memory = state.memory
+        self._term = state.term
+        return hash((term_hash, len(self._cell_hashes), self._memory_hash))
+
+    def snapshot(self) -> StateSnapshot:
+        """ Returns the snapshot of the last fingerprinted state. """
+        return StateSnapshot(self._term, self._cells)
+
+    def _changed_addresses(self, memory: Memory | MutableMemory) -> list[int]:
+        if len(memory) < len(self._cell_hashes):
+            # the memory has been compacted (or replaced), start from scratch
+            self._cells, self._cell_hashes, self._memory_hash, self._memory = PersistentVector(), [], 0, None
+        if self._memory is not None:
+            try:
+                return memory.changed_addresses(self._memory)
+            except StaleMemoryError:
+                pass
+        # without the previous memory (or its undo log) the cells are compared with the copy by identity
+        return _changed_cells(list(memory), list(self._cells))
+
+    def _hash_terms(self, roots: list[Term]) -> list[int]:
+        cache = self._cache
+        new_cache: dict[int, tuple[Term, int]] = {}
+        results: list[int] = []
+        stack: list[tuple[Term, list | None]] = [(root, None) for root in reversed(roots)]
+        while stack:
+            term, children = stack.pop()
+            if children is None:
+                entry = cache.get(id(term))
+                if entry is not None and entry[0] is term:
+                    new_cache[id(term)] = entry
+                    results.append(entry[1])
+                    continue
+                children = term_children(term)
+                if children:
+                    stack.append((term, children))
+                    stack.extend((child, None) for child, _ in reversed(children))
+                    continue
+            arity = len(children)
+            args = results[len(results) - arity:] if arity else []
+            del results[len(results) - arity:]
+            h = hash(term_node_key(term, args))
+            new_cache[id(term)] = (term, h)
+            results.append(h)
+        self._cache = new_cache
+        return results
+
+
+class CycleDetector:
+    '''
+        Watches the consecutive states of a (deterministic) evaluation and raises Diverges,
+        when a state repeats — from then on the evaluation would loop forever.
+
+        Modes:
+            - full: remembers all the states, finds the cycle as soon as it's closed
+            - brent: Brent's algorithm, constant memory, finds the cycle within twice its (pre)period
+            - sampled: remembers every n-th state, doubling n whenever `max_samples` is exceeded
+
+        The states are compared by their fingerprints first, a match is confirmed by the structural comparison
+        of the remembered snapshot (see StateSnapshot), so a hash collision can't stop a terminating evaluation.
+        The snapshots share the terms with the states, and the memory cells with each other.
+
+        Methods:
+            - observe(state: LambdaProgramState) -> None
+                registers the next state of the evaluation
+                raises Diverges if the state has already been observed
+    '''
+    MODES = ('full', 'brent', 'sampled')
+
+    def __init__(self, mode: str = 'brent', max_samples: int = 4096):
+        if mode not in self.MODES:
+            raise ValueError(f"unknown cycle detection mode: {mode}")
+        self.mode = mode
+        self.max_samples = max_samples
+        self.steps = -1
+        self.collisions = 0
+        self._fingerprinter = StateFingerprinter()
+        self._seen: dict[int, list[tuple[int, StateSnapshot]]] = {}
+        self._samples = 0
+        self._interval = 1
+        self._tortoise: tuple[int, StateSnapshot] | None = None
+        self._power = 1
+        self._lam = 1
+
+    def _same_state(self, snapshot: StateSnapshot) -> bool:
+        if snapshot.same_as(self._fingerprinter.snapshot()):
+            return True
+        self.collisions += 1
+        return False
+
+    def observe(self, state: LambdaProgramState) -> None:
+        self.steps += 1
+        fingerprint = self._fingerprinter.fingerprint(state)
+        if self.mode == 'brent':
+            self._observe_brent(state, fingerprint)
+            return
+
+        for first_seen, snapshot in self._seen.get(fingerprint, ()):
+            if self._same_state(snapshot):
+                raise Diverges(state, self.steps - first_seen, self.steps)
+        if self.steps % self._interval == 0:
+            self._seen.setdefault(fingerprint, []).append((self.steps, self._fingerprinter.snapshot()))
+            self._samples += 1
+            if self.mode == 'sampled' and self._samples > self.max_samples:
+                self._interval *= 2
+                sampled = {f: [(step, snapshot) for step, snapshot in states if step % self._interval == 0]
+                           for f, states in self._seen.items()}
+                self._seen = {f: states for f, states in sampled.items() if states}
+                self._samples = sum(len(states) for states in self._seen.values())
+
+    def _observe_brent(self, state: LambdaProgramState, fingerprint: int) -> None:
+        if self._tortoise is None:
+            self._tortoise = fingerprint, self._fingerprinter.snapshot()
+            return
+        if fingerprint == self._tortoise[0] and self._same_state(self._tortoise[1]):
+            raise Diverges(state, self._lam, self.steps)
+        if self._power == self._lam:
+            self._tortoise = fingerprint, self._fingerprinter.snapshot()
+            self._power *= 2
+            self._lam = 0
+        self._lam += 1
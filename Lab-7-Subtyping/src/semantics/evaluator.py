@@ -15,6 +15,7 @@ from src.term import Term, TmAbs, TmVar, TmApp, TmTrue, TmFalse, TmZero, TmSucc,
 from src.lambda_program import TypedLambdaProgram, LambdaProgramState
 from dataclasses import dataclass
 from enum import Enum, auto
+from typing import Callable
 
 
 class EvalRule(Enum):
@@ -48,6 +49,7 @@ class EvalRule(Enum):
     Assign = auto()
     Assign1 = auto()
     Assign2 = auto()
+    AppMemo = auto()
 
     def __str__(self):
         return f"E-{self.name}".replace('_', '')
@@ -56,11 +58,61 @@ class EvalRule(Enum):
         return f"EvalRule.{self.name}"
 
 
+@dataclass(frozen=True)
+class CustomRule:
+    """
+    Label of an evaluation rule that is not one of the EvalRule members, reported by a handler added with
+    `TypedLambdaEvaluator.register_rule`. It's printed and counted like an EvalRule.
+    The labels are interned by `named`, their values are allocated after the EvalRule ones (see `eval_rule`),
+    so they fit into the rule byte of the binary traces written and read by the same process.
+
+    Attributes:
+    ===========
+    name: str
+        name of the rule, printed as E-<name>
+    value: int
+        numeric code of the rule
+    """
+    name: str
+    value: int
+
+    FIRST_VALUE = 64
+    _registry = {}
+
+    @staticmethod
+    def named(name: str) -> CustomRule:
+        """ Returns the rule label with the given name, registering it on the first call. """
+        if name in EvalRule.__members__:
+            raise ValueError(f"E-{name} is already an EvalRule")
+        if name not in CustomRule._registry:
+            value = CustomRule.FIRST_VALUE + len(CustomRule._registry)
+            if value > 255:
+                raise ValueError("too many custom evaluation rules")
+            CustomRule._registry[name] = CustomRule(name, value)
+        return CustomRule._registry[name]
+
+    def __str__(self):
+        return f"E-{self.name}"
+
+
+Rule = EvalRule | CustomRule
+
+
+def eval_rule(value: int) -> Rule:
+    """ Finds the rule (EvalRule or a registered CustomRule) with the given numeric code. """
+    if value < CustomRule.FIRST_VALUE:
+        return EvalRule(value)
+    for rule in CustomRule._registry.values():
+        if rule.value == value:
+            return rule
+    raise ValueError(f"{value} is not a code of a registered evaluation rule")
+
+
 @dataclass(frozen=True)
 class Transition:
     old_state: LambdaProgramState
     new_state: LambdaProgramState
-    rule: EvalRule
+    rule: Rule
     name_context: list[str]
     witnesses: tuple[Transition] = ()
 
@@ -76,16 +128,81 @@ class NoEvalRuleApplies(Exception):
         return f"No evaluation rule applies to state: {self.state}"
 
 
+class EvaluationBudgetExceeded(Exception):
+    def __init__(self, state: LambdaProgramState, budget: int):
+        self.state = state
+        self.budget = budget
+
+    def __str__(self):
+        return f"Evaluation exceeded the budget of {self.budget} nested evaluation contexts"
+
+
+class Diverges(Exception):
+    def __init__(self, state: LambdaProgramState, cycle_length: int, step: int):
+        self.state = state
+        self.cycle_length = cycle_length
+        self.step = step
+
+    def __str__(self):
+        return f"Evaluation revisited a state after {self.step} steps, it loops with a cycle of length {self.cycle_length}"
+
+
+@dataclass(frozen=True)
+class Reduction:
+    """
+    Result of an axiom rule (one without premises).
+
+    Attributes:
+    ===========
+    update: Term | Memory | LambdaProgramState
+        the new term, memory or the whole new state
+    rule: Rule
+        the applied rule
+    """
+    update: Term | Memory | LambdaProgramState
+    rule: Rule
+
+
+@dataclass(frozen=True)
+class Congruence:
+    """
+    Result of a congruence rule: the evaluation continues in a subterm.
+
+    Attributes:
+    ===========
+    subterm: Term
+        the subterm that has to make a step
+    rebuild: Callable[[Term], Term]
+        plugs the stepped subterm back into the evaluation context
+    rule: Rule
+        the applied rule
+    """
+    subterm: Term
+    rebuild: Callable[[Term], Term]
+    rule: Rule
+
+
 class TypedLambdaEvaluator:
     '''
         Class representing semantics of the untyped lambda calculus.
 
+        The congruence rules don't recurse: single_step descends through the evaluation contexts
+        with an explicit stack, so the depth of the evaluated terms is limited only by the stack budget.
+
         Attributes:
             - name_context: list[str]
                 This list stores names of the free variables in order to print them in a pretty way :)
+            - stack_budget: int
+                maximal number of nested evaluation contexts (i.e. the witness depth) of a single step,
+                exceeding it raises EvaluationBudgetExceeded
+            - rules: dict[type, RuleHandler]
+                maps term classes to the handlers implementing their evaluation rules,
+                it can be extended with `register_rule`
     '''
-    def __init__(self, name_context: list[str]):
+    def __init__(self, name_context: list[str], stack_budget: int = 1_000_000):
         self.name_context = name_context
+        self.stack_budget = stack_budget
+        self.rules: dict[type, RuleHandler] = dict(DEFAULT_RULES)
 
     def single_step(self, state_before: LambdaProgramState) -> Transition:
         """
@@ -95,134 +212,213 @@ class TypedLambdaEvaluator:
              :param state_before: a Lambda Calculus state
              :return: a transition applied according the Lambda Calculus semantics
         """
+        contexts: list[tuple[LambdaProgramState, Congruence]] = []
+        state = state_before
+        step = self._decompose(state)
+        while isinstance(step, Congruence):
+            if len(contexts) >= self.stack_budget:
+                raise EvaluationBudgetExceeded(state_before, self.stack_budget)
+            contexts.append((state, step))
+            state = state.replace_term(step.subterm)
+            step = self._decompose(state)
+
+        transition = Transition(state, self._updated_state(state, step.update), step.rule, self.name_context)
+        for outer_state, congruence in reversed(contexts):
+            new_state = transition.new_state.replace_term(congruence.rebuild(transition.new_state.term))
+            transition = Transition(outer_state, new_state, congruence.rule, self.name_context, (transition,))
+        return transition
+
+    def reduce_redex(self, state: LambdaProgramState) -> Transition:
+        """
+             Applies an axiom to the term of the state, without looking for a redex inside it.
+
+             :param state: a Lambda Calculus state, whose term is a redex
+             :return: a transition without witnesses
+             :raise NoEvalRuleApplies: if the term is not a redex
+        """
+        step = self._decompose(state)
+        if isinstance(step, Congruence):
+            raise NoEvalRuleApplies(state)
+        return Transition(state, self._updated_state(state, step.update), step.rule, self.name_context)
+
+    @staticmethod
+    def _updated_state(state: LambdaProgramState, update: Term | Memory | LambdaProgramState) -> LambdaProgramState:
+        """
+            Just a helper function to quickly update the state
+            It will create a new state based on the old one and provided info.
+        """
+        match update:
+            case BaseTerm():
+                return state.replace_term(update)
+            case Memory():
+                return state.replace_memory(update)
+            case LambdaProgramState():
+                return update
+
+    def _decompose(self, state: LambdaProgramState) -> Reduction | Congruence:
+        """
+            Finds the rule applicable to the term of the state using the rule table.
+            Axioms are applied immediately, congruence rules only point at the subterm to be evaluated.
+
+            :param state: a Lambda Calculus state
+            :return: either the result of an axiom or the congruence to follow
+        """
+        handler = self.rules.get(type(state.term))
+        if handler is None:
+            raise NoEvalRuleApplies(state)
+        return handler(state)
+
+    def register_rule(self, term_class: type, handler: RuleHandler) -> None:
+        """
+            Adds or overrides the handler responsible for the given kind of terms.
+            The handler should raise NoEvalRuleApplies if none of its rules applies.
+            The handler may report one of the EvalRule members or a new rule label created by `CustomRule.named`.
+
+            :param term_class: class of the terms handled by the handler
+            :param handler: function returning a Reduction or a Congruence for the given state
+        """
+        self.rules[term_class] = handler
+
+
+'''
+Rule handlers, each one is responsible for a single class of terms.
+They get a state with the term of their class and return the result of the applicable rule.
+'''
+RuleHandler = Callable[[LambdaProgramState], Reduction | Congruence]
+
+
+def _eval_app(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, function, arg = state.term.info, state.term.function, state.term.arg
+    if not term_is_val(function):
+        return Congruence(function, lambda t: TmApp(fi, t, arg), EvalRule.App1)
+    if not term_is_val(arg):
+        return Congruence(arg, lambda t: TmApp(fi, function, t), EvalRule.App2)
+    if isinstance(function, TmAbs):
+        return Reduction(term_substitute(arg, function.body), EvalRule.AppAbs)
+    raise NoEvalRuleApplies(state)
+
+
+def _eval_if(state: LambdaProgramState) -> Reduction | Congruence:
+    match state.term:
+        case TmIf(_, TmTrue(_), t2, _):
+            return Reduction(t2, EvalRule.IfTrue)
+        case TmIf(_, TmFalse(_), _, t3):
+            return Reduction(t3, EvalRule.IfFalse)
+        case TmIf(fi, t1, t2, t3):
+            return Congruence(t1, lambda t: TmIf(fi, t, t2, t3), EvalRule.If)
+
+
+def _eval_succ(state: LambdaProgramState) -> Reduction | Congruence:
+    fi = state.term.info
+    return Congruence(state.term.number, lambda t: TmSucc(fi, t), EvalRule.Succ)
+
+
+def _eval_pred(state: LambdaProgramState) -> Reduction | Congruence:
+    match state.term:
+        case TmPred(_, TmZero(_)):
+            return Reduction(TmZero(Info.dummy_info()), EvalRule.PredZero)
+        case TmPred(_, TmSucc(_, nv)) if term_is_numeric_val(nv):
+            return Reduction(nv, EvalRule.PredSucc)
+        case TmPred(fi, t1):
+            return Congruence(t1, lambda t: TmPred(fi, t), EvalRule.Pred)
+
+
+def _eval_is_zero(state: LambdaProgramState) -> Reduction | Congruence:
+    match state.term:
+        case TmIsZero(_, TmZero(_)):
+            return Reduction(TmTrue(Info.dummy_info()), EvalRule.IsZeroZero)
+        case TmIsZero(_, TmSucc(_, nv)) if term_is_numeric_val(nv):
+            return Reduction(TmFalse(Info.dummy_info()), EvalRule.IsZeroSucc)
+        case TmIsZero(fi, t1):
+            return Congruence(t1, lambda t: TmIsZero(fi, t), EvalRule.IsZero)
+
+
+def _eval_let(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, var, rvalue, body = state.term.info, state.term.var, state.term.rvalue, state.term.body
+    if term_is_val(rvalue):
+        return Reduction(term_substitute(rvalue, body), EvalRule.LetV)
+    return Congruence(rvalue, lambda t: TmLet(fi, var, t, body), EvalRule.Let)
+
+
+def _eval_fix(state: LambdaProgramState) -> Reduction | Congruence:
+    match state.term:
+        case TmFix(_, TmAbs(_, x, xt, function)):
+            y = TmFix(Info.dummy_info(), TmAbs(Info.dummy_info(), x, xt, function))
+            return Reduction(term_substitute(y, function), EvalRule.FixBeta)
+        case TmFix(fi, t1):
+            return Congruence(t1, lambda t: TmFix(fi, t), EvalRule.Fix)
+
+
+def _eval_record(state: LambdaProgramState) -> Reduction | Congruence:
+    record = state.term
+    for l, t1 in record.records.items():
+        if not term_is_val(t1):
+            return Congruence(t1, lambda t: record.replace(l, t), EvalRule.Rcd)
+    raise NoEvalRuleApplies(state)
+
+
+def _eval_projection(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, t1, l = state.term.info, state.term.record, state.term.label
+    if not term_is_val(t1):
+        return Congruence(t1, lambda t: TmProjection(fi, t, l), EvalRule.Proj)
+    if isinstance(t1, TmRecord):
+        return Reduction(t1.records[l], EvalRule.ProjRcd)
+    raise NoEvalRuleApplies(state)
+
+
+def _eval_tagging(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, l, t1 = state.term.info, state.term.label, state.term.term
+    if not term_is_val(t1):
+        return Congruence(t1, lambda t: TmTagging(fi, l, t), EvalRule.Variant)
+    raise NoEvalRuleApplies(state)
+
+
+def _eval_case(state: LambdaProgramState) -> Reduction | Congruence:
+    match state.term:
+        case TmCase(_, TmTagging(_, l, v), _, branches) if term_is_val(v):
+            return Reduction(term_substitute(v, branches[l]), EvalRule.CaseVariant)
+        case TmCase(fi, t1, vs, bs):
+            return Congruence(t1, lambda t: TmCase(fi, t, vs, bs), EvalRule.Case)
+
+
+def _eval_reference(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, t1 = state.term.info, state.term.arg
+    if term_is_val(t1):
+        new_memory, location = state.memory.put(t1)
+        return Reduction(LambdaProgramState(location, new_memory), EvalRule.RefV)
+    return Congruence(t1, lambda t: TmReference(fi, t), EvalRule.Ref)
+
+
+def _eval_dereference(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, t1 = state.term.info, state.term.arg
+    if term_is_val(t1):
+        return Reduction(state.memory.dereference(t1), EvalRule.DerefLoc)
+    return Congruence(t1, lambda t: TmDereference(fi, t), EvalRule.Deref)
+
+
+def _eval_assignment(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, t1, t2 = state.term.info, state.term.left_side, state.term.right_side
+    if not term_is_val(t1):
+        return Congruence(t1, lambda t: TmAssignment(fi, t, t2), EvalRule.Assign1)
+    if not term_is_val(t2):
+        return Congruence(t2, lambda t: TmAssignment(fi, t1, t), EvalRule.Assign2)
+    new_memory = state.memory.replace(t1, t2)
+    return Reduction(LambdaProgramState(TmUnit(Info.dummy_info()), new_memory), EvalRule.Assign)
+
 
-        def updated_state(update: Term | Memory | LambdaProgramState) -> LambdaProgramState:
-            """
-                Just a helper function to quickly update the state
-                It will create a new state based on the old one and provided info.
-            """
-            match update:
-                case BaseTerm():
-                    return state_before.replace_term(update)
-                case Memory():
-                    return state_before.replace_memory(update)
-                case LambdaProgramState():
-                    return update
-
-        def transition(update: Term | Memory | LambdaProgramState,
-                       rule: EvalRule,
-                       witnesses: tuple(Transition) = ()) -> Transition:
-            """ Just a helper function to quickly create a transition """
-            return Transition(state_before, updated_state(update), rule, self.name_context, witnesses)
-
-        match state_before.term:
-            case TmApp(_, TmAbs(_, _, _, function), arg) if term_is_val(arg):
-                new_state = term_substitute(arg, function)
-                return transition(new_state, EvalRule.AppAbs)
-            case TmApp(fi, function, arg) if not term_is_val(function):
-                witness = self.single_step(updated_state(function))
-                new_state = witness.new_state.replace_term(TmApp(fi, witness.new_state.term, arg))
-                return transition(new_state, EvalRule.App1, (witness,))
-            case TmApp(fi, function, arg) if not term_is_val(arg):
-                witness = self.single_step(updated_state(arg))
-                new_state = witness.new_state.replace_term(TmApp(fi, function, witness.new_state.term))
-                return transition(new_state, EvalRule.App2, (witness,))
-            case TmIf(_, TmTrue(_), t2, _):
-                return transition(t2, EvalRule.IfTrue)
-            case TmIf(_, TmFalse(_), _, t3):
-                return transition(t3, EvalRule.IfFalse)
-            case TmIf(fi, t1, t2, t3):
-                witness = self.single_step(updated_state(t1))
-                new_state = witness.new_state.replace_term(TmIf(fi, witness.new_state.term, t2, t3))
-                return transition(new_state, EvalRule.If, (witness,))
-            case TmSucc(fi, t1):
-                witness = self.single_step(updated_state(t1))
-                new_state = witness.new_state.replace_term(TmSucc(fi, witness.new_state.term))
-                return transition(new_state, EvalRule.Succ, (witness,))
-            case TmPred(_, TmZero(_)):
-                return transition(TmZero(Info.dummy_info()), EvalRule.PredZero)
-            case TmPred(_, TmSucc(_, nv)) if term_is_numeric_val(nv):
-                return transition(nv, EvalRule.PredSucc)
-            case TmPred(fi, t1):
-                witness = self.single_step(updated_state(t1))
-                new_state = witness.new_state.replace_term(TmPred(fi, witness.new_state.term))
-                return transition(new_state, EvalRule.Pred, (witness,))
-            case TmIsZero(_, TmZero(_)):
-                return transition(TmTrue(Info.dummy_info()), EvalRule.IsZeroZero)
-            case TmIsZero(_, TmSucc(_, nv)) if term_is_numeric_val(nv):
-                return transition(TmFalse(Info.dummy_info()), EvalRule.IsZeroSucc)
-            case TmIsZero(fi, t1):
-                witness = self.single_step(updated_state(t1))
-                new_state = witness.new_state.replace_term(TmIsZero(fi, witness.new_state.term))
-                return transition(new_state, EvalRule.IsZero, (witness,))
-            case TmLet(_, _, rvalue, body) if term_is_val(rvalue):
-                new_state = term_substitute(rvalue, body)
-                return transition(new_state, EvalRule.LetV)
-            case TmLet(fi, var, rterm, body):
-                witness = self.single_step(updated_state(rterm))
-                new_state = witness.new_state.replace_term(TmLet(fi, var, witness.new_state.term, body))
-                return transition(new_state, EvalRule.Let, (witness,))
-            case TmFix(_, TmAbs(_, x, xt, function)):
-                y = TmFix(Info.dummy_info(), TmAbs(Info.dummy_info(), x, xt, function))
-                new_term = term_substitute(y, function)
-                return transition(new_term, EvalRule.FixBeta)
-            case TmFix(fi, t1):
-                witness = self.single_step(updated_state(t1))
-                new_state = witness.new_state.replace_term((TmFix(fi, witness.new_state.term)))
-                return transition(new_state, EvalRule.Fix, (witness,))
-            case TmRecord(_, ts) as r if not term_is_val(r):
-                l,t = next((l,t) for l,t in ts.items() if not term_is_val(t))
-                witness = self.single_step(updated_state(t))
-                assert isinstance(r, TmRecord)
-                new_term = r.replace(l, witness.new_state.term)
-                new_state = witness.new_state.replace_term(new_term)
-                return transition(new_state, EvalRule.Rcd, (witness,))
-            case TmProjection(_, t, l) if term_is_val(t):
-                match t:
-                    case TmRecord(_, rs):
-                        return transition(rs[l], EvalRule.ProjRcd)
-                    case _:
-                        raise NoEvalRuleApplies(state_before)
-            case TmProjection(fi, t, l):
-                witness = self.single_step(updated_state(t))
-                new_state = witness.new_state.replace_term(TmProjection(fi, witness.new_state.term, l))
-                return transition(new_state, EvalRule.Proj, (witness,))
-            case TmTagging(fi, l, t, tyT) if not term_is_val(t):
-                witness = self.single_step(updated_state(t))
-                new_state = witness.new_state.replace_term(TmTagging(fi, l, witness.new_state.term, tyT))
-                return transition(new_state, EvalRule.Variant, (witness,))
-            case TmCase(_, TmTagging(_, l, v), _, branches) if term_is_val(v):
-                new_branch = term_substitute(v, branches[l])
-                return transition(new_branch, EvalRule.CaseVariant)
-            case TmCase(fi, t, vs, bs):
-                witness = self.single_step(updated_state(t))
-                new_state = witness.new_state.replace_term(TmCase(fi, witness.new_state.term, vs, bs))
-                return transition(new_state, EvalRule.Case, (witness,))
-            case TmReference(_, v) if term_is_val(v):
-                new_memory, location = state_before.memory.put(v)
-                new_state = LambdaProgramState(location, new_memory)
-                return transition(new_state, EvalRule.RefV)
-            case TmReference(fi, t):
-                witness = self.single_step(updated_state(t))
-                new_state = witness.new_state.replace_term(TmReference(fi, witness.new_state.term))
-                return transition(new_state, EvalRule.Ref, (witness,))
-            case TmDereference(_, v) if term_is_val(v):
-                return transition(state_before.memory.dereference(v), EvalRule.DerefLoc)
-            case TmDereference(fi, t):
-                witness = self.single_step(updated_state(t))
-                new_state = witness.new_state.replace_term(TmDereference(fi, witness.new_state.term))
-                return transition(new_state, EvalRule.Deref, (witness,))
-            case TmAssignment(_, v1, v2) if term_is_val(v1) and term_is_val(v2):
-                new_memory = state_before.memory.replace(v1, v2)
-                new_state = LambdaProgramState(TmUnit(Info.dummy_info()), new_memory)
-                return transition(new_state, EvalRule.Assign)
-            case TmAssignment(fi, t1, t2) if not term_is_val(t1):
-                witness = self.single_step(updated_state(t1))
-                new_state = witness.new_state.replace_term(TmAssignment(fi, witness.new_state.term, t2))
-                return transition(new_state, EvalRule.Assign1, (witness,))
-            case TmAssignment(fi, v1, t2):
-                witness = self.single_step(updated_state(t2))
-                new_state = witness.new_state.replace_term(TmAssignment(fi, v1, witness.new_state.term))
-                return transition(new_state, EvalRule.Assign2, (witness,))
-            case _:
-                raise NoEvalRuleApplies(state_before)
+DEFAULT_RULES: dict[type, RuleHandler] = {
+    TmApp: _eval_app,
+    TmIf: _eval_if,
+    TmSucc: _eval_succ,
+    TmPred: _eval_pred,
+    TmIsZero: _eval_is_zero,
+    TmLet: _eval_let,
+    TmFix: _eval_fix,
+    TmRecord: _eval_record,
+    TmProjection: _eval_projection,
+    TmTagging: _eval_tagging,
+    TmCase: _eval_case,
+    TmReference: _eval_reference,
+    TmDereference: _eval_dereference,
+    TmAssignment: _eval_assignment,
+}
@@ -0,0 +1,41 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from src.semantics.term_utils import term_fold, term_node_key
+from src.term import Term
+
+
+class HashConser:
+    '''
+        Assigns integer identities to terms, so that structurally equal terms
+        (up to debug info and names of the bound variables) get the same identity.
+        Every node is described by its kind and the identities of its children, so the table keys stay small
+        and the common subterms of different terms are stored only once.
+
+        Attributes:
+            - table: dict[tuple, int]
+                identities of the already seen nodes
+
+        Methods:
+            - intern(t: Term) -> int
+                returns the identity of the term, registering its new subterms
+            - node(term: Term, children: list[int]) -> int
+                returns the identity of the term given the identities of its direct subterms
+    '''
+    def __init__(self):
+        self.table: dict[tuple, int] = {}
+
+    def node(self, term: Term, children: list[int]) -> int:
+        key = term_node_key(term, children)
+        identity = self.table.get(key)
+        if identity is None:
+            identity = self.table[key] = len(self.table)
+        return identity
+
+    def intern(self, t: Term) -> int:
+        return term_fold(t, self.node)
+
+    def __len__(self) -> int:
+        return len(self.table)
@@ -0,0 +1,166 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from __future__ import annotations
+
+import weakref
+from dataclasses import dataclass
+from typing import Sequence
+
+from src.lambda_program import TypedLambdaProgram
+from src.semantics.hashcons import HashConser
+from src.semantics.term_utils import term_children
+from src.semantics.typechecker import TypedLambdaTypechecker, TypeContext, MemoTable
+from src.term import Term, TmVar, TmAbs, TmLet, TmLetRec, TmCase
+from src.type import LambdaType, VariantType
+
+
+@dataclass(frozen=True)
+class _NodeInfo:
+    '''
+    What the cache needs to know about a term object.
+
+    Attributes:
+    ===========
+    term: weakref.ref
+        the described term, the entry is removed when the term dies
+    identity: int
+        hash-consed structural identity of the term
+    free: tuple[int, ...]
+        ascending indices of the free variables of the term
+    '''
+    term: weakref.ref
+    identity: int
+    free: tuple[int, ...]
+
+
+class IncrementalTypechecker(TypedLambdaTypechecker):
+    '''
+        Typechecker caching the types of all the subterms, so typechecking an edited program
+        recomputes only the edited subterms and their ancestors.
+
+        A type is cached under the structural identity of the subterm (hash-consed, see HashConser)
+        and the types of its free variables — the only slice of the context the subterm can observe.
+        The identities and free variables are remembered per term object (weakly), so the subtrees
+        shared by the edited program with the previous one (see `term_replace_at`) aren't walked again.
+        Type errors are not cached.
+        The hash-consing table only grows (the evicted types don't release their identities), so when it exceeds
+        `max_identities` it's cleared, together with everything keyed by the identities, before the next typecheck.
+
+        Attributes:
+            - rechecked: int
+                number of the subterms whose types were computed (not found in the cache) by the last typecheck
+            - max_identities: int
+                maximal number of the hash-consed nodes (4 * cache_size by default)
+            - resets: int
+                how many times the hash-consing table and the type cache have been cleared
+
+        Methods:
+            - typecheck(program: TypedLambdaProgram) -> LambdaType
+                returns type of the program, reusing the types computed for the previous programs
+            - type_at(path: Sequence[int]) -> LambdaType
+                returns type of a subterm of the last typechecked program,
+                the path lists positions of the consecutive subterms (in the `term_children` order)
+            - cache_stats() -> dict
+                returns statistics of the type cache
+    '''
+    def __init__(self, memo_size: int = 4096, cache_size: int = 1 << 20, max_identities: int | None = None):
+        super().__init__(memo_size)
+        self.rechecked = 0
+        self.max_identities = max_identities if max_identities is not None else 4 * cache_size
+        self.resets = 0
+        self._interner = HashConser()
+        self._nodes: dict[int, _NodeInfo] = {}
+        self._types = MemoTable(cache_size)
+        self._root: Term | None = None
+
+    def typecheck(self, program: TypedLambdaProgram[Term]) -> LambdaType:
+        self.rechecked = 0
+        if len(self._interner) > self.max_identities:
+            self._reset()
+        self._root = program.state.term
+        return self._typecheck(self._root, TypeContext.empty())
+
+    def _reset(self) -> None:
+        # the identities of the new interner start from 0 again, so nothing keyed by the old ones can be kept
+        self._interner = HashConser()
+        self._nodes.clear()
+        self._types.clear()
+        self.resets += 1
+
+    def cache_stats(self) -> dict:
+        return {**self._types.stats(), 'nodes': len(self._nodes), 'identities': len(self._interner),
+                'max_identities': self.max_identities, 'resets': self.resets}
+
+    def _cache_key(self, term: Term, type_context: TypeContext) -> tuple:
+        node = self._node_info(term)
+        return node.identity, type_context.types_of(node.free)
+
+    def _cached_type(self, term: Term, type_context: TypeContext) -> LambdaType | None:
+        result = self._types.lookup(self._cache_key(term, type_context))
+        return None if result is MemoTable.MISSING else result
+
+    def _store_type(self, term: Term, type_context: TypeContext, term_type: LambdaType) -> None:
+        self.rechecked += 1
+        self._types.store(self._cache_key(term, type_context), term_type)
+
+    def _node_info(self, t: Term) -> _NodeInfo:
+        """ Describes the term, walking (with an explicit stack) only the subterms that haven't been seen yet. """
+        node = self._cached_node(t)
+        if node is not None:
+            return node
+        stack: list[tuple[Term, list | None]] = [(t, None)]
+        while stack:
+            term, children = stack.pop()
+            if children is None:
+                if self._cached_node(term) is not None:
+                    continue
+                children = term_children(term)
+                if children:
+                    stack.append((term, children))
+                    stack.extend((child, None) for child, _ in children)
+                    continue
+            child_nodes = [self._cached_node(child) for child, _ in children]
+            if isinstance(term, TmVar):
+                free = {term.index}
+            else:
+                free = {i - binders for node, (_, binders) in zip(child_nodes, children)
+                        for i in node.free if i >= binders}
+            identity = self._interner.node(term, [node.identity for node in child_nodes])
+            key = id(term)
+            reference = weakref.ref(term, lambda _, key=key: self._nodes.pop(key, None))
+            self._nodes[key] = _NodeInfo(reference, identity, tuple(sorted(free)))
+        return self._nodes[id(t)]
+
+    def _cached_node(self, term: Term) -> _NodeInfo | None:
+        node = self._nodes.get(id(term))
+        if node is not None and node.term() is term:
+            return node
+        return None
+
+    def type_at(self, path: Sequence[int]) -> LambdaType:
+        term, type_context = self._root, TypeContext.empty()
+        for position in path:
+            term, type_context = self._child_contexts(term, type_context)[position]
+        return self._typecheck(term, type_context)
+
+    def _child_contexts(self, term: Term, type_context: TypeContext) -> list[tuple[Term, TypeContext]]:
+        """ Lists the direct subterms of the (well typed) term with their type contexts. """
+        match term:
+            case TmAbs(_, _, arg_type, body):
+                return [(body, type_context.extend_with_type(arg_type))]
+            case TmLet(_, _, rvalue, body):
+                rvalue_type = self._typecheck(rvalue, type_context)
+                return [(rvalue, type_context), (body, type_context.extend_with_type(rvalue_type))]
+            case TmLetRec(_, _, var_type, function, body):
+                return [(function, type_context.extend_with_type(var_type)),
+                        (body, type_context.extend_with_type(var_type))]
+            case TmCase(_, t1, _, branches):
+                variant = self._typecheck(t1, type_context)
+                assert isinstance(variant, VariantType)
+                return [(t1, type_context)] + [(branch, type_context.extend_with_type(variant.variants_types[label]))
+                                               for label, branch in branches.items()]
+            case _:
+                return [(child, type_context) for child, _ in term_children(term)]
@@ -0,0 +1,363 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Any, Optional
+
+from src.lambda_program import TypedLambdaProgram, LambdaProgramState
+from src.semantics.evaluator import EvalRule
+from src.semantics.term_utils import term_substitute
+from src.term import Term, TmAbs, TmVar, TmApp, TmTrue, TmFalse, TmZero, TmSucc, TmIf, TmIsZero, TmPred, TmLet, \
+    TmFix, TmUnit, TmRecord, TmProjection, TmTagging, TmCase, TmReference, TmDereference, TmAssignment, \
+    TmStoreLocation, Info
+
+
+class LazyEvaluationError(Exception):
+    def __init__(self, msg: str, term: Term):
+        self.msg = msg
+        self.term = term
+
+    def __str__(self):
+        return f"[Evaluation Error] {self.msg}\n" \
+               f"- program: {self.term}\n" \
+               f"- position: {self.term.info}"
+
+
+'''
+Environment is a persistent cons list: None or a pair (thunk, rest), the head corresponds to the de Bruijn index 0.
+'''
+Environment = Optional[tuple['Thunk', 'Environment']]
+
+
+class Thunk:
+    '''
+    A suspended computation of a term in an environment. It's evaluated at most once — the result is memoized.
+
+    Attributes:
+    ===========
+    term: Term
+        suspended term
+    env: Environment
+        environment of the suspended term
+    value: Any
+        computed value, valid only if `forced` is set
+    blackholed: bool
+        set while the thunk is being forced, forcing it again means the computation depends on its own value
+    '''
+    __slots__ = ('term', 'env', 'value', 'forced', 'blackholed')
+
+    def __init__(self, term: Term, env: Environment):
+        self.term = term
+        self.env = env
+        self.value = None
+        self.forced = False
+        self.blackholed = False
+
+
+@dataclass(frozen=True)
+class Closure:
+    abstraction: TmAbs
+    env: Environment
+
+
+@dataclass(frozen=True)
+class RecordValue:
+    fields: OrderedDict[str, Thunk]
+
+
+@dataclass(frozen=True)
+class TaggedValue:
+    label: str
+    thunk: Thunk
+
+
+class _Frame(Enum):
+    '''
+    Evaluation contexts waiting for a value on the stack of CallByNeedEvaluator._run.
+    Each frame is a triple (kind, a, b), the meaning of `a` and `b` depends on the kind:
+    - Update: (thunk to be updated with the value, -)
+    - Succ, Pred, IsZero: (-, -)
+    - If: ((then branch, else branch), environment)
+    - App: (argument, environment)
+    - Fix: (the fix term, environment)
+    - Projection: (label, -)
+    - Case: (branches, environment)
+    '''
+    Update = auto()
+    Succ = auto()
+    Pred = auto()
+    IsZero = auto()
+    If = auto()
+    App = auto()
+    Fix = auto()
+    Projection = auto()
+    Case = auto()
+
+
+'''
+Runtime values are: python ints (Nat), bools, None (Unit), Closure, RecordValue and TaggedValue.
+Components of the records and variants stay suspended until they are needed.
+'''
+
+
+def _lookup(env: Environment, index: int) -> Thunk:
+    for _ in range(index):
+        env = env[1]
+    return env[0]
+
+
+def term_uses_memory(t: Term) -> bool:
+    '''
+         Checks whether the term uses any of the memory related constructs.
+         Call-by-need makes the order of effects unpredictable, so such programs are rejected.
+
+         :param t: a Typed Lambda Calculus term
+         :return: whether the term contains ref, !, := or a store location
+    '''
+    stack = [t]
+    while stack:
+        term = stack.pop()
+        match term:
+            case TmReference() | TmDereference() | TmAssignment() | TmStoreLocation():
+                return True
+            case TmAbs(_, _, _, t1) | TmSucc(_, t1) | TmPred(_, t1) | TmIsZero(_, t1) | TmFix(_, t1) \
+                 | TmProjection(_, t1, _) | TmTagging(_, _, t1):
+                stack.append(t1)
+            case TmApp(_, t1, t2) | TmLet(_, _, t1, t2):
+                stack.extend((t1, t2))
+            case TmIf(_, t1, t2, t3):
+                stack.extend((t1, t2, t3))
+            case TmRecord(_, rs):
+                stack.extend(rs.values())
+            case TmCase(_, t1, _, bs):
+                stack.append(t1)
+                stack.extend(bs.values())
+    return False
+
+
+class CallByNeedEvaluator:
+    '''
+        Environment based evaluator implementing the call-by-need strategy for the pure fragment of the language.
+        Arguments and let bound terms are suspended in thunks forced at most once,
+        `fix` ties the knot — the recursive variable is bound to the very thunk being defined.
+        The evaluation doesn't recurse (see `_run`), so it handles the programs as deep as the step by step evaluator.
+
+        Attributes:
+            - steps: int
+                number of performed reductions (the counterpart of the transitions of TypedLambdaEvaluator)
+            - rule_counts: dict[EvalRule, int]
+                how many times each of the reduction rules has been applied
+
+        Methods:
+            - evaluate(program: TypedLambdaProgram[Term]) -> LambdaProgramState
+                evaluates the program and reads back its (fully forced) value
+                raises LazyEvaluationError if the program uses the memory or a value depends on itself
+    '''
+    def __init__(self):
+        self.steps = 0
+        self.rule_counts: dict[EvalRule, int] = {}
+
+    def evaluate(self, program: TypedLambdaProgram[Term]) -> LambdaProgramState:
+        term = program.state.term
+        if term_uses_memory(term):
+            raise LazyEvaluationError("call-by-need evaluation doesn't support memory operations", term)
+        value = self._eval(term, None)
+        return LambdaProgramState(self._read_back_value(value))
+
+    def _count(self, rule: EvalRule) -> None:
+        self.steps += 1
+        self.rule_counts[rule] = self.rule_counts.get(rule, 0) + 1
+
+    def force(self, thunk: Thunk) -> Any:
+        if thunk.forced:
+            return thunk.value
+        return self._run(None, None, thunk)
+
+    def _eval(self, term: Term, env: Environment) -> Any:
+        """
+        Evaluates the term to a weak head normal form.
+
+        :param term: term to be evaluated
+        :param env: thunks bound to the free variables of the term
+        :return: runtime value
+        """
+        return self._run(term, env, None)
+
+    def _run(self, term: Optional[Term], env: Environment, thunk: Optional[Thunk]) -> Any:
+        """
+        Evaluates the term (or forces the thunk) without recursion: the pending evaluation contexts
+        are kept on an explicit stack of frames (see _Frame), so the depth of the computation
+        is limited only by the available memory. The machine alternates between three modes:
+        - forcing the `thunk` (if set), a thunk being forced is blackholed until its value is known,
+        - evaluating the `term` (if set) in the `env`,
+        - returning the `value` to the innermost frame.
+
+        :raise LazyEvaluationError: if a thunk demands its own value (e.g. fix \\x:Nat. succ x)
+        """
+        frames: list[tuple[_Frame, Any, Any]] = []
+        value = None
+        while True:
+            if thunk is not None:
+                if thunk.forced:
+                    value = thunk.value
+                else:
+                    if thunk.blackholed:
+                        raise LazyEvaluationError("the value of the term depends on itself", thunk.term)
+                    thunk.blackholed = True
+                    frames.append((_Frame.Update, thunk, None))
+                    term, env = thunk.term, thunk.env
+                thunk = None
+                if term is not None:
+                    continue
+            elif term is not None:
+                match term:
+                    case TmVar(_, index, _):
+                        term, thunk = None, _lookup(env, index)
+                        continue
+                    case TmTrue():
+                        value = True
+                    case TmFalse():
+                        value = False
+                    case TmZero():
+                        value = 0
+                    case TmUnit():
+                        value = None
+                    case TmAbs():
+                        value = Closure(term, env)
+                    case TmSucc(_, t1):
+                        frames.append((_Frame.Succ, None, None))
+                        term = t1
+                        continue
+                    case TmPred(_, t1):
+                        frames.append((_Frame.Pred, None, None))
+                        term = t1
+                        continue
+                    case TmIsZero(_, t1):
+                        frames.append((_Frame.IsZero, None, None))
+                        term = t1
+                        continue
+                    case TmIf(_, t1, t2, t3):
+                        frames.append((_Frame.If, (t2, t3), env))
+                        term = t1
+                        continue
+                    case TmApp(_, t1, t2):
+                        frames.append((_Frame.App, t2, env))
+                        term = t1
+                        continue
+                    case TmLet(_, _, t1, t2):
+                        self._count(EvalRule.LetV)
+                        term, env = t2, (Thunk(t1, env), env)
+                        continue
+                    case TmFix(_, t1):
+                        frames.append((_Frame.Fix, term, env))
+                        term = t1
+                        continue
+                    case TmRecord(_, rs):
+                        value = RecordValue(OrderedDict([(l, Thunk(t, env)) for l, t in rs.items()]))
+                    case TmProjection(_, t1, l):
+                        frames.append((_Frame.Projection, l, None))
+                        term = t1
+                        continue
+                    case TmTagging(_, l, t1):
+                        value = TaggedValue(l, Thunk(t1, env))
+                    case TmCase(_, t1, _, bs):
+                        frames.append((_Frame.Case, bs, env))
+                        term = t1
+                        continue
+                    case _:
+                        raise LazyEvaluationError("no evaluation rule applies", term)
+                term = None
+
+            if not frames:
+                return value
+            kind, a, b = frames.pop()
+            match kind:
+                case _Frame.Update:
+                    a.value, a.forced, a.env = value, True, None
+                case _Frame.Succ:
+                    value = value + 1
+                case _Frame.Pred:
+                    self._count(EvalRule.PredZero if value == 0 else EvalRule.PredSucc)
+                    value = max(value - 1, 0)
+                case _Frame.IsZero:
+                    self._count(EvalRule.IsZeroZero if value == 0 else EvalRule.IsZeroSucc)
+                    value = value == 0
+                case _Frame.If:
+                    self._count(EvalRule.IfTrue if value else EvalRule.IfFalse)
+                    term, env = a[0] if value else a[1], b
+                case _Frame.App:
+                    self._count(EvalRule.AppAbs)
+                    term, env = value.abstraction.body, (Thunk(a, b), value.env)
+                case _Frame.Fix:
+                    self._count(EvalRule.FixBeta)
+                    thunk = _Knot(value.abstraction.body, None, a, b)
+                    thunk.env = (thunk, value.env)
+                case _Frame.Projection:
+                    self._count(EvalRule.ProjRcd)
+                    thunk = value.fields[a]
+                case _Frame.Case:
+                    self._count(EvalRule.CaseVariant)
+                    term, env = a[value.label], (value.thunk, b)
+
+    def _read_back_value(self, value: Any) -> Term:
+        info = Info.dummy_info()
+        match value:
+            case bool():
+                return TmTrue(info) if value else TmFalse(info)
+            case int():
+                term = TmZero(info)
+                for _ in range(value):
+                    term = TmSucc(info, term)
+                return term
+            case None:
+                return TmUnit(info)
+            case RecordValue(fields):
+                return TmRecord(info, OrderedDict([(l, self._read_back_value(self.force(t)))
+                                                   for l, t in fields.items()]))
+            case TaggedValue(label, thunk):
+                return TmTagging(info, label, self._read_back_value(self.force(thunk)))
+            case Closure(abstraction, env):
+                return self._read_back_term(abstraction, env)
+
+    def _read_back_term(self, term: Term, env: Environment) -> Term:
+        """
+        Closes the term by substituting the (read back) thunks from the environment.
+        Thunks are not forced, the unevaluated ones are read back as their suspended terms.
+        """
+        entries = []
+        while env is not None:
+            entries.append(env[0])
+            env = env[1]
+        for thunk in entries:
+            term = term_substitute(self._read_back_thunk(thunk), term)
+        return term
+
+    def _read_back_thunk(self, thunk: Thunk) -> Term:
+        if isinstance(thunk, _Knot):
+            return self._read_back_term(thunk.fix_term, thunk.fix_env)
+        if thunk.forced:
+            match thunk.value:
+                case Closure(abstraction, env):
+                    return self._read_back_term(abstraction, env)
+                case _:
+                    return self._read_back_value(thunk.value)
+        return self._read_back_term(thunk.term, thunk.env)
+
+
+class _Knot(Thunk):
+    '''
+    A thunk created by `fix`, its environment contains the thunk itself.
+    To read it back without looping, it remembers the original `fix` term and its environment.
+    '''
+    __slots__ = ('fix_term', 'fix_env')
+
+    def __init__(self, term: Term, env: Environment, fix_term: Term, fix_env: Environment):
+        super().__init__(term, env)
+        self.fix_term = fix_term
+        self.fix_env = fix_env
@@ -44,9 +44,7 @@ class LetRecMacro(Macro):
 class SeqMacro(Macro):
 
     def expand(self, term: DerivedTerm) -> Term | None:
-        # TODO: Fill missing code for the derived form for TmSequence
-        #       tip. it's defined in TAPL, p. 119
-        #       tip 1. remember to update de Bruijn indexes (term_shift)
+        # t1; t2 is (\_:Unit. t2) t1 (TAPL, p. 119), t2 is shifted as it gets under the new binder
         match term:
             case TmSequence(_, t1, t2):
                 result = TmApp(Info.dummy_info(), TmAbs(Info.dummy_info(), '_', BaseType.Unit, term_shift(1, t2)), t1)
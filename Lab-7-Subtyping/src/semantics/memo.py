@@ -0,0 +1,135 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from src.lambda_program import LambdaProgramState
+from src.semantics.evaluator import TypedLambdaEvaluator, Reduction, Congruence, EvalRule, NoEvalRuleApplies, \
+    DEFAULT_RULES
+from src.semantics.hashcons import HashConser
+from src.semantics.term_utils import term_is_val, term_is_pure, term_is_closed, term_size_exceeds
+from src.term import Term, TmApp, TmAbs
+
+
+class MemoizingEvaluator(TypedLambdaEvaluator):
+    '''
+        Evaluator memoizing applications of closed, pure abstractions to pure values.
+        Such an application always evaluates to the same value, so on the first occurrence it's evaluated
+        to the end (with the memoization still active) and every later occurrence takes a single E-AppMemo step.
+        The table is keyed by the hash-consed identities of the abstraction and the argument.
+
+        Only the abstractions and arguments of at most `max_term_size` nodes are memoized, so looking up
+        an application costs O(max_term_size) on top of the E-AppAbs step, however big the function is.
+        The hash-consing table (with the memoizability of the interned nodes) grows with every new term,
+        so when it exceeds `max_interned` nodes it's cleared together with the memo table.
+
+        The memoization saves only the repeated applications: it doesn't make the evaluation asymptotically cheaper
+        when a single application is expensive. E.g. the naive fibonacci stops recomputing the recursive calls,
+        but it still adds unary numbers, so the number of steps stays exponential in n (linear in fib(n)),
+        and the additions of the numbers bigger than `max_term_size` are not memoized at all
+        (see benchmarks/bench_memo.py).
+
+        The nested evaluations use the python stack, so the memoization is suspended below `max_nesting`
+        nested applications — the evaluation continues with the ordinary E-AppAbs steps there.
+        A nested evaluation is a part of a single outer step, so its states are not seen by a CycleDetector:
+        an application diverging inside it can't be detected, it loops forever.
+
+        Attributes:
+            - memo_size: int
+                maximal number of the memoized applications, the least recently used ones are evicted first
+            - max_interned: int
+                maximal number of the hash-consed nodes (64 * memo_size by default)
+            - hits, misses, evictions: int
+                statistics of the memo table
+            - resets: int
+                how many times the hash-consing and memo tables have been cleared
+            - nested_steps: int
+                number of steps performed by the nested evaluations filling the table
+    '''
+    def __init__(self, name_context: list[str], stack_budget: int = 1_000_000, memo_size: int = 4096,
+                 max_nesting: int = 200, max_term_size: int = 512, max_interned: int | None = None):
+        super().__init__(name_context, stack_budget)
+        self.memo_size = memo_size
+        self.max_nesting = max_nesting
+        self.max_term_size = max_term_size
+        self.max_interned = max_interned if max_interned is not None else 64 * memo_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resets = 0
+        self.nested_steps = 0
+        self._table: OrderedDict[tuple[int, int], Term] = OrderedDict()
+        self._interner = HashConser()
+        # memoizability of the interned nodes, keyed by their hash-consed identities
+        self._memoizable: dict[int, bool] = {}
+        self._nesting = 0
+        self.register_rule(TmApp, self._eval_app_memo)
+
+    def _intern(self, term: Term) -> int | None:
+        """ Returns the identity of a small enough, closed and pure term, None for the other terms. """
+        if term_size_exceeds(term, self.max_term_size):
+            return None
+        node = self._interner.intern(term)
+        memoizable = self._memoizable.get(node)
+        if memoizable is None:
+            memoizable = self._memoizable[node] = term_is_closed(term) and term_is_pure(term)
+        return node if memoizable else None
+
+    def _reset(self) -> None:
+        # the identities of the new interner start from 0 again, so the memoized results can't be kept
+        self._interner = HashConser()
+        self._memoizable.clear()
+        self._table.clear()
+        self.resets += 1
+
+    def _eval_app_memo(self, state: LambdaProgramState) -> Reduction | Congruence:
+        function, arg = state.term.function, state.term.arg
+        if self._nesting >= self.max_nesting or not isinstance(function, TmAbs) or not term_is_val(arg):
+            return DEFAULT_RULES[TmApp](state)
+        if len(self._interner) > self.max_interned:
+            self._reset()
+        function_id = self._intern(function)
+        arg_id = self._intern(arg) if function_id is not None else None
+        if arg_id is None:
+            return DEFAULT_RULES[TmApp](state)
+
+        key = (function_id, arg_id)
+        result = self._table.get(key)
+        if result is not None:
+            self.hits += 1
+            self._table.move_to_end(key)
+            return Reduction(result, EvalRule.AppMemo)
+
+        self.misses += 1
+        resets = self.resets
+        result = self._evaluate_nested(state)
+        # a reset during the nested evaluation makes the key refer to the identities of the old interner
+        if term_is_val(result) and resets == self.resets:
+            self._table[key] = result
+            if len(self._table) > self.memo_size:
+                self._table.popitem(last=False)
+                self.evictions += 1
+        return Reduction(result, EvalRule.AppMemo)
+
+    def _evaluate_nested(self, state: LambdaProgramState) -> Term:
+        # the redex is pure, so the memory doesn't change during the nested evaluation
+        self._nesting += 1
+        try:
+            transition = DEFAULT_RULES[TmApp](state)
+            state = state.replace_term(transition.update)
+            while True:
+                try:
+                    state = self.single_step(state).new_state
+                    self.nested_steps += 1
+                except NoEvalRuleApplies:
+                    return state.term
+        finally:
+            self._nesting -= 1
+
+    def memo_stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._table),
+                "nested_steps": self.nested_steps, "interned_nodes": len(self._interner), "resets": self.resets}
@@ -0,0 +1,104 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from __future__ import annotations
+
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+from src.lambda_program import LambdaProgramState
+from src.semantics.evaluator import Transition, Rule
+from src.semantics.term_utils import term_size, substitution_counter
+
+
+class EvalStats:
+    '''
+        Collects statistics of a step by step evaluation.
+        The evaluator itself is not aware of the collector: the transitions are passed to `record`
+        by the evaluation loop and the substitutions report the nodes they allocate (as they build them)
+        to the `substitution_counter` hook installed by `tracking`.
+
+        Attributes:
+            - steps: int
+                number of the recorded transitions
+            - rule_counts: Counter[Rule]
+                how many times each rule has fired, including the rules of the witnesses
+            - witness_rule_counts: Counter[Rule]
+                how many times each rule has fired as a witness (a premise of another rule)
+            - rule_nodes: Counter[Rule]
+                term nodes allocated by substitutions during steps ending with the given axiom
+            - witness_depths: Counter[int]
+                histogram of the lengths of the witness chains
+            - allocated_nodes: Counter[str]
+                term nodes allocated by each of the substitution walkers
+            - peak_term_size: int
+                maximal number of nodes of the evaluated term
+            - peak_store_size: int
+                maximal number of the memory cells
+
+        Methods:
+            - tracking() -> context manager
+                counts the nodes allocated by `term_shift` and `term_substitute_step` while active
+            - record(transition: Transition) -> None
+                accounts a single evaluation step
+            - report() -> dict
+                summary ready to be dumped as JSON, rules are sorted from the most frequent
+    '''
+    WALKERS = ('term_shift', 'term_substitute_step')
+
+    def __init__(self):
+        self.steps = 0
+        self.rule_counts: Counter[Rule] = Counter()
+        self.witness_rule_counts: Counter[Rule] = Counter()
+        self.rule_nodes: Counter[Rule] = Counter()
+        self.witness_depths: Counter[int] = Counter()
+        self.allocated_nodes: Counter[str] = Counter()
+        self.peak_term_size = 0
+        self.peak_store_size = 0
+        self._step_nodes = 0
+
+    @contextmanager
+    def tracking(self) -> Iterator[EvalStats]:
+        token = substitution_counter.set(self._count)
+        try:
+            yield self
+        finally:
+            substitution_counter.reset(token)
+
+    def _count(self, walker: str, nodes: int) -> None:
+        self.allocated_nodes[walker] += nodes
+        self._step_nodes += nodes
+
+    def observe_state(self, state: LambdaProgramState) -> None:
+        self.peak_term_size = max(self.peak_term_size, term_size(state.term))
+        self.peak_store_size = max(self.peak_store_size, len(state.memory))
+
+    def record(self, transition: Transition) -> None:
+        self.steps += 1
+        self.rule_counts[transition.rule] += 1
+        depth = 0
+        while transition.witnesses:
+            transition = transition.witnesses[0]
+            depth += 1
+            self.rule_counts[transition.rule] += 1
+            self.witness_rule_counts[transition.rule] += 1
+        self.witness_depths[depth] += 1
+        self.rule_nodes[transition.rule] += self._step_nodes
+        self._step_nodes = 0
+        self.observe_state(transition.new_state)
+
+    def report(self) -> dict:
+        return {
+            "steps": self.steps,
+            "rules": {str(rule): {"fired": count,
+                                  "as_witness": self.witness_rule_counts[rule],
+                                  "allocated_nodes": self.rule_nodes[rule]}
+                      for rule, count in self.rule_counts.most_common()},
+            "witness_depth": {str(depth): self.witness_depths[depth] for depth in sorted(self.witness_depths)},
+            "allocated_nodes": {name: self.allocated_nodes[name] for name in self.WALKERS},
+            "peak_term_size": self.peak_term_size,
+            "peak_store_size": self.peak_store_size,
+        }
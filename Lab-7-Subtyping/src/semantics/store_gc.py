@@ -0,0 +1,77 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+from __future__ import annotations
+
+from src.lambda_program import LambdaProgramState
+from src.semantics.term_utils import term_locations, term_relocate
+from src.term import Term
+
+
+class StoreCollector:
+    '''
+        Mark & compact collector of the memory cells unreachable from the evaluated term.
+        Live cells keep their relative order, so the addresses only move down and collecting
+        a store without garbage changes nothing.
+
+        Attributes:
+            - interval: int
+                number of evaluation steps between the collections, 0 disables the collector
+            - collections: int
+                number of performed collections
+            - reclaimed: int
+                total number of the reclaimed cells
+            - peak_store_size: int
+                maximal number of the cells seen before a collection
+
+        Methods:
+            - collect(state: LambdaProgramState) -> LambdaProgramState
+                returns the state with unreachable cells removed and the addresses rewritten
+            - step(state: LambdaProgramState) -> LambdaProgramState
+                counts an evaluation step, collects the garbage every `interval` steps
+    '''
+    def __init__(self, interval: int = 0):
+        self.interval = interval
+        self.collections = 0
+        self.reclaimed = 0
+        self.peak_store_size = 0
+        self._steps = 0
+
+    def step(self, state: LambdaProgramState) -> LambdaProgramState:
+        if self.interval <= 0:
+            return state
+        self._steps += 1
+        if self._steps % self.interval:
+            return state
+        return self.collect(state)
+
+    @staticmethod
+    def mark(term: Term, cells: list[Term]) -> set[int]:
+        """ Finds the addresses reachable from the term, directly or through the stored values. """
+        live: set[int] = set()
+        pending = term_locations(term)
+        while pending:
+            address = pending.pop()
+            live.add(address)
+            pending |= term_locations(cells[address]) - live
+        return live
+
+    def collect(self, state: LambdaProgramState) -> LambdaProgramState:
+        self.collections += 1
+        self.peak_store_size = max(self.peak_store_size, len(state.memory))
+        cells = list(state.memory)
+        live = self.mark(state.term, cells)
+        if len(live) == len(cells):
+            return state
+
+        addresses = {old: new for new, old in enumerate(sorted(live))}
+        memory = state.memory.cleared()
+        for old in sorted(live):
+            memory, _ = memory.put(term_relocate(cells[old], addresses))
+        self.reclaimed += len(cells) - len(live)
+        return LambdaProgramState(term_relocate(state.term, addresses), memory)
+
+    def gc_stats(self) -> dict:
+        return {"collections": self.collections, "reclaimed": self.reclaimed, "peak_store_size": self.peak_store_size}
@@ -3,23 +3,148 @@
 #     It would be nice however if you mentioned me somewhere.
 #     Still, no pressure - have a nice day!
 from collections import OrderedDict
+from contextvars import ContextVar
 from copy import copy
-from functools import partial
-from typing import Callable
+from typing import Callable, Optional, Sequence
 
 from src.term import TmVar, Term, TmAbs, TmPred, TmIsZero, TmApp, TmZero, TmFalse, TmTrue, TmIf, TmSucc, TmLet, \
     TmFix, TmUnit, TmRecord, TmProjection, TmTagging, TmCase, TmStoreLocation, TmReference, \
-    TmDereference, TmAssignment, TmSequence
+    TmDereference, TmAssignment, TmSequence, TmLetRec
 
 
-def term_is_numeric_val(t: Term) -> bool:
+'''
+All the walkers below use explicit stacks instead of the python recursion,
+so they work for arbitrarily deep terms (e.g. long `succ` towers or deeply nested applications).
+'''
+
+
+def term_children(t: Term) -> list[tuple[Term, int]]:
+    '''
+         Lists the direct subterms of the term, each accompanied with the number of binders
+         introduced between the term and the subterm.
+
+         :param t: a Typed Lambda Calculus term
+         :return: list of pairs (subterm, number of new binders)
+    '''
     match t:
-        case TmZero():
-            return True
-        case TmSucc(_, v):
-            return term_is_numeric_val(v)
+        case TmAbs(_, _, _, t1):
+            return [(t1, 1)]
+        case TmLet(_, _, t1, t2):
+            return [(t1, 0), (t2, 1)]
+        case TmLetRec(_, _, _, t1, t2):
+            return [(t1, 1), (t2, 1)]
+        case TmApp(_, t1, t2) | TmAssignment(_, t1, t2) | TmSequence(_, t1, t2):
+            return [(t1, 0), (t2, 0)]
+        case TmIf(_, t1, t2, t3):
+            return [(t1, 0), (t2, 0), (t3, 0)]
+        case TmSucc(_, t1) | TmPred(_, t1) | TmIsZero(_, t1) | TmFix(_, t1) | TmReference(_, t1) \
+             | TmDereference(_, t1) | TmProjection(_, t1, _) | TmTagging(_, _, t1):
+            return [(t1, 0)]
+        case TmRecord(_, rs):
+            return [(r, 0) for r in rs.values()]
+        case TmCase(_, t1, _, bs):
+            return [(t1, 0)] + [(b, 1) for b in bs.values()]
         case _:
-            return False
+            return []
+
+
+def term_rebuild(t: Term, children: list[Term]) -> Term:
+    '''
+         Creates a copy of the term with replaced direct subterms.
+         The order of the new subterms is the same as in the `term_children` result.
+
+         :param t: a Typed Lambda Calculus term
+         :param children: new subterms
+         :return: new term
+    '''
+    match t:
+        case TmAbs(fi, x, xt, _):
+            return TmAbs(fi, x, xt, children[0])
+        case TmLet(fi, x, _, _):
+            return TmLet(fi, x, children[0], children[1])
+        case TmLetRec(fi, x, xt, _, _):
+            return TmLetRec(fi, x, xt, children[0], children[1])
+        case TmApp(fi, _, _):
+            return TmApp(fi, children[0], children[1])
+        case TmAssignment(fi, _, _):
+            return TmAssignment(fi, children[0], children[1])
+        case TmSequence(fi, _, _):
+            return TmSequence(fi, children[0], children[1])
+        case TmIf(fi, _, _, _):
+            return TmIf(fi, children[0], children[1], children[2])
+        case TmSucc(fi, _):
+            return TmSucc(fi, children[0])
+        case TmPred(fi, _):
+            return TmPred(fi, children[0])
+        case TmIsZero(fi, _):
+            return TmIsZero(fi, children[0])
+        case TmFix(fi, _):
+            return TmFix(fi, children[0])
+        case TmReference(fi, _):
+            return TmReference(fi, children[0])
+        case TmDereference(fi, _):
+            return TmDereference(fi, children[0])
+        case TmProjection(fi, _, l):
+            return TmProjection(fi, children[0], l)
+        case TmTagging(fi, l, _):
+            return TmTagging(fi, l, children[0])
+        case TmRecord(fi, rs):
+            return TmRecord(fi, OrderedDict(zip(rs.keys(), children)))
+        case TmCase(fi, _, vs, bs):
+            return TmCase(fi, children[0], vs, OrderedDict(zip(bs.keys(), children[1:])))
+        case _:
+            return copy(t)
+
+
+def term_replace_at(t: Term, path: Sequence[int], subterm: Term) -> Term:
+    '''
+         Replaces a subterm, the terms outside the path to it are shared with the original term.
+
+         :param t: a Typed Lambda Calculus term
+         :param path: positions of the consecutive subterms (in the `term_children` order) leading to the replaced one
+         :param subterm: new subterm
+         :return: new term
+    '''
+    spine: list[tuple[Term, int]] = []
+    for position in path:
+        spine.append((t, position))
+        t = term_children(t)[position][0]
+    for parent, position in reversed(spine):
+        children = [child for child, _ in term_children(parent)]
+        children[position] = subterm
+        subterm = term_rebuild(parent, children)
+    return subterm
+
+
+def term_fold(t: Term, f: Callable[[Term, list], object]) -> object:
+    '''
+         Computes a value bottom-up: f is called for every subterm with the results computed for its children.
+
+         :param t: a Typed Lambda Calculus term
+         :param f: function combining a term with results of its direct subterms
+         :return: result of f for the whole term
+    '''
+    results: list = []
+    stack: list[tuple[Term, list | None]] = [(t, None)]
+    while stack:
+        term, children = stack.pop()
+        if children is None:
+            children = term_children(term)
+            if children:
+                stack.append((term, children))
+                stack.extend((child, None) for child, _ in reversed(children))
+                continue
+        arity = len(children)
+        args = results[len(results) - arity:] if arity else []
+        del results[len(results) - arity:]
+        results.append(f(term, args))
+    return results[0]
+
+
+def term_is_numeric_val(t: Term) -> bool:
+    while isinstance(t, TmSucc):
+        t = t.number
+    return isinstance(t, TmZero)
 
 
 def term_is_val(t: Term) -> bool:
@@ -30,107 +155,124 @@ def term_is_val(t: Term) -> bool:
          :param t: a Typed Lambda Calculus term
          :return: whether the term is a value
     '''
-    if term_is_numeric_val(t):
-        return True
+    stack = [t]
+    while stack:
+        term = stack.pop()
+        match term:
+            case TmAbs() | TmTrue() | TmFalse() | TmUnit() | TmStoreLocation():
+                continue
+            case TmRecord(_, rs):
+                stack.extend(rs.values())
+            case TmTagging(_, _, t1):
+                stack.append(t1)
+            case _ if term_is_numeric_val(term):
+                continue
+            case _:
+                return False
+    return True
 
-    match t:
-        case TmAbs():
-            return True
-        case TmTrue():
-            return True
-        case TmFalse():
-            return True
-        case TmUnit():
-            return True
-        case TmRecord(_, rs):
-            return all([term_is_val(rv) for rv in rs.values()])
-        case TmTagging(_, _, t):
-            return term_is_val(t)
-        case TmStoreLocation():
-            return True
-        case _:
-            return False
+
+'''
+Hook called by `term_substitute` (unless it's given another one) with the name of a walker and the number
+of the nodes it has allocated. It's a context variable, so installing it (see EvalStats.tracking)
+affects only the current thread (or task) and can be nested.
+'''
+substitution_counter: ContextVar[Optional[Callable[[str, int], None]]] = ContextVar('substitution_counter',
+                                                                                    default=None)
 
 
-def term_substitute(s: Term, t: Term) -> Term:
+def term_substitute(s: Term, t: Term, count: Optional[Callable[[str, int], None]] = None) -> Term:
     '''
          This static makes a substitution in t. [var->s]t
          Based on the 'termSubstTop' function from the TAPL p. 87
 
          :param s: term that should replace the variable
          :param t: term containing variables to be replaced
+         :param count: called with the name of the walker ('term_shift' or 'term_substitute_step')
+                       and the number of the nodes it has allocated, `substitution_counter` by default
          :return: new term create according to the substitution rules
     '''
-    t1 = term_shift(1, s)
-    t2 = term_substitute_step(0, t1, t)
-    t3 = term_shift(-1, t2)
+    if count is None:
+        count = substitution_counter.get()
+    shift_count = step_count = None
+    if count is not None:
+        def shift_count(nodes: int) -> None:
+            count('term_shift', nodes)
+
+        def step_count(nodes: int) -> None:
+            count('term_substitute_step', nodes)
+
+    t1 = term_shift(1, s, shift_count)
+    t2 = term_substitute_step(0, t1, t, step_count)
+    t3 = term_shift(-1, t2, shift_count)
 
     return t3
 
 
-def term_map_vars(t: Term, f: Callable[[TmVar, int], TmVar], c: int = 0) -> Term:
-    match t:
-        case TmVar():
-            return f(t, c)
-        case TmAbs(fi, x, xt, t1):
-            return TmAbs(fi, x, xt, term_map_vars(t1, f, c + 1))
-        case TmLet(fi, x, rvalue, body):
-            return TmLet(fi, x, term_map_vars(rvalue, f, c), term_map_vars(body, f, c + 1))
-        case TmApp(fi, t1, t2):
-            return TmApp(fi, term_map_vars(t1, f, c), term_map_vars(t2, f, c))
-        case TmZero() | TmFalse() | TmTrue() | TmUnit() | TmStoreLocation():
-            return copy(t)
-        case TmIf(fi, t1, t2, t3):
-            return TmIf(fi, term_map_vars(t1, f, c), term_map_vars(t2, f, c), term_map_vars(t3, f, c))
-        case TmIsZero(fi, t1):
-            return TmIsZero(fi, term_map_vars(t1, f, c))
-        case TmSucc(fi, t1):
-            return TmSucc(fi, term_map_vars(t1, f, c))
-        case TmPred(fi, t1):
-            return TmPred(fi, term_map_vars(t1, f, c))
-        case TmFix(fi, t1):
-            return TmFix(fi, term_map_vars(t1, f, c))
-        case TmRecord() as r:
-            assert isinstance(r, TmRecord)
-            mapper = partial(term_map_vars, f = f, c = c)
-            return r.map_items(mapper)
-        case TmProjection(fi, t, l):
-            return TmProjection(fi, term_map_vars(t, f, c), l)
-        case TmTagging(fi, l, t):
-            return TmTagging(fi, l, term_map_vars(t, f, c))
-        case TmCase(fi, t, vs, bs):
-            mapped_term = term_map_vars(t, f, c)
-            mapped_branches = [(l, term_map_vars(b, f, c + 1)) for l, b in bs.items()]
-            return TmCase(fi, mapped_term, vs, OrderedDict(mapped_branches))
-        case TmReference(fi, t1):
-            return TmReference(fi, term_map_vars(t1, f, c))
-        case TmDereference(fi, t1):
-            return TmDereference(fi, term_map_vars(t1, f, c))
-        case TmAssignment(fi, t1, t2):
-            return TmAssignment(fi, term_map_vars(t1, f, c), term_map_vars(t2, f, c))
-        case TmSequence(fi, t1, t2):
-            return TmSequence(fi, term_map_vars(t1, f, c), term_map_vars(t2, f, c))
-
-
-def term_shift(d: int, term: Term) -> Term:
+def term_map_vars(t: Term, f: Callable[[TmVar, int], Term], c: int = 0,
+                  count: Optional[Callable[[int], None]] = None) -> Term:
+    '''
+         Rebuilds the term with the variables replaced by the results of f (called with the number of binders above).
+
+         :param t: a Typed Lambda Calculus term
+         :param f: function mapping a variable (and the number of the enclosing binders) to a term
+         :param c: initial number of the binders
+         :param count: called once with the number of the allocated nodes other than the results of f
+         :return: new term
+    '''
+    results: list[Term] = []
+    allocated = 0
+    stack: list[tuple[Term, int, list | None]] = [(t, c, None)]
+    while stack:
+        term, depth, children = stack.pop()
+        if isinstance(term, TmVar):
+            results.append(f(term, depth))
+        elif children is not None:
+            arity = len(children)
+            new_children = results[len(results) - arity:]
+            del results[len(results) - arity:]
+            results.append(term_rebuild(term, new_children))
+            allocated += 1
+        else:
+            children = term_children(term)
+            if children:
+                stack.append((term, depth, children))
+                stack.extend((child, depth + binders, None) for child, binders in reversed(children))
+            else:
+                results.append(copy(term))
+                allocated += 1
+    if count is not None:
+        count(allocated)
+    return results[0]
+
+
+def term_shift(d: int, term: Term, count: Optional[Callable[[int], None]] = None) -> Term:
     '''
          This static method shifts free variable indexes in the term.
          Based on the 'termShift' function from the TAPL p. 86
 
          :param d: how much the variables should be shifted
          :param term: Lambda Calculus term containing variables to be shifted
+         :param count: called with the number of the allocated nodes
          :return: new term with shifted variables
     '''
+    variables = 0
+
     def map_var(t: TmVar, c: int) -> TmVar:
+        nonlocal variables
+        variables += 1
         if t.index >= c:
             return TmVar(t.info, t.index + d, t.context_length + d)
         else:
             return TmVar(t.info, t.index, t.context_length + d)
 
-    return term_map_vars(term, map_var)
+    result = term_map_vars(term, map_var, count=count)
+    if count is not None:
+        count(variables)
+    return result
 
 
-def term_substitute_step(j: int, s: Term, term: Term) -> Term:
+def term_substitute_step(j: int, s: Term, term: Term, count: Optional[Callable[[int], None]] = None) -> Term:
     '''
          This static method substitutes variable with given index
          with a given term.
@@ -139,13 +281,159 @@ def term_substitute_step(j: int, s: Term, term: Term) -> Term:
          :param j: index of the variable to be substituted
          :param s: term to be put at the variable place
          :param term: term containing variables to be substituted
+         :param count: called with the number of the allocated nodes (including the shifted copies of s)
          :return: new term with substituted variables
     '''
+    variables = 0
 
-    def map_var(t: TmVar, c: int) -> TmVar:
+    def map_var(t: TmVar, c: int) -> Term:
+        nonlocal variables
         if t.index == j + c:
-            return term_shift(c, s)
+            return term_shift(c, s, count)
         else:
+            variables += 1
             return copy(t)
 
-    return term_map_vars(term, map_var)
+    result = term_map_vars(term, map_var, count=count)
+    if count is not None:
+        count(variables)
+    return result
+
+
+def term_node_key(term: Term, children: list) -> tuple:
+    '''
+         Describes a single node of the term given descriptions of its direct subterms.
+         Debug info and names of the bound variables are ignored.
+
+         :param term: a Typed Lambda Calculus term
+         :param children: hashable descriptions of the direct subterms (in the `term_children` order)
+         :return: hashable description of the node
+    '''
+    match term:
+        case TmVar(_, index, _):
+            return TmVar, index
+        case TmAbs(_, _, xt, _):
+            return TmAbs, str(xt), children[0]
+        case TmStoreLocation(_, address):
+            return TmStoreLocation, address
+        case TmRecord(_, rs):
+            return TmRecord, tuple(zip(rs.keys(), children))
+        case TmProjection(_, _, l) | TmTagging(_, l, _):
+            return type(term), l, children[0]
+        case TmCase(_, _, _, bs):
+            return TmCase, children[0], tuple(zip(bs.keys(), children[1:]))
+        case TmLetRec(_, _, xt, _, _):
+            return TmLetRec, str(xt), *children
+        case _:
+            return type(term), *children
+
+
+def term_structural_key(t: Term) -> tuple:
+    '''
+         This static method builds a hashable key describing the structure of the term.
+         Debug info and names of the bound variables are ignored,
+         so alpha-equivalent terms differing only in their positions share the key.
+
+         :param t: a Typed Lambda Calculus term
+         :return: nested tuple that can be used as a dictionary key
+    '''
+    return term_fold(t, term_node_key)
+
+
+def term_is_pure(t: Term) -> bool:
+    '''
+         Checks whether the term never touches the memory, i.e. contains no ref, !, := nor a store location.
+         The check is purely syntactic, so it's conservative: the term is pure in every context.
+
+         :param t: a Typed Lambda Calculus term
+         :return: whether the evaluation of the term (and its subterms) is free of the memory effects
+    '''
+    stack = [t]
+    while stack:
+        term = stack.pop()
+        if isinstance(term, (TmReference, TmDereference, TmAssignment, TmStoreLocation)):
+            return False
+        stack.extend(child for child, _ in term_children(term))
+    return True
+
+
+def term_is_closed(t: Term) -> bool:
+    '''
+         Checks whether the term has no free variables.
+
+         :param t: a Typed Lambda Calculus term
+         :return: whether all the variables of the term are bound inside it
+    '''
+    stack = [(t, 0)]
+    while stack:
+        term, depth = stack.pop()
+        if isinstance(term, TmVar) and term.index >= depth:
+            return False
+        stack.extend((child, depth + binders) for child, binders in term_children(term))
+    return True
+
+
+def term_size(t: Term) -> int:
+    '''
+         Counts the nodes of the term.
+
+         :param t: a Typed Lambda Calculus term
+         :return: number of the subterms (including the term itself)
+    '''
+    return term_fold(t, lambda _, children: 1 + sum(children))
+
+
+def term_size_exceeds(t: Term, limit: int) -> bool:
+    '''
+         Checks whether the term has more than `limit` nodes, visiting at most `limit + 1` of them.
+
+         :param t: a Typed Lambda Calculus term
+         :param limit: maximal number of the nodes
+         :return: whether the size of the term is greater than the limit
+    '''
+    stack = [t]
+    visited = 0
+    while stack:
+        visited += 1
+        if visited > limit:
+            return True
+        stack.extend(child for child, _ in term_children(stack.pop()))
+    return False
+
+
+def term_locations(t: Term) -> set[int]:
+    '''
+         Collects addresses of the store locations occurring in the term.
+
+         :param t: a Typed Lambda Calculus term
+         :return: set of the addresses
+    '''
+    addresses = set()
+    stack = [t]
+    while stack:
+        term = stack.pop()
+        if isinstance(term, TmStoreLocation):
+            addresses.add(term.address)
+        else:
+            stack.extend(child for child, _ in term_children(term))
+    return addresses
+
+
+def term_relocate(t: Term, addresses: dict[int, int]) -> Term:
+    '''
+         Replaces addresses of the store locations according to the mapping.
+         Subterms without relocated locations are shared with the original term.
+
+         :param t: a Typed Lambda Calculus term
+         :param addresses: mapping of the old addresses to the new ones
+         :return: new term with the relocated store locations
+    '''
+    def relocate(term: Term, children: list[Term]) -> Term:
+        if isinstance(term, TmStoreLocation):
+            address = addresses[term.address]
+            return term if address == term.address else TmStoreLocation(term.info, address)
+        if all(new is old for new, (old, _) in zip(children, term_children(term))):
+            return term
+        return term_rebuild(term, children)
+
+    return term_fold(t, relocate)
@@ -3,20 +3,9 @@
 #     It would be nice however if you mentioned me somewhere.
 #     Still, no pressure - have a nice day!
 
-from src.type import LambdaType, InvalidType, ArrowType, RecordType, VariantType, ReferenceType
+from src.type import LambdaType
 
 
 def type_is_invalid(t: LambdaType) -> bool:
-    match t:
-        case InvalidType():
-            return True
-        case ArrowType(left, right):
-            return type_is_invalid(left) or type_is_invalid(right)
-        case RecordType(rs):
-            return any([type_is_invalid(t) for t in rs.values()])
-        case VariantType(vs):
-            return any([type_is_invalid(t) for t in vs.values()])
-        case ReferenceType(t):
-            return type_is_invalid(t)
-        case _:
-            return False
\ No newline at end of file
+    """ Checks whether the type contains an InvalidType, the flag is computed once when the type gets interned. """
+    return t.invalid
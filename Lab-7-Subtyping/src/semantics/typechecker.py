@@ -6,8 +6,8 @@
 from __future__ import annotations
 
 from collections import OrderedDict
-from functools import reduce
-from typing import Optional
+from functools import reduce, wraps
+from typing import Optional, Callable, Iterator, Sequence, Generator
 
 from src.semantics.type_utils import type_is_invalid
 from src.term import Term, TmAbs, TmVar, TmApp, TmTrue, TmFalse, TmZero, TmSucc, TmIf, TmIsZero, Info, TmPred, TmLet, \
@@ -15,7 +15,7 @@ from src.term import Term, TmAbs, TmVar, TmApp, TmTrue, TmFalse, TmZero, TmSucc,
 from src.lambda_program import TypedLambdaProgram
 from dataclasses import dataclass
 from enum import Enum, auto
-from src.type import LambdaType, BaseType, InvalidType, ArrowType, RecordType, VariantType, ReferenceType
+from src.type import LambdaType, BaseType, InvalidType, ArrowType, RecordType, VariantType, ReferenceType, FieldMap
 
 
 class LambdaTypeErrorType(Enum):
@@ -74,15 +74,25 @@ class LambdaTypeError(Exception):
                f"- position: {self.term.info}"
 
 
-@dataclass(frozen=True)
+'''
+TypeBindings is a persistent cons list: None or a pair (type, rest), the head corresponds to the de Bruijn index 0.
+'''
+TypeBindings = Optional[tuple[LambdaType, 'TypeBindings']]
+
+
+@dataclass(frozen=True, eq=False, repr=False)
 class TypeContext:
     """
         A typing context, contains info about types of the bound variables.
+        The bindings are shared between the contexts, so extending a context takes constant time.
+        The comparison, hashing and printing walk the bindings iteratively, as a context may be very long.
 
         Attributes:
         ===========
-        _context: List[LambdaType]
-            list of types corresponding to the de Bruijn indices
+        _context: TypeBindings
+            cons list of types corresponding to the de Bruijn indices
+        _length: int
+            number of the bindings
 
         Static Methods:
         ===============
@@ -94,48 +104,277 @@ class TypeContext:
         type_of(index: int) -> Optional[LambdaType]
             returns type of the variable with a given de Bruijn index
             if the variable is free, the result is None
+        types_of(indices: Sequence[int]) -> tuple[Optional[LambdaType], ...]
+            returns types of the variables with the given (ascending) indices, walking the bindings once
         extend_with_type(type: LambdaType) -> TypeContext:
             creates a new context with a new type binding
     """
-    _context: list[LambdaType]
+    _context: TypeBindings
+    _length: int = 0
 
     @staticmethod
     def empty() -> TypeContext:
-        return TypeContext([])
+        return TypeContext(None)
 
     def type_of(self, index: int) -> Optional[LambdaType]:
-        if index < len(self._context):
-            return self._context[index]
-        return None
+        if index >= self._length:
+            return None
+        bindings = self._context
+        for _ in range(index):
+            bindings = bindings[1]
+        return bindings[0]
+
+    def types_of(self, indices: Sequence[int]) -> tuple[Optional[LambdaType], ...]:
+        types = []
+        bindings, position = self._context, 0
+        for index in indices:
+            if index >= self._length:
+                types.append(None)
+                continue
+            while position < index:
+                bindings, position = bindings[1], position + 1
+            types.append(bindings[0])
+        return tuple(types)
 
     def extend_with_type(self, type: LambdaType) -> TypeContext:
-        return TypeContext([type] + self._context)
+        return TypeContext((type, self._context), self._length + 1)
+
+    def __iter__(self) -> Iterator[LambdaType]:
+        bindings = self._context
+        while bindings is not None:
+            yield bindings[0]
+            bindings = bindings[1]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TypeContext):
+            return NotImplemented
+        if self._length != other._length:
+            return False
+        left, right = self._context, other._context
+        while left is not right:
+            if left[0] != right[0]:
+                return False
+            left, right = left[1], right[1]
+        return True
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
 
     def __str__(self) -> str:
-        return f"{[str(t) for t in self._context]}"
+        return f"{[str(t) for t in self]}"
+
+    def __repr__(self) -> str:
+        return f"TypeContext({self})"
+
+
+'''
+Lattice is a result of the join/meet: the type (None if there is no meet)
+with the witnesses whether the left type is a subtype of the right one and vice versa.
+'''
+Lattice = tuple[Optional[LambdaType], bool, bool]
+
+
+class MemoTable:
+    '''
+        Bounded table memoizing results of a binary operation on types, the least recently used entries are evicted first.
+
+        Attributes:
+            - size: int
+                maximal number of the entries
+            - hits, misses, evictions: int
+                statistics of the table
+
+        Methods:
+            - lookup(key: tuple) -> object
+                returns the memoized result or MemoTable.MISSING
+            - store(key: tuple, result: object) -> None
+            - clear() -> None
+                removes all the entries, keeping the statistics
+            - stats() -> dict
+                returns the statistics (with the hit rate) as a dictionary
+    '''
+    MISSING = object()
+
+    def __init__(self, size: int):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._table: OrderedDict[tuple, object] = OrderedDict()
+
+    def lookup(self, key: tuple) -> object:
+        result = self._table.get(key, MemoTable.MISSING)
+        if result is MemoTable.MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._table.move_to_end(key)
+        return result
+
+    def store(self, key: tuple, result: object) -> None:
+        self._table[key] = result
+        if len(self._table) > self.size:
+            self._table.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._table.clear()
+
+    def stats(self) -> dict:
+        queries = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / queries, 4) if queries else 0.0,
+        }
+
+
+class TypeAnnotations:
+    '''
+        Side table mapping the term nodes (compared by identity, not by structure) to their types.
+        The table keeps the annotated terms alive, so their ids can't be reused.
+        A node reached in two contexts with different types (e.g. a shared variable) is annotated with None.
+
+        Methods:
+            - add(term: Term, term_type: LambdaType) -> None
+            - type_of(term: Term) -> LambdaType | None
+                returns type of the node, None if it's unknown or ambiguous
+    '''
+    def __init__(self):
+        self._types: dict[int, tuple[Term, Optional[LambdaType]]] = {}
+
+    def add(self, term: Term, term_type: LambdaType) -> None:
+        entry = self._types.get(id(term))
+        if entry is None:
+            self._types[id(term)] = (term, term_type)
+        elif entry[1] is not term_type:
+            self._types[id(term)] = (term, None)
+
+    def type_of(self, term: Term) -> Optional[LambdaType]:
+        entry = self._types.get(id(term))
+        return None if entry is None else entry[1]
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+
+def _memoized(table: str) -> Callable:
+    """ Memoizes a method of two types in the MemoTable stored in the given attribute. """
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def memoized(self, left: LambdaType, right: LambdaType):
+            memo: MemoTable = getattr(self, table)
+            key = (left, right)
+            result = memo.lookup(key)
+            if result is MemoTable.MISSING:
+                result = method(self, left, right)
+                memo.store(key, result)
+            return result
+        return memoized
+    return decorator
 
 
 class TypedLambdaTypechecker:
     '''
         A type-checker for the Typed Lambda Calculus (with Nat and Bool types).
+        Results of the subtyping checks, joins and meets are memoized in bounded tables of `memo_size` entries.
 
         Methods:
             - typecheck(program: TypedLambdaProgram) -> LambdaType
                 returns type returned by the given lambda program
                 in case of type error, raises LambdaTypeError
+            - annotate(program: TypedLambdaProgram) -> TypeAnnotations
+                typechecks the program and returns types of all its subterms
+                in case of type error, raises LambdaTypeError
+            - memo_stats() -> dict
+                returns statistics of the subtyping, join and meet tables
     '''
+    def __init__(self, memo_size: int = 4096):
+        self._subtype_memo = MemoTable(memo_size)
+        self._join_memo = MemoTable(memo_size)
+        self._meet_memo = MemoTable(memo_size)
+        self._annotations: Optional[TypeAnnotations] = None
+
+    def memo_stats(self) -> dict:
+        return {
+            'is_subtype': self._subtype_memo.stats(),
+            'join': self._join_memo.stats(),
+            'meet': self._meet_memo.stats(),
+        }
+
     def typecheck(self, program: TypedLambdaProgram[Term]) -> LambdaType:
         return self._typecheck(program.state.term, TypeContext.empty())
 
+    def annotate(self, program: TypedLambdaProgram[Term]) -> TypeAnnotations:
+        self._annotations = TypeAnnotations()
+        try:
+            self.typecheck(program)
+            return self._annotations
+        finally:
+            self._annotations = None
+
     def _typecheck(self, term: Term, type_context: TypeContext) -> LambdaType:
         """
         Given a type context, returns a type of a term.
         In case of an error, raises LambdaTypeError
 
+        The typing rules (see `_typing_rule`) are driven with an explicit stack,
+        so arbitrarily deep terms don't overflow the python stack.
+
         :param term: a typed lambda calculus term destined to be type-checked
         :param type_context: a type context (contains type info about the bound variables)
         :return: type of the term
         """
+        annotations = self._annotations
+        result = self._cached_type(term, type_context)
+        if result is not None:
+            if annotations is not None:
+                annotations.add(term, result)
+            return result
+        stack = [(self._typing_rule(term, type_context), term, type_context)]
+        result = None
+        while stack:
+            rule, rule_term, rule_context = stack[-1]
+            try:
+                child, child_context = rule.send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                self._store_type(rule_term, rule_context, result)
+                if annotations is not None:
+                    annotations.add(rule_term, result)
+                continue
+            result = self._cached_type(child, child_context)
+            if result is None:
+                stack.append((self._typing_rule(child, child_context), child, child_context))
+            elif annotations is not None:
+                annotations.add(child, result)
+        return result
+
+    def _cached_type(self, term: Term, type_context: TypeContext) -> LambdaType | None:
+        """ Hook for the caching typecheckers: returns an already known type of the term, None if it's unknown. """
+        return None
+
+    def _store_type(self, term: Term, type_context: TypeContext, term_type: LambdaType) -> None:
+        """ Hook for the caching typecheckers: called with every computed type. """
+        pass
+
+    def _typing_rule(self, term: Term,
+                     type_context: TypeContext) -> Generator[tuple[Term, TypeContext], LambdaType, LambdaType]:
+        """
+        Given a type context, computes a type of a term.
+        In case of an error, raises LambdaTypeError.
+        The rules don't recurse: the generator yields the subterms (with their type contexts) to be type-checked
+        and receives back their types, so the subterms are checked in the same order as by the recursive rules.
+
+        :param term: a typed lambda calculus term destined to be type-checked
+        :param type_context: a type context (contains type info about the bound variables)
+        :return: generator returning the type of the term
+        """
 
         def raise_type_error(error_type: LambdaTypeErrorType, *msg_args) -> None:
             """
@@ -147,18 +386,16 @@ class TypedLambdaTypechecker:
             error_msg = error_type.value.format(*msg_args)
             raise LambdaTypeError(error_msg, term, type_context, error_type)
 
-        # TODO: update rules for:
-        # - TmIf and TmCase, so instead of DivergentBranches error they return the join type (TAPL, p. 220)
+        # the branches of TmIf and TmCase may have different types, the result is their join (TAPL, p. 220)
         match term:
             case TmFalse() | TmTrue():
                 return BaseType.Bool
             case TmIf(_, t1, t2, t3):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 if tyT1 == BaseType.Bool:
-                    tyT2 = self._typecheck(t2, type_context)
-                    tyT3 = self._typecheck(t3, type_context)
-                    # TODO: change lines below
-                    if tyT2 == tyT3:
+                    tyT2 = yield t2, type_context
+                    tyT3 = yield t3, type_context
+                    if tyT2 is tyT3:
                         return tyT2
                     else:
                         return self._join(tyT2, tyT3)
@@ -169,7 +406,7 @@ class TypedLambdaTypechecker:
             case TmUnit():
                 return BaseType.Unit
             case TmSucc(_, t1) | TmPred(_, t1) | TmIsZero(_, t1):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 if tyT1 == BaseType.Nat:
                     match term:
                         case TmIsZero():
@@ -189,15 +426,14 @@ class TypedLambdaTypechecker:
                     raise_type_error(LambdaTypeErrorType.InvalidType, tyT1)
                 else:
                     new_type_context = type_context.extend_with_type(tyT1)
-                    tyT2 = self._typecheck(t2, new_type_context)
+                    tyT2 = yield t2, new_type_context
                     return ArrowType(tyT1, tyT2)
             case TmApp(_, t1, t2):
-                tyT1 = self._typecheck(t1, type_context)
-                tyT2 = self._typecheck(t2, type_context)
+                tyT1 = yield t1, type_context
+                tyT2 = yield t2, type_context
                 match tyT1:
                     case ArrowType(tyT11, tyT12):
-                        # TODO: read the line below and understand it. 
-                        #       Don't change anything, just appreciate ;)
+                        # the argument may be of any subtype of the parameter type (T-App with subsumption)
                         if self._is_subtype(tyT2, tyT11):
                             return tyT12
                         else:
@@ -205,23 +441,26 @@ class TypedLambdaTypechecker:
                     case _:
                         raise_type_error(LambdaTypeErrorType.InvalidFunType, tyT1)
             case TmLet(_, _, t1, t2):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 new_context = type_context.extend_with_type(tyT1)
-                return self._typecheck(t2, new_context)
+                return (yield t2, new_context)
             case TmFix(_, t1):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 match tyT1:
                     case ArrowType(tyT11, tyT12):
-                        if tyT11 == tyT12:
+                        if tyT11 is tyT12:
                             return tyT11
                         else:
                             raise_type_error(LambdaTypeErrorType.InvalidRecFunType, tyT11, tyT12)
                     case _:
                         raise_type_error(LambdaTypeErrorType.InvalidFunType, tyT1)
             case TmRecord(_, ts):
-                return RecordType(OrderedDict([(l, self._typecheck(t, type_context)) for l,t in ts.items()]))
+                fields = []
+                for l, t in ts.items():
+                    fields.append((l, (yield t, type_context)))
+                return RecordType(OrderedDict(fields))
             case TmProjection(_, t1, l):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 match tyT1:
                     case RecordType(ts):
                         if l in ts:
@@ -231,10 +470,10 @@ class TypedLambdaTypechecker:
                     case _:
                         raise_type_error(LambdaTypeErrorType.InvalidProjArgType, tyT1)
             case TmTagging(_, l, t1):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 return VariantType(OrderedDict([(l, tyT1)]))
             case TmCase(_, t1, vars, branches):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 match tyT1:
                     case VariantType(vs):
                         v_labels = list(vs.keys())
@@ -244,243 +483,239 @@ class TypedLambdaTypechecker:
                         branch_types = []
                         for label, branch in branches.items():
                             branch_type_context = type_context.extend_with_type(vs[label])
-                            branch_types.append(self._typecheck(branch, branch_type_context))
-                        #TODO: Change lines below
+                            branch_types.append((yield branch, branch_type_context))
                         if len(set(branch_types)) > 1:
-                            return self._join()
+                            return reduce(self._join, branch_types)
                         return branch_types[0]
                     case _:
                         raise_type_error(LambdaTypeErrorType.InvalidVariant, tyT1)
             case TmStoreLocation():
                 raise_type_error(LambdaTypeErrorType.IllegalTerm, term)
             case TmReference(_, t1):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 return ReferenceType(tyT1)
             case TmDereference(_, t1):
-                tyT1 = self._typecheck(t1, type_context)
+                tyT1 = yield t1, type_context
                 match tyT1:
                     case ReferenceType(tyT11):
                         return tyT11
                     case _:
                         raise_type_error(LambdaTypeErrorType.InvalidMemoryAccess, tyT1)
             case TmAssignment(_, t1, t2):
-                tyT1 = self._typecheck(t1, type_context)
-                tyT2 = self._typecheck(t2, type_context)
+                tyT1 = yield t1, type_context
+                tyT2 = yield t2, type_context
                 match tyT1:
                     case ReferenceType():
                         assert isinstance(tyT1, ReferenceType)
-                        if tyT1.stored_type != tyT2:
+                        if tyT1.stored_type is not tyT2:
                             raise_type_error(LambdaTypeErrorType.IncompatibleAssignment, tyT2, tyT1)
                         return BaseType.Unit
                     case _:
                         raise_type_error(LambdaTypeErrorType.InvalidMemoryAccess, tyT1)
 
+    @_memoized('_subtype_memo')
     def _is_subtype(self, sub_type: LambdaType, super_type: LambdaType) -> bool:
-        # TODO: this method should check whether the `sub_type` is a subtype of `super_type`
-        # cases to consider:
-        # 1) they are the same types
-        # 2) super_type is a Top type (TAPL, p. 212)
-        # 3) sub_type and super_type are Arrows
-        # 4) sub_type and super_type are Records
-        # 5) sub_type and super_type are Variants
-        # tip. in cases 3-5 please use the prepared methods: _is_subtype_arrow, _is_subtype_record, _is_subtype_variant
-        if sub_type == super_type:
+        # the algorithmic subtyping (TAPL, p. 212): reflexivity (the types are interned), Top,
+        # and the structural rules for the arrows, records and variants
+        if sub_type is super_type:
             return True
-        elif super_type == BaseType.Top:
+        elif super_type is BaseType.Top:
             return True
-        elif sub_type == ArrowType and super_type == ArrowType:
+        elif isinstance(sub_type, ArrowType) and isinstance(super_type, ArrowType):
             return self._is_subtype_arrow(sub_type.left, sub_type.right, super_type.left, super_type.right)
-        elif sub_type == RecordType and super_type == RecordType:
+        elif isinstance(sub_type, RecordType) and isinstance(super_type, RecordType):
             return self._is_subtype_record(sub_type.records_types, super_type.records_types)
-        elif sub_type == VariantType and super_type == VariantType:
+        elif isinstance(sub_type, VariantType) and isinstance(super_type, VariantType):
             return self._is_subtype_variant(sub_type.variants_types, super_type.variants_types)
         else:
             return False
 
     def _is_subtype_arrow(self, sub_left: LambdaType, sub_right: LambdaType,
                           super_left: LambdaType, super_right: LambdaType) -> bool:
-        # TODO: check if `sub_left` -> `sub_right` is subtype of `super_left` -> `super_right`
-        #       tip. TAPL, p. 212 (SA-Arrow)
+        # contravariant in the argument, covariant in the result (TAPL, p. 212, SA-Arrow)
         return self._is_subtype(super_left, sub_left) and self._is_subtype(sub_right, super_right)
 
-    def _is_subtype_record(self, sub_cases: OrderedDict[str, LambdaType],
-                           super_cases: OrderedDict[str, LambdaType]) -> bool:
-        # TODO: check if Record type with fields `sub_cases` is subtype of Record with fields `super_cases`
-        #       tip. TAPL, p. 212 (SA-RCD)
-        for case in super_cases:
-            if case not in sub_cases:
-                return False
-            sub_type = sub_cases[case]
-            super_type = super_cases[case]
-            if not self._is_subtype(sub_type, super_type):
-                return False
-        return True
+    def _is_subtype_record(self, sub_cases: FieldMap, super_cases: FieldMap) -> bool:
+        # width and depth subtyping of records (TAPL, p. 212, SA-RCD):
+        # a single merge of the label-sorted fields, every label of `super_cases` has to be present in `sub_cases`
+        return self._is_subset_merge(super_cases, sub_cases, lambda super_t, sub_t: self._is_subtype(sub_t, super_t))
 
-    def _is_subtype_variant(self, sub_cases: OrderedDict[str, LambdaType],
-                            super_cases: OrderedDict[str, LambdaType]) -> bool:
-        # TODO: check if Varant type with cases `sub_variants` is subtype of Variant with cases `super_variants`
-        #       tip 1. it's very similar to records TAPL, p. 212 (SA-RCD)
-        #       tip 2. the differences are described in TAPL, p. 197
-        for case in sub_cases:
-            if case not in super_cases:
-                return False
-            sub_type = sub_cases[case]
-            super_type = super_cases[case]
-            if not self._is_subtype(sub_type, super_type):
+    def _is_subtype_variant(self, sub_cases: FieldMap, super_cases: FieldMap) -> bool:
+        # the same as for records, but the width subtyping goes the other way (TAPL, p. 197)
+        return self._is_subset_merge(sub_cases, super_cases, self._is_subtype)
+
+    @staticmethod
+    def _is_subset_merge(smaller: FieldMap, bigger: FieldMap,
+                         related: Callable[[LambdaType, LambdaType], bool]) -> bool:
+        """
+        Checks whether all the labels of `smaller` belong to `bigger` and their types are related,
+        walking the label-sorted fields of both mappings once.
+        """
+        if len(smaller) > len(bigger):
+            return False
+        bigger_fields = bigger.sorted_fields
+        i, n = 0, len(bigger_fields)
+        for label, smaller_type in smaller.sorted_fields:
+            while i < n and bigger_fields[i][0] < label:
+                i += 1
+            if i == n or bigger_fields[i][0] != label or not related(smaller_type, bigger_fields[i][1]):
                 return False
+            i += 1
         return True
 
     def _join(self, left: LambdaType, right: LambdaType) -> LambdaType:
-        # TODO: find join type ('\/' - TAPL, p. 219) of tho given types
-        #       (join type ~ the smallest supertype of the types)
-        # cases:
-        #   1. the types may be the same
-        #   2. one may be a subtype of another
-        #   3. Arrows
-        #   4. Records
-        #   5. Variants
-        #   6. in the worst case (no structural shared supertype) — return Top
-        #   in cases 3-5. use dedicated methods _join_arrows, _join_records, _join_variants
-        if left == right:
-            return right
-        if self._is_subtype(left, right):
-            return right
-        if self._is_subtype(right, left):
-            return left
-        match(left, right):
-            case (ArrowType(), ArrowType()):
-                return self._join_arrows(left.left, left.right, right.left, right.right)
-            case (RecordType(a), RecordType(b)):
-                return self._join_records(a,b)
-            case (VariantType(a), VariantType(b)):
-                return self._join_variants(a,b)
-            case _:
-                return BaseType.Top
-
-
-
-    def _join_arrows(self, left_l: LambdaType, left_r: LambdaType,
-                     right_l: LambdaType, right_r: LambdaType) -> LambdaType:
-        # TODO: find join type of two arrows: `left_l` -> `left_r` and `right_l` -> `right_r`
-        #       tips.
-        #       - the result is `left_l` /\ `right_l` -> `left_r` \/ `right_r`
-        #           where /\ is a meet, \/ is a join
-        #       - if there is no meet for the args, return Top
-        new_meet = self._meet(left_l, right_l)
-        new_join = self._join(left_r, right_r)
-        if new_meet == None:
-            return BaseType.Top
-        return ArrowType(new_meet, new_join)
-
-    def _join_records(self, left_fields: OrderedDict[str, LambdaType],
-                      right_fields: OrderedDict[str, LambdaType]) -> RecordType:
-        # TODO: find join type of two records with fields `left_records` and `right_records`
-        #       tips.
-        #       - the result should contain only labels shared by both records
-        #       - the type of the shared label should be a join type of its types in the original records
-        res = OrderedDict()
-        for label in left_fields:
-            if label in right_fields:
-                res[label] = self._join(left_fields[label], right_fields[label])
-        return RecordType(res)
-
-    def _join_variants(self, left_cases: OrderedDict[str, LambdaType],
-                       right_cases: OrderedDict[str, LambdaType]) -> VariantType:
-        # TODO: find join type of two variants with cases `left_cases` and `right_cases`
-        #       tips.
-        #       - the result should contain all labels from all the cases
-        #       - the type of the shared label should be a join type of its types in the original cases
-        res = OrderedDict()
-        for label in left_cases:
-            if label in right_cases:
-                res[label] = self._join(left_cases[label], right_cases[label])
-            else:
-                res[label] = left_cases[label]
-        for label in right_cases:
-            if label not in res:
-                res[label] = right_cases[label]
-        return VariantType(res)
-
+        # join type ('\/' - TAPL, p. 219) of the given types (join type ~ the smallest supertype of the types)
+        return self._join_relate(left, right)[0]
 
     def _meet(self, left: LambdaType, right: LambdaType) -> LambdaType | None:
-        # TODO: find meet type ('/\' - TAPL, p. 219) of tho given types
-        #       (meet type ~ the biggest subtype of the types)
-        # cases:
-        #   1. the types may be the same
-        #   2. one may be a subtype of another
-        #   3. Arrows
-        #   4. Records
-        #   5. Variants
-        #   6. in the worst case (no structural shared subtype) — return None
-        #   in cases 3-5. use dedicated methods _meet_arrows, _meet_records, _meet_variants
-        if left == right:
-            return right
-        if self._is_subtype(left, right):
-            return left
-        if self._is_subtype(right, left):
-            return right
+        # meet type ('/\' - TAPL, p. 219) of the given types (meet type ~ the biggest subtype of the types),
+        # None if there is no such type
+        return self._meet_relate(left, right)[0]
+
+    @_memoized('_join_memo')
+    def _join_relate(self, left: LambdaType, right: LambdaType) -> Lattice:
+        """
+        Finds the join type together with the witnesses whether left <: right and right <: left.
+        The witnesses are computed by the same pass as the join of the components,
+        so the join doesn't have to check the subtyping in both directions first.
+
+        :return: triple (join, left <: right, right <: left)
+        """
+        if left is right:
+            return left, True, True
+        if right is BaseType.Top or left is BaseType.Top:
+            return BaseType.Top, right is BaseType.Top, left is BaseType.Top
         match (left, right):
-            case (ArrowType(sub_l, sub_r), ArrowType(super_l, super_r)):
-                return self._meet_arrows(sub_l, sub_r, super_l, super_r)
-            case (RecordType(a), RecordType(b)):
-                return self._meet_records(a, b)
-            case (VariantType(a), VariantType(b)):
-                return self._meet_variants(a, b)
+            case (ArrowType(), ArrowType()):
+                return self._join_arrows(left, right)
+            case (RecordType(), RecordType()):
+                return self._join_records(left, right)
+            case (VariantType(), VariantType()):
+                return self._join_variants(left, right)
             case _:
-                return None
-
+                return BaseType.Top, False, False
 
+    @_memoized('_meet_memo')
+    def _meet_relate(self, left: LambdaType, right: LambdaType) -> Lattice:
+        """
+        Finds the meet type (or None) together with the witnesses whether left <: right and right <: left.
 
-    def _meet_arrows(self, left_l: LambdaType, left_r: LambdaType,
-                     right_l: LambdaType, right_r: LambdaType) -> ArrowType | None:
-        # TODO: find meet type of two arrows: `left_l` -> `left_r` and `right_l` -> `right_r`
-        #       tips.
-        #       - the result is `left_l` \/ `right_l` -> `left_r` /\ `right_r`
-        #           where /\ is a meet, \/ is a join
-        #       - if there is no meet for the results, return None
-        new_join = self._join(left_l, right_l)
-        new_meet = self._meet(left_r, right_r)
-        if new_meet == None:
-            return None
-        return ArrowType(new_join, new_meet)
-
-    def _meet_records(self, left_fields: OrderedDict[str, LambdaType],
-                      right_fields: OrderedDict[str, LambdaType]) -> RecordType | None:
-        # TODO: find meet type of two records with fields `left_fields` and `right_fields`
-        #       tips.
-        #       - the result should contain all labels from all the cases
-        #       - the type of the shared label should be a meet type of its types in the original fields
-        #           * if there is no such a meet, return None
-        res = OrderedDict()
-        for label in left_fields:
-            if label in right_fields:
-                meet = self._meet(left_fields[label], right_fields[label])
-                if meet is not None:
-                    res[label] = meet
-                else:
-                    return None
+        :return: triple (meet, left <: right, right <: left)
+        """
+        if left is right:
+            return left, True, True
+        if right is BaseType.Top or left is BaseType.Top:
+            return (left if right is BaseType.Top else right), right is BaseType.Top, left is BaseType.Top
+        match (left, right):
+            case (ArrowType(), ArrowType()):
+                return self._meet_arrows(left, right)
+            case (RecordType(), RecordType()):
+                return self._meet_records(left, right)
+            case (VariantType(), VariantType()):
+                return self._meet_variants(left, right)
+            case _:
+                return None, False, False
+
+    def _join_arrows(self, left: ArrowType, right: ArrowType) -> Lattice:
+        # the join is `left_l` /\ `right_l` -> `left_r` \/ `right_r`, Top if the arguments have no meet
+        meet, args_sub, args_super = self._meet_relate(left.left, right.left)
+        join, results_sub, results_super = self._join_relate(left.right, right.right)
+        is_sub, is_super = args_super and results_sub, args_sub and results_super
+        if is_sub:
+            return right, True, is_super
+        if is_super:
+            return left, False, True
+        return (BaseType.Top if meet is None else ArrowType(meet, join)), False, False
+
+    def _meet_arrows(self, left: ArrowType, right: ArrowType) -> Lattice:
+        # the meet is `left_l` \/ `right_l` -> `left_r` /\ `right_r`, None if the results have no meet
+        join, args_sub, args_super = self._join_relate(left.left, right.left)
+        meet, results_sub, results_super = self._meet_relate(left.right, right.right)
+        is_sub, is_super = args_super and results_sub, args_sub and results_super
+        if is_sub:
+            return left, True, is_super
+        if is_super:
+            return right, False, True
+        return (None if meet is None else ArrowType(join, meet)), False, False
+
+    def _join_records(self, left: RecordType, right: RecordType) -> Lattice:
+        # the join contains only the shared labels (in the order of `left`) with the joins of their types
+        is_sub = is_super = True
+        shared: dict[str, LambdaType] = {}
+        for label, left_type, right_type in left.records_types.merge(right.records_types):
+            if left_type is None:
+                is_sub = False
+            elif right_type is None:
+                is_super = False
             else:
-                res[label] = left_fields[label]
-        for label in right_fields:
-            if label not in res:
-                res[label] = right_fields[label]
-        return RecordType(res)
-
-
-    def _meet_variants(self, left_cases: OrderedDict[str, LambdaType],
-                       right_cases: OrderedDict[str, LambdaType]) -> VariantType | None:
-        # TODO: find meet type of two variants with cases `left_cases` and `right_cases`
-        #       tips.
-        #       - the result should contain only labels shared by both variants
-        #       - the type of the shared label should be a meet type of its types in the original cases
-        #           * if there is no such meet type, return None
-        res = OrderedDict()
-        for label in left_cases:
-            if label in right_cases:
-                meet = self._meet(left_cases[label], right_cases[label])
-                if meet is not None:
-                    res[label] = meet
-                else:
-                    return None
-        return VariantType(res)
-
+                shared[label], field_sub, field_super = self._join_relate(left_type, right_type)
+                is_sub, is_super = is_sub and field_sub, is_super and field_super
+        if is_sub:
+            return right, True, is_super
+        if is_super:
+            return left, False, True
+        return RecordType(FieldMap((l, shared[l]) for l in left.records_types if l in shared)), False, False
+
+    def _join_variants(self, left: VariantType, right: VariantType) -> Lattice:
+        # the join contains all the labels (`left` ones first), the shared ones with the joins of their types
+        is_sub = is_super = True
+        shared: dict[str, LambdaType] = {}
+        for label, left_type, right_type in left.variants_types.merge(right.variants_types):
+            if left_type is None:
+                is_super = False
+            elif right_type is None:
+                is_sub = False
+            else:
+                shared[label], field_sub, field_super = self._join_relate(left_type, right_type)
+                is_sub, is_super = is_sub and field_sub, is_super and field_super
+        if is_sub:
+            return right, True, is_super
+        if is_super:
+            return left, False, True
+        cases = [(l, shared.get(l, t)) for l, t in left.variants_types.items()]
+        cases += [(l, t) for l, t in right.variants_types.items() if l not in left.variants_types]
+        return VariantType(FieldMap(cases)), False, False
+
+    def _meet_records(self, left: RecordType, right: RecordType) -> Lattice:
+        # the meet contains all the labels (`left` ones first), the shared ones with the meets of their types,
+        # None if any of the shared labels has no meet
+        is_sub = is_super = True
+        shared: dict[str, LambdaType | None] = {}
+        for label, left_type, right_type in left.records_types.merge(right.records_types):
+            if left_type is None:
+                is_sub = False
+            elif right_type is None:
+                is_super = False
+            else:
+                shared[label], field_sub, field_super = self._meet_relate(left_type, right_type)
+                is_sub, is_super = is_sub and field_sub, is_super and field_super
+        if is_sub:
+            return left, True, is_super
+        if is_super:
+            return right, False, True
+        if None in shared.values():
+            return None, False, False
+        fields = [(l, shared.get(l, t)) for l, t in left.records_types.items()]
+        fields += [(l, t) for l, t in right.records_types.items() if l not in left.records_types]
+        return RecordType(FieldMap(fields)), False, False
+
+    def _meet_variants(self, left: VariantType, right: VariantType) -> Lattice:
+        # the meet contains only the shared labels (in the order of `left`) with the meets of their types,
+        # None if any of them has no meet
+        is_sub = is_super = True
+        shared: dict[str, LambdaType | None] = {}
+        for label, left_type, right_type in left.variants_types.merge(right.variants_types):
+            if left_type is None:
+                is_super = False
+            elif right_type is None:
+                is_sub = False
+            else:
+                shared[label], field_sub, field_super = self._meet_relate(left_type, right_type)
+                is_sub, is_super = is_sub and field_sub, is_super and field_super
+        if is_sub:
+            return left, True, is_super
+        if is_super:
+            return right, False, True
+        if None in shared.values():
+            return None, False, False
+        return VariantType(FieldMap((l, shared[l]) for l in left.variants_types if l in shared)), False, False
@@ -78,7 +78,7 @@ class Lexer:
             # of the last newline (so we know what column a given character is in)
             if '\n' in value:
                 lineno += value.count('\n')
-                last_newline = end - value.rfind('\n')
+                last_newline = start + value.rfind('\n') + 1
             match = self.matcher(text, end)
 
         # Check for invalid input--we didn't reach the end of the input
@@ -0,0 +1,143 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+from __future__ import annotations
+
+from collections import deque
+
+from src.lambda_program import LambdaProgramState, TypedLambdaProgram
+from src.memory import Memory
+from src.semantics.evaluator import Transition
+from src.term import TmStoreLocation, Info
+
+
+class TracePrinter:
+    '''
+    Prints the evaluation trace: the program, then every transition with its witnesses.
+
+    Memory modes:
+        - full: every state is printed with the whole memory
+        - delta: the memory is printed in full only with the program, afterwards each state shows
+                 only the cells written or allocated by the current step, as `+{@i <- term, ...}`
+                 (`+{}` when the step hasn't touched the memory yet)
+
+    Attributes:
+        - reads_old_states: bool
+            whether the printer reads the states from before a step after it has been made
+            (the witnesses are printed with the memory before the step), a MutableMemory needs the undo log then
+
+    Methods:
+        - program(program: TypedLambdaProgram) -> None
+            prints the initial state
+        - transition(t: Transition) -> None
+            prints the transition and its witnesses
+        - message(text: str) -> None
+            prints a line that is not a part of the derivation, e.g. the final status
+    '''
+    MEMORY_MODES = ('full', 'delta')
+    reads_old_states = True
+
+    def __init__(self, memory_mode: str = 'full'):
+        if memory_mode not in self.MEMORY_MODES:
+            raise ValueError(f"unknown memory mode: {memory_mode}")
+        self.memory_mode = memory_mode
+
+    def state_str(self, state: LambdaProgramState, name_context: list[str], reference: Memory) -> str:
+        if self.memory_mode == 'full':
+            return state.pretty_str(name_context)
+        if state.memory is reference:
+            changes = ""
+        else:
+            changes = ", ".join(f"@{i} <- {state.memory.dereference(TmStoreLocation(Info.dummy_info(), i))}"
+                                for i in state.memory.changed_addresses(reference))
+        return f"({state.pretty_term_str(name_context)} | +{{{changes}}})"
+
+    def program(self, program: TypedLambdaProgram) -> None:
+        print(program)
+
+    def message(self, text: str) -> None:
+        print(text)
+
+    def transition(self, t: Transition) -> None:
+        reference = t.old_state.memory
+        print(f'-> {self.state_str(t.new_state, t.name_context, reference)}  [{t.rule.name}]')
+        self.witnesses(t, reference)
+
+    def witnesses(self, t: Transition, reference: Memory, level: int = 0) -> None:
+        deriv_symb = "|: "
+        pending = [(witness, level) for witness in reversed(t.witnesses)]
+        while pending:
+            witness, witness_level = pending.pop()
+            tab = "   " * (witness_level + 1)
+            old_state = self.state_str(witness.old_state, witness.name_context, reference)
+            new_state = self.state_str(witness.new_state, witness.name_context, reference)
+            print(f"{tab}{deriv_symb}{old_state} -> {new_state}  [{witness.rule.name}]")
+            pending.extend((w, witness_level + 1) for w in reversed(witness.witnesses))
+
+
+class SampledTracePrinter:
+    '''
+    Prints only a part of the trace, the skipped transitions are never formatted.
+
+    Modes (`spec` of `from_spec`):
+        - none: only the final status
+        - final: the last transition and the final status
+        - every:N: the program, every N-th transition, the last one and the final status
+        - tail:K: the last K transitions (kept in a ring buffer until the end) and the final status
+        - full: everything, the same as the TracePrinter itself
+
+    Methods:
+        - program(program: TypedLambdaProgram) -> None
+        - transition(t: Transition) -> None
+        - message(text: str) -> None
+            prints the pending transitions and the message
+    '''
+    MODES = ('none', 'final', 'every', 'tail', 'full')
+
+    def __init__(self, printer: TracePrinter, mode: str = 'full', n: int = 1):
+        if mode not in self.MODES:
+            raise ValueError(f"unknown trace mode: {mode}")
+        if n < 1:
+            raise ValueError(f"trace mode {mode} requires a positive number")
+        self.printer = printer
+        self.mode = mode
+        self.n = n
+        self.steps = 0
+        self._pending: deque[Transition] = deque(maxlen=n if mode == 'tail' else 1)
+
+    @classmethod
+    def from_spec(cls, spec: str, printer: TracePrinter) -> SampledTracePrinter:
+        """ Creates the printer from a specification like `every:10`, raises ValueError if it's malformed. """
+        mode, _, number = spec.partition(':')
+        if mode in ('every', 'tail'):
+            if not number.isdigit():
+                raise ValueError(f"trace mode {mode} requires a number, e.g. {mode}:10")
+            return cls(printer, mode, int(number))
+        if number:
+            raise ValueError(f"trace mode {mode} doesn't take a number")
+        return cls(printer, mode)
+
+    @property
+    def reads_old_states(self) -> bool:
+        return self.mode != 'none' and self.printer.reads_old_states
+
+    def program(self, program: TypedLambdaProgram) -> None:
+        if self.mode in ('every', 'full'):
+            self.printer.program(program)
+
+    def transition(self, t: Transition) -> None:
+        self.steps += 1
+        match self.mode:
+            case 'full':
+                self.printer.transition(t)
+            case 'every' if self.steps % self.n == 0:
+                self.printer.transition(t)
+                self._pending.clear()
+            case 'every' | 'final' | 'tail':
+                self._pending.append(t)
+
+    def message(self, text: str) -> None:
+        while self._pending:
+            self.printer.transition(self._pending.popleft())
+        self.printer.message(text)
@@ -4,8 +4,9 @@
 #     Still, no pressure - have a nice day!
 from __future__ import annotations
 
-from collections import OrderedDict
-from dataclasses import dataclass
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from weakref import WeakValueDictionary
 from enum import Enum
 from typing import TypeAlias, Union
 
@@ -45,19 +46,49 @@ class BaseType(Enum):
     def __str__(self):
         return self.value
 
+    @property
+    def invalid(self) -> bool:
+        return False
+
     @staticmethod
     def from_text(text: str) -> BaseType | InvalidType:
-        for bt in BaseType:
-            if bt.value == text:
-                return bt
-        return InvalidType(text)
+        try:
+            return BaseType(text)
+        except ValueError:
+            return InvalidType(text)
+
+
+class InternedType(type):
+    """
+    Metaclass of the compound types, it makes the constructors act as a factory:
+    structurally equal types are always the same object, so the equality (and hashing) is just the identity.
+    Mappings passed to the constructors are converted to FieldMaps before the lookup.
+    The table holds the types weakly, the unused ones can be collected.
+    """
+    _table: WeakValueDictionary[tuple, object] = WeakValueDictionary()
 
+    def __call__(cls, *args):
+        key = (cls, *(FieldMap(a) if isinstance(a, Mapping) and not isinstance(a, FieldMap) else a for a in args))
+        interned = InternedType._table.get(key)
+        if interned is None:
+            interned = InternedType._table[key] = super().__call__(*key[1:])
+        return interned
 
-@dataclass(frozen=True)
-class InvalidType:
+
+class _Interned:
+    """ Base class of the interned types: copies and unpickled types go through the factory as well. """
+    __match_args__: tuple[str, ...] = ()
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, f) for f in self.__match_args__)
+
+
+@dataclass(frozen=True, eq=False)
+class InvalidType(_Interned, metaclass=InternedType):
     """
-    Parser is not responsible for handling types.
-    When a strange type annotation gets parsed, it results in an invalid type.
+    Type of a strange type annotation, produced by `BaseType.from_text`.
+    The parser rejects such annotations with their position, so only the terms built by hand
+    can reach the typechecker with an invalid type (it's detected by the `invalid` flag).
 
     Attributes:
     ===========
@@ -65,13 +96,98 @@ class InvalidType:
         how the related type annotation looks in the code
     """
     raw_representation : str
+    invalid: bool = field(init=False, repr=False, default=True)
 
     def __str__(self):
         return f"{self.raw_representation}"
 
 
-@dataclass(frozen=True)
-class ArrowType:
+class FieldMap(Mapping):
+    """
+        Immutable mapping of labels to types, used by the record and variant types.
+        The order of the labels is kept and matters for the equality (as it did for the OrderedDict),
+        the hash is computed once, so the types containing records and variants can be used as dictionary keys.
+
+        Attribute:
+        ===============
+        fields: tuple[tuple[str, LambdaType], ...]
+            pairs (label, type) in the original order
+        sorted_fields: tuple[tuple[str, LambdaType], ...]
+            the same pairs sorted by the labels (computed on the first use)
+
+        Methods:
+        ===============
+        merge(other: FieldMap) -> Iterator[tuple[str, LambdaType | None, LambdaType | None]]
+            walks the labels of both mappings in the sorted order (a single linear merge),
+            yielding the label with its type in this and the other mapping (None if the label is missing)
+    """
+    __slots__ = ('fields', '_index', '_hash', '_sorted')
+
+    def __init__(self, items: Mapping[str, LambdaType] | Iterable[tuple[str, LambdaType]] = ()):
+        if isinstance(items, Mapping):
+            items = items.items()
+        self.fields = tuple(items)
+        self._index = dict(self.fields)
+        self._hash = hash(self.fields)
+        self._sorted = None
+
+    @property
+    def sorted_fields(self) -> tuple[tuple[str, LambdaType], ...]:
+        if self._sorted is None:
+            self._sorted = tuple(sorted(self.fields, key=lambda f: f[0]))
+        return self._sorted
+
+    def merge(self, other: FieldMap) -> Iterator[tuple[str, LambdaType | None, LambdaType | None]]:
+        left, right = self.sorted_fields, other.sorted_fields
+        i = j = 0
+        while i < len(left) and j < len(right):
+            (left_label, left_type), (right_label, right_type) = left[i], right[j]
+            if left_label == right_label:
+                yield left_label, left_type, right_type
+                i += 1
+                j += 1
+            elif left_label < right_label:
+                yield left_label, left_type, None
+                i += 1
+            else:
+                yield right_label, None, right_type
+                j += 1
+        for label, t in left[i:]:
+            yield label, t, None
+        for label, t in right[j:]:
+            yield label, None, t
+
+    def __getitem__(self, label: str) -> LambdaType:
+        return self._index[label]
+
+    def __contains__(self, label: object) -> bool:
+        return label in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return (l for l, _ in self.fields)
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if isinstance(other, FieldMap):
+            return self._hash == other._hash and self.fields == other.fields
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        return FieldMap, (self.fields,)
+
+    def __repr__(self) -> str:
+        return f"FieldMap({list(self.fields)!r})"
+
+
+@dataclass(frozen=True, eq=False)
+class ArrowType(_Interned, metaclass=InternedType):
     """
         Type constructed using an arrow (->).
         In other words it's a function type.
@@ -85,6 +201,10 @@ class ArrowType:
     """
     left: LambdaType
     right: LambdaType
+    invalid: bool = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'invalid', self.left.invalid or self.right.invalid)
 
     def __str__(self):
         match self.left:
@@ -94,17 +214,22 @@ class ArrowType:
                 return f"{self.left} -> {self.right}"
 
 
-@dataclass(frozen=True)
-class RecordType:
+@dataclass(frozen=True, eq=False)
+class RecordType(_Interned, metaclass=InternedType):
     """
         Basic record type.
 
         Attribute:
         ===============
-        record_types: OrderedDict[str, LambdaType]
-            this dictionary maps record labels to the corresponding types
+        record_types: FieldMap
+            this mapping maps record labels to the corresponding types
+            (any other mapping passed to the constructor gets converted)
     """
-    records_types: OrderedDict[str, LambdaType]
+    records_types: FieldMap
+    invalid: bool = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'invalid', any(t.invalid for t in self.records_types.values()))
 
     @staticmethod
     def from_raw_data(info: Info, raw_items: list[tuple(str, LambdaType) | LambdaType]) -> RecordType:
@@ -119,37 +244,42 @@ class RecordType:
         labels = [i[0] for i in items]
         if len(labels) > len(set(labels)):
             raise TypeBuildingError("Parsed record type contains repeating labels", info)
-        return RecordType(OrderedDict(items))
+        return RecordType(FieldMap(items))
 
     def __str__(self) -> str:
         return "{" + ','.join([f"{l}: {t}" for l, t in self.records_types.items()]) + "}"
 
 
-@dataclass(frozen=True)
-class VariantType:
+@dataclass(frozen=True, eq=False)
+class VariantType(_Interned, metaclass=InternedType):
     """
         Basic variant type.
 
         Attribute:
         ===============
-        variant_types: OrderedDict[str, LambdaType]
-            this dictionary maps variant labels to the corresponding types
+        variant_types: FieldMap
+            this mapping maps variant labels to the corresponding types
+            (any other mapping passed to the constructor gets converted)
     """
-    variants_types: OrderedDict[str, LambdaType]
+    variants_types: FieldMap
+    invalid: bool = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'invalid', any(t.invalid for t in self.variants_types.values()))
 
     @staticmethod
     def from_raw_data(info: Info, items: list[tuple(str, LambdaType)]) -> VariantType:
         labels = [i[0] for i in items]
         if len(labels) > len(set(labels)):
             raise TypeBuildingError("Parsed variant type contains repeating labels", info)
-        return VariantType(OrderedDict(items))
+        return VariantType(FieldMap(items))
 
     def __str__(self) -> str:
         return "<" + ','.join([f"{l}: {t}" for l, t in self.variants_types.items()]) + ">"
 
 
-@dataclass(frozen=True)
-class ReferenceType:
+@dataclass(frozen=True, eq=False)
+class ReferenceType(_Interned, metaclass=InternedType):
     """
         Reference type.
 
@@ -159,6 +289,10 @@ class ReferenceType:
             type of the referenced term
     """
     stored_type: LambdaType
+    invalid: bool = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'invalid', self.stored_type.invalid)
 
     def __str__(self) -> str:
         return f"Ref {self.stored_type}"
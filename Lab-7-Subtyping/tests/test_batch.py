@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from src.batch import typecheck_batch, typecheck_source
+
+SOURCES = [
+    ("nat", "succ 0"),
+    ("record", "(\\x:{a:Nat}. x.a) {a = 0, b = true}"),
+    ("unnatural", "(\\x:Bool. succ x) true"),
+    ("syntax", "(\\x:Nat. x"),
+    ("join", "if true then {u = unit, b = true} else {b = false}"),
+] * 5
+
+
+class TestBatchTypecheck(TestCase):
+
+    def test_results(self):
+        self.assertEqual({'name': 'nat', 'type': 'Nat'}, typecheck_source("nat", "succ 0"))
+        self.assertEqual({'name': 'unnatural', 'error': 'type', 'error_type': 'UnnaturalArg',
+                          'msg': "argument is not a natural number, got 'Bool'", 'term': "succ var<0>",
+                          'type_context': "['Bool']", 'position': "Info(lineno=1, column=10)"},
+                         typecheck_source("unnatural", "(\\x:Bool. succ x) true"))
+        error = typecheck_source("syntax", "(\\x:Nat. x")
+        self.assertEqual(('parse', 1), (error['error'], error['line']))
+        error = typecheck_source("labels", "{a = 0, a = true}")
+        self.assertEqual(('term', "Parsed record contains repeating labels"), (error['error'], error['msg']))
+        self.assertEqual('recursion', typecheck_source("deep", "succ " * 3000 + "0")['error'])
+
+    @parameterized.expand([
+        (0, 1),
+        (1, 3),
+        (2, 2),
+    ])
+    def test_submission_order(self, workers, chunk_size):
+        expected = [typecheck_source(name, raw_program) for name, raw_program in SOURCES]
+        self.assertEqual(expected, list(typecheck_batch(SOURCES, workers, chunk_size)))
+
+
+    @parameterized.expand([
+        (0,),
+        (1,),
+    ])
+    def test_bad_program_between_good_ones(self, workers):
+        sources = [("first", "succ 0"), ("labels", "{a = 0, a = true}"), ("record type", "\\x:{a:Nat, a:Bool}. x"),
+                   ("variant type", "\\x:<a:Nat, a:Bool>. x"), ("deep", "succ " * 3000 + "0"), ("last", "iszero 0")]
+        results = list(typecheck_batch(sources, workers, chunk_size=4))
+        self.assertEqual([result['name'] for result in results],
+                         ["first", "labels", "record type", "variant type", "deep", "last"])
+        self.assertEqual([result.get('type') or result['error'] for result in results],
+                         ["Nat", "term", "term", "term", "recursion", "Bool"])
@@ -0,0 +1,104 @@
+from contextlib import redirect_stdout
+from io import StringIO, BytesIO
+from unittest import TestCase
+from parameterized import parameterized
+
+from src.binary_trace import BinaryTraceWriter, read_trace, TraceFormatError, dumps_state, loads_state
+from src.lambda_program import TypedLambdaProgram
+from src.memory import MutableMemory
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies, Transition
+from src.semantics.macro import MacroSystem
+from src.term import TmSucc
+from src.trace import TracePrinter
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def numeral_value(t) -> int:
+    value = 0
+    while isinstance(t, TmSucc):
+        t, value = t.number, value + 1
+    return value
+
+
+def run(program, sink) -> None:
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    sink.program(program)
+    while True:
+        try:
+            transition = evaluator.single_step(state)
+        except NoEvalRuleApplies:
+            sink.message("---- finished successfully")
+            return
+        sink.transition(transition)
+        state = transition.new_state
+
+
+def render(data: bytes) -> str:
+    output = StringIO()
+    printer = TracePrinter()
+    with redirect_stdout(output):
+        for record in read_trace(BytesIO(data)):
+            match record:
+                case TypedLambdaProgram():
+                    printer.program(record)
+                case Transition():
+                    printer.transition(record)
+                case str():
+                    printer.message(record)
+    return output.getvalue()
+
+
+class TestBinaryTrace(TestCase):
+
+    @parameterized.expand([
+        ("letrec iseven : Nat->Bool = \\x:Nat. (if iszero x then true else if iszero (pred x) then false "
+         "else iseven (pred (pred x))) in iseven (succ (succ (succ 0)))", False),
+        ("(\\r:Ref Nat. (\\s:Ref Nat. (r := (succ !s)); (s := (succ !r)); {a = !r, b = !s, c = ref 0}) (ref 0)) "
+         "(ref (succ 0))", False),
+        ("let r = ref 0 in (r := succ !r); (r := succ !r); case <a = !r> of <a = x> => x", True),
+    ])
+    def test_round_trip(self, raw_program, mutable):
+        def fresh_program():
+            program = load(raw_program)
+            if mutable:
+                # a mutable memory can be evaluated only once
+                program = TypedLambdaProgram(program.state.replace_memory(MutableMemory()), program.name_context)
+            return program
+
+        printed = StringIO()
+        with redirect_stdout(printed):
+            run(fresh_program(), TracePrinter())
+        data = BytesIO()
+        run(fresh_program(), BinaryTraceWriter(data))
+        self.assertEqual(render(data.getvalue()), printed.getvalue())
+
+    def test_shared_nodes_reset(self):
+        raw_program = "letrec iseven : Nat->Bool = \\x:Nat. (if iszero x then true else if iszero (pred x) " \
+                      "then false else iseven (pred (pred x))) in iseven (succ (succ (succ 0)))"
+        printed = StringIO()
+        with redirect_stdout(printed):
+            run(load(raw_program), TracePrinter())
+        data = BytesIO()
+        run(load(raw_program), BinaryTraceWriter(data, max_shared_nodes=10))
+        self.assertIn(b"R", data.getvalue())
+        self.assertEqual(render(data.getvalue()), printed.getvalue())
+
+    def test_deep_term(self):
+        program = load("succ 0")
+        deep = program.state
+        for _ in range(5000):
+            deep = deep.replace_term(TmSucc(program.state.term.info, deep.term))
+        self.assertEqual(numeral_value(loads_state(dumps_state(deep)).term), 5001)
+        data = BytesIO()
+        BinaryTraceWriter(data).program(TypedLambdaProgram(deep, program.name_context))
+        self.assertEqual(numeral_value(next(read_trace(BytesIO(data.getvalue()))).state.term), 5001)
+
+    def test_not_a_trace(self):
+        with self.assertRaises(TraceFormatError):
+            list(read_trace(BytesIO(b"(\\x:Nat. x) 0")))
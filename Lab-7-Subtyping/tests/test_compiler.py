@@ -0,0 +1,79 @@
+from unittest import TestCase
+from parameterized import parameterized
+
+from src.parser import TypedLambdaParser
+from src.semantics.compiler import PythonCompiler, CompilationError
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies
+from src.semantics.macro import MacroSystem
+from src.semantics.term_utils import term_structural_key
+from src.semantics.typechecker import TypedLambdaTypechecker
+
+
+def load(raw_program: str):
+    program = MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+    TypedLambdaTypechecker().typecheck(program)
+    return program
+
+
+def interpret(program):
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    while True:
+        try:
+            state = evaluator.single_step(state).new_state
+        except NoEvalRuleApplies:
+            return state
+
+
+class TestPythonCompiler(TestCase):
+
+    @parameterized.expand([
+        ("(\\x:Nat.if iszero x then 0 else succ 0) 0",),
+        ("(let y = false in let x = true in \\z:Nat. if iszero z then x else y) 0",),
+        ("letrec iseven : Nat->Bool = \\x:Nat. (if iszero x then true else if iszero (pred x) then false "
+         "else iseven (pred (pred x))) in iseven (succ (succ (succ (succ (succ 0)))))",),
+        ("letrec plus: Nat -> (Nat -> Nat) = \\x: Nat. \\y: Nat. if iszero y then x else (plus succ x) (pred y) "
+         "in letrec fib: Nat -> Nat = \\i: Nat. if iszero i then 0 else if iszero pred i then succ 0 "
+         "else (plus (fib pred i)) (fib pred pred i) in fib succ succ succ succ succ succ 0",),
+        ("if true then { u = unit, b = true } else { b = false }",),
+        ("{ a = pred 0, b = <l = true>}.a",),
+        ("case <n = succ 0> of <n = y> => succ y",),
+        ("(\\r:Ref Nat. (r := (succ !r)); (r := (succ !r)); !r) (ref (succ 0))",),
+        ("(\\x:{a:Nat, b:Bool}. if x.b then succ x.a else x.a) {a = 0, b = true}",),
+        ("(\\x:{a:Nat}. x.a) {b = true, a = succ 0}",),
+        ("(\\f:{b:Bool}->Bool. f {a = 0, b = false}) (\\x:{b:Bool}. x.b)",),
+    ])
+    def test_same_result_as_interpreter(self, raw_program: str):
+        program = load(raw_program)
+        for specialize in [False, True]:
+            compiled = PythonCompiler(specialize).run(program).term
+            self.assertEqual(term_structural_key(compiled), term_structural_key(interpret(program).term))
+
+    def test_projection_uses_static_slot(self):
+        program = load("(\\x:{a:Nat, b:Bool}. x.b) {a = 0, b = true}")
+        self.assertIn("v2[1] if v2.__class__ is _L0", PythonCompiler(specialize=True).emit(program))
+        self.assertNotIn("v2[1]", PythonCompiler().emit(program))
+
+    def test_functional_result(self):
+        self.assertIsNone(PythonCompiler().run(load("\\x:Nat. succ x")))
+
+    def test_code_is_cached(self):
+        compiler = PythonCompiler()
+        first = compiler.compile(load("(\\x:Nat. succ x) 0"))
+        second = compiler.compile(load("(\\y:Nat.   succ y) 0"))
+        self.assertIs(first, second)
+
+    def test_code_cache_is_bounded(self):
+        compiler = PythonCompiler()
+        first = compiler.compile(load("(\\x:Nat. succ x) 0"))
+        for i in range(PythonCompiler.CODE_CACHE_SIZE):
+            compiler.compile(load(f"(\\x:Nat. {{l{i} = x}}) 0"))
+        self.assertLessEqual(len(PythonCompiler._code_cache), PythonCompiler.CODE_CACHE_SIZE)
+        self.assertIsNot(compiler.compile(load("(\\x:Nat. succ x) 0")), first)
+
+    def test_deep_recursion_is_compilation_error(self):
+        program = load("letrec double: Nat -> Nat = \\x:Nat. if iszero x then 0 else succ (succ (double (pred x))) "
+                       "in double " + "(double " * 10 + "(succ 0)" + ")" * 10)
+        with self.assertRaises(CompilationError):
+            PythonCompiler().run(program)
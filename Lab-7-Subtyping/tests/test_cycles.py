@@ -0,0 +1,99 @@
+from unittest import TestCase
+from parameterized import parameterized
+
+from src.parser import TypedLambdaParser
+from src.memory import MutableMemory
+from src.semantics.cycles import CycleDetector, StateFingerprinter
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies, Diverges
+from src.semantics.macro import MacroSystem
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def interpret(program, detector: CycleDetector, max_steps: int = 10_000):
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    for _ in range(max_steps):
+        detector.observe(state)
+        try:
+            state = evaluator.single_step(state).new_state
+        except NoEvalRuleApplies:
+            return state
+    raise AssertionError("evaluation neither finished nor diverged")
+
+
+COUNTDOWN = "letrec f: Nat -> Nat = \\x: Nat. if iszero x then f (succ succ succ 0) else f (pred x) in f 0"
+
+
+class TestCycleDetector(TestCase):
+
+    @parameterized.expand([(mode,) for mode in CycleDetector.MODES])
+    def test_finds_cycle_length(self, mode):
+        with self.assertRaises(Diverges) as fix_loop:
+            interpret(load("fix (\\x: Nat. x)"), CycleDetector(mode))
+        self.assertEqual(fix_loop.exception.cycle_length, 1)
+
+        with self.assertRaises(Diverges) as countdown:
+            interpret(load(COUNTDOWN), CycleDetector(mode, max_samples=2))
+        with self.assertRaises(Diverges) as reference:
+            interpret(load(COUNTDOWN), CycleDetector('full'))
+        self.assertEqual(countdown.exception.cycle_length, reference.exception.cycle_length)
+
+    @parameterized.expand([(mode,) for mode in CycleDetector.MODES])
+    def test_terminating_programs(self, mode):
+        interpret(load("let r = ref 0 in (r := succ !r); (r := succ !r); !r"), CycleDetector(mode))
+        interpret(load("letrec f: Nat -> Nat = \\x: Nat. if iszero x then 0 else f (pred x) in f succ succ succ 0"),
+                  CycleDetector(mode))
+
+    def test_memory_is_part_of_the_state(self):
+        program = load("let r = ref 0 in letrec f: Nat -> Nat = \\x: Nat. (r := succ !r); f x in f 0")
+        state = program.state
+        evaluator = TypedLambdaEvaluator(program.name_context)
+        detector = CycleDetector('full')
+        for _ in range(300):
+            detector.observe(state)
+            state = evaluator.single_step(state).new_state
+
+
+class CollidingFingerprinter(StateFingerprinter):
+    def fingerprint(self, state):
+        return super().fingerprint(state) & 1
+
+
+class TestStateFingerprinter(TestCase):
+
+    @parameterized.expand([(mode,) for mode in CycleDetector.MODES])
+    def test_collisions_are_confirmed(self, mode):
+        detector = CycleDetector(mode)
+        detector._fingerprinter = CollidingFingerprinter()
+        interpret(load("letrec f: Nat -> Nat = \\x: Nat. if iszero x then 0 else f (pred x) in f succ succ succ 0"),
+                  detector)
+        self.assertGreater(detector.collisions, 0)
+        detector = CycleDetector(mode, max_samples=2)
+        detector._fingerprinter = CollidingFingerprinter()
+        with self.assertRaises(Diverges) as countdown:
+            interpret(load(COUNTDOWN), detector)
+        with self.assertRaises(Diverges) as reference:
+            interpret(load(COUNTDOWN), CycleDetector('full'))
+        self.assertEqual(countdown.exception.cycle_length, reference.exception.cycle_length)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_incremental_memory_hash(self, mutable):
+        program = load("let r = ref 0 in let s = ref true in letrec f: Nat -> Nat = \\x: Nat. "
+                       "if iszero x then !r else ((r := succ !r); (s := iszero !r); ref x; f (pred x)) "
+                       "in f succ succ succ 0")
+        state = program.state
+        if mutable:
+            state = state.replace_memory(MutableMemory(undo_log=False))
+        evaluator = TypedLambdaEvaluator(program.name_context)
+        fingerprinter = StateFingerprinter()
+        while True:
+            self.assertEqual(fingerprinter.fingerprint(state), StateFingerprinter().fingerprint(state))
+            try:
+                state = evaluator.single_step(state).new_state
+            except NoEvalRuleApplies:
+                break
+        self.assertEqual(len(state.memory), 5)
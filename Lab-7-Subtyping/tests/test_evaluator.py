@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+from unittest import TestCase
+
+from src.lambda_program import LambdaProgramState
+from src.semantics.evaluator import TypedLambdaEvaluator, EvalRule, EvaluationBudgetExceeded, Reduction, \
+    NoEvalRuleApplies, Congruence, CustomRule, eval_rule
+from src.semantics.stats import EvalStats
+from src.semantics.term_utils import term_is_val, term_substitute, term_is_numeric_val
+from src.term import Info, Term, BaseTerm, TmZero, TmSucc, TmPred, TmAbs, TmVar, TmApp
+from src.type import BaseType
+
+
+def nested(constructor, depth: int, term):
+    for _ in range(depth):
+        term = constructor(Info.dummy_info(), term)
+    return term
+
+
+class TestDeepEvaluation(TestCase):
+    DEPTH = 5000
+
+    def test_deep_congruence(self):
+        term = nested(TmPred, self.DEPTH, nested(TmSucc, self.DEPTH, TmZero(Info.dummy_info())))
+        transition = TypedLambdaEvaluator([]).single_step(LambdaProgramState(term))
+        depth = 0
+        while transition.witnesses:
+            self.assertEqual(transition.rule, EvalRule.Pred)
+            transition = transition.witnesses[0]
+            depth += 1
+        self.assertEqual(depth, self.DEPTH - 1)
+        self.assertEqual(transition.rule, EvalRule.PredSucc)
+
+    def test_deep_walkers(self):
+        numeral = nested(TmSucc, self.DEPTH, TmZero(Info.dummy_info()))
+        self.assertTrue(term_is_val(numeral))
+        body = nested(TmSucc, self.DEPTH, TmVar(Info.dummy_info(), 0, 1))
+        substituted = term_substitute(numeral, body)
+        self.assertTrue(term_is_val(substituted))
+        redex = TmApp(Info.dummy_info(), TmAbs(Info.dummy_info(), "x", BaseType.Nat, body), numeral)
+        self.assertEqual(TypedLambdaEvaluator([]).single_step(LambdaProgramState(redex)).rule, EvalRule.AppAbs)
+
+    def test_stack_budget(self):
+        term = nested(TmPred, 100, TmZero(Info.dummy_info()))
+        evaluator = TypedLambdaEvaluator([], stack_budget=50)
+        with self.assertRaises(EvaluationBudgetExceeded):
+            evaluator.single_step(LambdaProgramState(term))
+
+
+@dataclass(frozen=True, eq=True)
+class TmDouble(BaseTerm):
+    number: Term
+
+
+DOUBLE, DOUBLE_ARG = CustomRule.named("Double"), CustomRule.named("DoubleArg")
+
+
+def eval_double(state: LambdaProgramState) -> Reduction | Congruence:
+    fi, number = state.term.info, state.term.number
+    if not term_is_numeric_val(number):
+        return Congruence(number, lambda t: TmDouble(fi, t), DOUBLE_ARG)
+    result = TmZero(fi)
+    while isinstance(number, TmSucc):
+        number, result = number.number, TmSucc(fi, TmSucc(fi, result))
+    return Reduction(result, DOUBLE)
+
+
+class TestRuleTable(TestCase):
+    def test_register_new_term_class(self):
+        term = TmDouble(Info.dummy_info(), nested(TmPred, 1, nested(TmSucc, 2, TmZero(Info.dummy_info()))))
+        with self.assertRaises(NoEvalRuleApplies):
+            TypedLambdaEvaluator([]).single_step(LambdaProgramState(term))
+        evaluator = TypedLambdaEvaluator([])
+        evaluator.register_rule(TmDouble, eval_double)
+        stats = EvalStats()
+        state = LambdaProgramState(term)
+        rules = []
+        while True:
+            try:
+                transition = evaluator.single_step(state)
+            except NoEvalRuleApplies:
+                break
+            stats.record(transition)
+            rules.append(transition.rule)
+            state = transition.new_state
+        self.assertEqual(rules, [DOUBLE_ARG, DOUBLE])
+        self.assertEqual(state.term, nested(TmSucc, 2, TmZero(Info.dummy_info())))
+        self.assertEqual(stats.report()['rules']['E-Double']['fired'], 1)
+        self.assertEqual(eval_rule(DOUBLE.value), DOUBLE)
+        self.assertIs(CustomRule.named("Double"), DOUBLE)
+
+    def test_custom_rule_name_clash(self):
+        with self.assertRaises(ValueError):
+            CustomRule.named("AppAbs")
@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from src.lambda_program import TypedLambdaProgram, LambdaProgramState
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.incremental import IncrementalTypechecker
+from src.semantics.macro import MacroSystem
+from src.semantics.term_utils import term_replace_at, term_size, term_children
+from src.semantics.typechecker import TypedLambdaTypechecker, LambdaTypeError
+from src.term import TmTrue, TmZero, Info
+from src.type import BaseType, ArrowType
+
+PROGRAM = r"""let x = 0 in
+let f = \y:Nat. if iszero y then succ x else pred y in
+let g = \y:Nat. {a = f y, b = iszero y} in
+(g (f x)).a"""
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def edited(program: TypedLambdaProgram, path: list[int], subterm) -> TypedLambdaProgram:
+    return TypedLambdaProgram(LambdaProgramState(term_replace_at(program.state.term, path, subterm)),
+                              program.name_context)
+
+
+class TestIncrementalTypechecker(TestCase):
+
+    def test_unchanged_program(self):
+        program = load(PROGRAM)
+        typechecker = IncrementalTypechecker()
+        self.assertEqual(BaseType.Nat, typechecker.typecheck(program))
+        self.assertEqual(term_size(program.state.term), typechecker.cache_stats()['nodes'])
+        self.assertEqual(BaseType.Nat, typechecker.typecheck(program))
+        self.assertEqual(0, typechecker.rechecked)
+
+    def test_edit_rechecks_the_spine(self):
+        program = load(PROGRAM)
+        typechecker = IncrementalTypechecker()
+        typechecker.typecheck(program)
+        # `succ x` in the body of f -> `0`
+        program = edited(program, [1, 0, 0, 1], TmZero(Info.dummy_info()))
+        self.assertEqual(TypedLambdaTypechecker().typecheck(program), typechecker.typecheck(program))
+        # the if, the abstraction and the two enclosing lets (`0` is already cached, as the value of x)
+        self.assertEqual(4, typechecker.rechecked)
+
+    def test_edit_changing_a_binding_type(self):
+        program = load(PROGRAM)
+        typechecker = IncrementalTypechecker()
+        typechecker.typecheck(program)
+        program = edited(program, [0], TmTrue(Info.dummy_info()))
+        with self.assertRaises(LambdaTypeError) as incremental:
+            typechecker.typecheck(program)
+        with self.assertRaises(LambdaTypeError) as full:
+            TypedLambdaTypechecker().typecheck(program)
+        self.assertEqual(str(full.exception), str(incremental.exception))
+
+    @parameterized.expand([
+        ([], BaseType.Nat),
+        ([0], BaseType.Nat),
+        ([1, 0], ArrowType(BaseType.Nat, BaseType.Nat)),
+        ([1, 0, 0, 0], BaseType.Bool),
+        ([1, 1, 0, 0, 1], BaseType.Bool),
+    ])
+    def test_type_at(self, path, expected):
+        program = load(PROGRAM)
+        typechecker = IncrementalTypechecker()
+        typechecker.typecheck(program)
+        self.assertEqual(expected, typechecker.type_at(path))
+
+    def test_replace_at_shares_subterms(self):
+        program = load(PROGRAM)
+        term = program.state.term
+        new_term = term_replace_at(term, [1, 0, 0, 1], TmZero(Info.dummy_info()))
+        self.assertIs(term_children(term)[0][0], term_children(new_term)[0][0])
+        self.assertIsNot(term_children(term)[1][0], term_children(new_term)[1][0])
+        self.assertIs(term_children(term_children(term)[1][0])[1][0],
+                      term_children(term_children(new_term)[1][0])[1][0])
+
+    def test_identities_are_bounded(self):
+        program = load(PROGRAM)
+        typechecker = IncrementalTypechecker(max_identities=40)
+        for i in range(20):
+            program = edited(program, [0], load(f"{{l{i} = 0}}.l{i}").state.term)
+            self.assertEqual(TypedLambdaTypechecker().typecheck(program), typechecker.typecheck(program))
+            self.assertLessEqual(typechecker.cache_stats()['identities'], 40 + term_size(program.state.term))
+        self.assertGreater(typechecker.cache_stats()['resets'], 0)
+        self.assertEqual(40, typechecker.cache_stats()['max_identities'])
@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from src.lambda_program import LambdaProgramState
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.macro import MacroSystem
+from src.term import TmAbs, TmVar, TmApp, Info
+from src.type import BaseType
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+class TestPrettyStr(TestCase):
+
+    @parameterized.expand([
+        (r"\x:Nat.\x:Nat.\y:Nat.((x y) x)", r"(\x:Nat.(\x':Nat.(\y:Nat.((x' y) x'))))"),
+        (r"let x = 0 in let x = \x:Nat.x in (x (case <a = 0> of <a=x> => x | <b=x> => (\x:Nat.x) x))",
+         r"(let x = 0 in (let x' = (\x':Nat.x') in (x' case <a:0> of <a=x''> => x'' | <b=x''> => ((\x''':Nat.x''') x''))"),
+        (r"letrec x : Nat -> Nat = \x:Nat.x in \x:Nat.x", r"(let x = fix (\x:Nat -> Nat.(\x':Nat.x')) in (\x':Nat.x')"),
+        (r"{a = \x:Nat.x, b = <c = \x:Nat.\x:Nat.x>}", r"{a = (\x:Nat.x), b = <c:(\x:Nat.(\x':Nat.x'))>}"),
+        (r"let r = ref 0 in (if iszero !r then r := pred !r else unit)",
+         r"(let r = ref 0 in if iszero !(r) then r := pred !(r) else unit"),
+    ])
+    def test_pretty_term_str(self, raw_program, expected):
+        program = load(raw_program)
+        self.assertEqual(expected, program.state.pretty_term_str(program.name_context))
+
+    def test_free_variables(self):
+        info = Info.dummy_info()
+        term = TmAbs(info, "y", BaseType.Nat, TmApp(info, TmVar(info, 0, 1), TmVar(info, 1, 1)))
+        self.assertEqual(r"((\y:Nat.(y x)) | {})", LambdaProgramState(term).pretty_str(["x"]))
+
+    def test_deeply_nested_binders(self):
+        depth = 20_000
+        info = Info.dummy_info()
+        term = TmVar(info, depth - 1, depth)
+        for i in reversed(range(depth)):
+            term = TmAbs(info, f"x{i}", BaseType.Nat, term)
+        printed = LambdaProgramState(term).pretty_term_str([])
+        self.assertTrue(printed.startswith(r"(\x0:Nat.(\x1:Nat.(\x2:Nat."))
+        self.assertTrue(printed.endswith(f"(\\x{depth - 1}:Nat.x0" + ")" * depth))
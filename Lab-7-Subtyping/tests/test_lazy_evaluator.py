@@ -0,0 +1,74 @@
+from unittest import TestCase
+from parameterized import parameterized
+
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies
+from src.semantics.lazy_evaluator import CallByNeedEvaluator, LazyEvaluationError
+from src.semantics.macro import MacroSystem
+from src.semantics.term_utils import term_structural_key
+from src.term import TmTrue
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def interpret(program):
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    while True:
+        try:
+            state = evaluator.single_step(state).new_state
+        except NoEvalRuleApplies:
+            return state
+
+
+PLUS = "letrec plus: Nat -> (Nat -> Nat) = \\x: Nat. \\y: Nat. if iszero y then x else (plus succ x) (pred y) in "
+
+
+class TestCallByNeedEvaluator(TestCase):
+
+    @parameterized.expand([
+        ("(let y = false in let x = true in \\z:Nat. if iszero z then x else y) 0",),
+        ("letrec iseven : Nat->Bool = \\x:Nat. (if iszero x then true else if iszero (pred x) then false "
+         "else iseven (pred (pred x))) in iseven (succ (succ (succ (succ (succ 0)))))",),
+        (PLUS + "(plus succ succ 0) succ 0",),
+        ("if true then { u = unit, b = true } else { b = false }",),
+        ("case <n = succ 0> of <n = y> => { a = pred y, b = <l = y> }",),
+        ("(\\x:Nat. \\y:Nat. x) (succ 0)",),
+        (PLUS + "plus",),
+    ])
+    def test_same_result_as_call_by_value(self, raw_program: str):
+        program = load(raw_program)
+        result = CallByNeedEvaluator().evaluate(program)
+        self.assertEqual(term_structural_key(result.term), term_structural_key(interpret(program).term))
+
+    def test_unused_argument_is_not_evaluated(self):
+        evaluator = CallByNeedEvaluator()
+        evaluator.evaluate(load("((\\x:Nat. \\y:Nat. y) (fix \\x:Nat. succ x)) 0"))
+        self.assertEqual(evaluator.steps, 2)
+
+    def test_argument_is_forced_once(self):
+        def steps(raw_program: str) -> int:
+            evaluator = CallByNeedEvaluator()
+            evaluator.evaluate(load(PLUS + raw_program))
+            return evaluator.steps
+
+        argument, value = "(pred pred succ succ succ succ succ 0)", "succ succ succ 0"
+        shared_cost = steps(f"(\\x:Nat. (plus x) x) {argument}") - steps(f"(\\x:Nat. (plus x) x) {value}")
+        self.assertEqual(shared_cost, 2)
+
+    def test_memory_is_rejected(self):
+        with self.assertRaises(LazyEvaluationError):
+            CallByNeedEvaluator().evaluate(load("(\\r:Ref Nat. !r) (ref 0)"))
+
+    def test_deep_program(self):
+        program = load("letrec double: Nat -> Nat = \\x:Nat. if iszero x then 0 else succ (succ (double (pred x))) in "
+                       "letrec iseven : Nat->Bool = \\x:Nat. (if iszero x then true else if iszero (pred x) then false "
+                       "else iseven (pred (pred x))) in iseven " + "(double " * 8 + "(succ (succ (succ 0)))" + ")" * 8)
+        self.assertIsInstance(CallByNeedEvaluator().evaluate(program).term, TmTrue)
+
+    def test_self_dependent_fix(self):
+        with self.assertRaises(LazyEvaluationError):
+            CallByNeedEvaluator().evaluate(load("fix \\x:Nat. succ x"))
@@ -0,0 +1,84 @@
+from unittest import TestCase
+from parameterized import parameterized
+
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies, EvalRule
+from src.semantics.macro import MacroSystem
+from src.semantics.memo import MemoizingEvaluator
+from src.semantics.term_utils import term_structural_key
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def interpret(program, evaluator):
+    state = program.state
+    rules = []
+    while True:
+        try:
+            transition = evaluator.single_step(state)
+        except NoEvalRuleApplies:
+            return state, rules
+        rules.append(transition.rule)
+        state = transition.new_state
+
+
+PLUS = "letrec plus: Nat -> (Nat -> Nat) = \\x: Nat. \\y: Nat. if iszero y then x else (plus succ x) (pred y) in "
+FIB = PLUS + "letrec fib: Nat -> Nat = \\i: Nat. if iszero i then 0 else if iszero pred i then succ 0 " \
+             "else (plus (fib pred i)) (fib pred pred i) in "
+
+
+class TestMemoizingEvaluator(TestCase):
+
+    @parameterized.expand([
+        (FIB + "fib succ succ succ succ succ succ 0",),
+        (PLUS + "{a = (plus succ 0) succ 0, b = (plus succ 0) succ 0}",),
+        ("let r = ref 0 in (\\x: Nat. r := succ x) ((\\y: Nat. succ y) 0); !r",),
+        ("(\\f: Nat -> Nat. f 0) (\\x: Nat. succ x)",),
+    ])
+    def test_same_results(self, raw_program):
+        program = load(raw_program)
+        expected, _ = interpret(program, TypedLambdaEvaluator(program.name_context))
+        result, _ = interpret(program, MemoizingEvaluator(program.name_context))
+        self.assertEqual(term_structural_key(expected.term), term_structural_key(result.term))
+        self.assertEqual(expected.memory, result.memory)
+
+    def test_fibonacci_reuses_results(self):
+        program = load(FIB + "fib succ succ succ succ succ succ succ succ 0")
+        evaluator = MemoizingEvaluator(program.name_context)
+        _, rules = interpret(program, evaluator)
+        _, plain_rules = interpret(program, TypedLambdaEvaluator(program.name_context))
+        self.assertGreater(evaluator.hits, 0)
+        self.assertLess(evaluator.nested_steps + len(rules), len(plain_rules) / 2)
+
+    def test_impure_functions_are_not_memoized(self):
+        program = load("let r = ref 0 in (\\x: Nat. r := succ x) 0")
+        evaluator = MemoizingEvaluator(program.name_context)
+        _, rules = interpret(program, evaluator)
+        self.assertNotIn(EvalRule.AppMemo, rules)
+        self.assertEqual(evaluator.misses, 0)
+
+    def test_table_is_bounded(self):
+        program = load(FIB + "fib succ succ succ succ succ succ 0")
+        evaluator = MemoizingEvaluator(program.name_context, memo_size=3)
+        interpret(program, evaluator)
+        self.assertLessEqual(evaluator.memo_stats()["size"], 3)
+        self.assertGreater(evaluator.evictions, 0)
+
+    def test_interned_nodes_are_bounded(self):
+        program = load(FIB + "fib succ succ succ succ succ succ succ 0")
+        expected, _ = interpret(program, TypedLambdaEvaluator(program.name_context))
+        evaluator = MemoizingEvaluator(program.name_context, max_interned=40)
+        result, _ = interpret(program, evaluator)
+        self.assertEqual(term_structural_key(expected.term), term_structural_key(result.term))
+        self.assertGreater(evaluator.resets, 0)
+        self.assertLessEqual(len(evaluator._memoizable), len(evaluator._interner))
+
+    def test_big_functions_are_not_memoized(self):
+        program = load(FIB + "fib succ succ succ succ 0")
+        evaluator = MemoizingEvaluator(program.name_context, max_term_size=8)
+        _, rules = interpret(program, evaluator)
+        self.assertNotIn(EvalRule.AppMemo, rules)
+        self.assertEqual(evaluator.memo_stats()["interned_nodes"], 0)
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from parameterized import parameterized
+
+from src.memory import Memory, MutableMemory, StaleMemoryError
+from src.persistent_vector import PersistentVector
+from src.term import TmZero, TmUnit, TmSucc, Info
+
+
+class TestPersistentVector(TestCase):
+
+    @parameterized.expand([(0,), (1,), (32,), (33,), (1024,), (1057,), (33_000,)])
+    def test_append_and_set(self, n):
+        vector = PersistentVector()
+        for i in range(n):
+            vector = vector.append(i)
+        self.assertEqual(len(vector), n)
+        self.assertEqual(list(vector), list(range(n)))
+
+        updated = vector
+        for i in range(0, n, 7):
+            updated = updated.set(i, -i)
+        self.assertEqual(list(updated), [-i if i % 7 == 0 else i for i in range(n)])
+        self.assertEqual(list(vector), list(range(n)))
+        self.assertEqual(updated, PersistentVector(list(updated)))
+
+    def test_bounds(self):
+        vector = PersistentVector([1, 2])
+        with self.assertRaises(IndexError):
+            vector.set(2, 0)
+        with self.assertRaises(IndexError):
+            _ = vector[-1]
+
+
+class TestMemory(TestCase):
+
+    def test_api(self):
+        memory, first = Memory().put(TmZero(Info.dummy_info()))
+        memory, second = memory.put(TmUnit(Info.dummy_info()))
+        replaced = memory.replace(first, TmSucc(Info.dummy_info(), TmZero(Info.dummy_info())))
+        self.assertEqual((first.address, second.address), (0, 1))
+        self.assertEqual(memory.dereference(first), TmZero(Info.dummy_info()))
+        self.assertEqual(replaced.dereference(first), TmSucc(Info.dummy_info(), TmZero(Info.dummy_info())))
+        self.assertEqual(str(replaced), "{@0 <- succ 0, @1 <- unit}")
+        self.assertEqual(replaced.replace(first, TmZero(Info.dummy_info())), memory)
+        self.assertNotEqual(replaced, memory)
+        self.assertEqual(Memory(), Memory())
+
+
+class TestMutableMemory(TestCase):
+
+    def test_versions(self):
+        empty = MutableMemory()
+        first_version, location = empty.put(TmZero(Info.dummy_info()))
+        second_version = first_version.replace(location, TmUnit(Info.dummy_info()))
+        self.assertEqual(str(second_version), "{@0 <- unit}")
+        self.assertEqual(str(first_version), "{@0 <- 0}")
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(first_version, Memory().put(TmZero(Info.dummy_info()))[0])
+        self.assertEqual(second_version.freeze(), Memory().put(TmUnit(Info.dummy_info()))[0])
+        with self.assertRaises(StaleMemoryError):
+            first_version.put(TmZero(Info.dummy_info()))
+
+    def test_without_undo_log(self):
+        memory, location = MutableMemory(undo_log=False).put(TmZero(Info.dummy_info()))
+        updated = memory.replace(location, TmUnit(Info.dummy_info()))
+        self.assertEqual(updated.dereference(location), TmUnit(Info.dummy_info()))
+        with self.assertRaises(StaleMemoryError):
+            memory.dereference(location)
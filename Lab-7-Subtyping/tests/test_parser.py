@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from src.parser import TypedLambdaParser
+from src.sprdpl.parse import ParseError
+from src.type import BaseType, InvalidType, ArrowType, RecordType
+
+
+class TestTypeAnnotations(TestCase):
+
+    @parameterized.expand([
+        ("(\\x:Strange.succ (pred x)) true", 1, 4, 7),
+        ("let f = \\x:{a:Nat, b:Foo -> Nat}. x.a in\n  f", 1, 21, 3),
+        ("\\x:Nat.\n  \\y:<l:Unit, r:Ref Nat2>. x", 2, 20, 4),
+    ])
+    def test_invalid_annotation_position(self, raw_program, line, column, length):
+        with self.assertRaises(ParseError) as error:
+            TypedLambdaParser().parse(raw_program)
+        info = error.exception.info
+        self.assertEqual((line, column, length), (info.lineno, info.column, info.length))
+        self.assertIn("invalid type annotation", error.exception.msg)
+
+    def test_valid_annotations(self):
+        term = TypedLambdaParser().parse("\\x:{a:Nat, b:Bool -> Top}. x")
+        self.assertIs(RecordType({'a': BaseType.Nat, 'b': ArrowType(BaseType.Bool, BaseType.Top)}), term.arg_type)
+        self.assertFalse(term.arg_type.invalid)
+
+    def test_from_text(self):
+        self.assertIs(BaseType.Unit, BaseType.from_text("Unit"))
+        self.assertIs(InvalidType("unit"), BaseType.from_text("unit"))
@@ -0,0 +1,111 @@
+from io import BytesIO
+from unittest import TestCase
+
+from src.binary_trace import TraceFormatError
+from src.lambda_program import TypedLambdaProgram
+from src.memory import MutableMemory
+from src.parser import TypedLambdaParser
+from src.replay_trace import ReplayTraceWriter, TraceReplayer, ReplayError, transition_path
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies, EvalRule, Transition
+from src.semantics.macro import MacroSystem
+from src.semantics.memo import MemoizingEvaluator
+from src.term import TmSucc, TmPred
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+class _TraceFile(BytesIO):
+    def close(self):
+        pass
+
+
+def record(program, keyframe_interval: int, evaluator=None):
+    evaluator = evaluator or TypedLambdaEvaluator(program.name_context)
+    file = _TraceFile()
+    writer = ReplayTraceWriter(file, keyframe_interval)
+    writer.program(program)
+    states = [program.state]
+    while True:
+        try:
+            transition = evaluator.single_step(states[-1])
+        except NoEvalRuleApplies:
+            break
+        writer.transition(transition)
+        states.append(transition.new_state)
+    writer.message("---- finished successfully")
+    writer.close()
+    file.seek(0)
+    return file, states
+
+
+PROGRAM = "letrec f: Nat -> Nat = \\x: Nat. if iszero x then 0 else (\\r: Ref Nat. (r := succ !r); f (pred x)) " \
+          "(ref {a = x, b = <l = x>}.a) in f succ succ succ 0"
+
+
+class TestReplayTrace(TestCase):
+
+    def test_random_access(self):
+        program = load(PROGRAM)
+        file, states = record(program, keyframe_interval=5)
+        replayer = TraceReplayer(file)
+        self.assertEqual(replayer.steps, len(states) - 1)
+        self.assertEqual(replayer.messages, ["---- finished successfully"])
+        for step in [len(states) - 1, 0, 17, 5, 4, 6, 33]:
+            self.assertEqual(replayer.state_at(step).pretty_str(program.name_context),
+                             states[step].pretty_str(program.name_context))
+        self.assertEqual([state.pretty_str(program.name_context) for state in replayer.states()],
+                         [state.pretty_str(program.name_context) for state in states])
+
+    def test_path(self):
+        program = load("pred (pred succ 0)")
+        transition = TypedLambdaEvaluator(program.name_context).single_step(program.state)
+        self.assertEqual(transition_path(transition), (((EvalRule.Pred, 0),), EvalRule.PredSucc))
+
+    def test_witness_outside_children(self):
+        program = load("succ (pred 0)")
+        inner = load("pred 0")
+        witness = Transition(inner.state, inner.state.replace_term(inner.state.term.number), EvalRule.PredZero,
+                             inner.name_context)
+        transition = Transition(program.state, program.state, EvalRule.Succ, program.name_context, (witness,))
+        with self.assertRaises(TraceFormatError):
+            transition_path(transition)
+
+    def test_deep_state(self):
+        program = load("0")
+        term = program.state.term
+        for _ in range(5000):
+            term = TmSucc(term.info, term)
+        program = TypedLambdaProgram(program.state.replace_term(TmPred(term.info, term)), program.name_context)
+        replayer = TraceReplayer(record(program, keyframe_interval=5)[0])
+        result, depth = replayer.state_at(1).term, 0
+        while isinstance(result, TmSucc):
+            result, depth = result.number, depth + 1
+        self.assertEqual(depth, 4999)
+
+    def test_wrong_path(self):
+        program = load("pred (pred succ 0)")
+        replayer = TraceReplayer(record(program, keyframe_interval=5)[0])
+        with self.assertRaises(ReplayError):
+            replayer.replay_step(program.state, ((), EvalRule.PredSucc))
+
+    def test_mutable_memory_without_undo_log(self):
+        program = load(PROGRAM)
+        _, states = record(program, keyframe_interval=5)
+        mutable = TypedLambdaProgram(program.state.replace_memory(MutableMemory(undo_log=False)), program.name_context)
+        self.assertFalse(ReplayTraceWriter.reads_old_states)
+        file, _ = record(mutable, keyframe_interval=5)
+        self.assertEqual([state.pretty_str(program.name_context) for state in TraceReplayer(file).states()],
+                         [state.pretty_str(program.name_context) for state in states])
+
+    def test_memoized_steps(self):
+        program = load("letrec double: Nat -> Nat = \\x:Nat. if iszero x then 0 else succ (succ (double (pred x))) "
+                       "in {a = double succ succ 0, b = double succ succ 0}")
+        file, states = record(program, keyframe_interval=100, evaluator=MemoizingEvaluator(program.name_context))
+        replayer = TraceReplayer(file)
+        self.assertEqual([state.pretty_str(program.name_context) for state in replayer.states()],
+                         [state.pretty_str(program.name_context) for state in states])
+        self.assertEqual(replayer.state_at(len(states) - 1).pretty_str(program.name_context),
+                         states[-1].pretty_str(program.name_context))
@@ -0,0 +1,62 @@
+from collections import Counter
+from unittest import TestCase
+
+from src.parser import TypedLambdaParser
+from src.semantics import term_utils
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies, EvalRule
+from src.semantics.macro import MacroSystem
+from src.semantics.stats import EvalStats
+from src.semantics.term_utils import term_size
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def interpret(program, stats: EvalStats):
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    stats.observe_state(state)
+    while True:
+        try:
+            transition = evaluator.single_step(state)
+        except NoEvalRuleApplies:
+            return state
+        stats.record(transition)
+        state = transition.new_state
+
+
+class TestEvalStats(TestCase):
+
+    def test_counts(self):
+        stats = EvalStats()
+        with stats.tracking():
+            interpret(load("let r = ref 0 in (\\x: Nat. r := succ x) (pred succ 0)"), stats)
+        report = stats.report()
+        self.assertEqual(report["steps"], sum(report["witness_depth"].values()))
+        self.assertEqual(stats.rule_counts[EvalRule.AppAbs], 1)
+        self.assertEqual(stats.witness_rule_counts[EvalRule.PredSucc], 1)
+        self.assertEqual(sum(stats.rule_nodes.values()), sum(stats.allocated_nodes.values()))
+        self.assertGreater(stats.rule_nodes[EvalRule.LetV], 0)
+        self.assertEqual(report["peak_store_size"], 1)
+
+    def test_counts_match_the_substituted_terms(self):
+        s, t = load("\\y:Nat. succ y").state.term, load("\\x:Nat. (\\z:Nat. x z) x").state.term.body
+        counted = Counter()
+        result = term_utils.term_substitute(s, t, lambda walker, nodes: counted.update({walker: nodes}))
+        shifted = term_utils.term_shift(1, s)
+        self.assertEqual(counted['term_shift'], term_size(shifted) + term_size(result))
+        self.assertEqual(counted['term_substitute_step'], term_size(term_utils.term_substitute_step(0, shifted, t)))
+
+    def test_tracking_is_scoped(self):
+        outer, inner = EvalStats(), EvalStats()
+        program = load("(\\x: Nat. succ x) 0")
+        with outer.tracking():
+            with inner.tracking():
+                interpret(program, inner)
+            self.assertEqual(sum(outer.allocated_nodes.values()), 0)
+            interpret(program, outer)
+        interpret(program, EvalStats())
+        self.assertEqual(outer.allocated_nodes, inner.allocated_nodes)
+        self.assertGreater(sum(inner.allocated_nodes.values()), 0)
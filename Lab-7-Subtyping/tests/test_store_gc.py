@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from unittest import TestCase
+
+from src.lambda_program import LambdaProgramState
+from src.memory import Memory
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies
+from src.semantics.macro import MacroSystem
+from src.semantics.store_gc import StoreCollector
+from src.term import TmStoreLocation, TmZero, TmReference, TmRecord, Info
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def interpret(program, collector: StoreCollector):
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    while True:
+        try:
+            state = collector.step(evaluator.single_step(state).new_state)
+        except NoEvalRuleApplies:
+            return state
+
+
+def location(address: int) -> TmStoreLocation:
+    return TmStoreLocation(Info.dummy_info(), address)
+
+
+class TestStoreCollector(TestCase):
+
+    def test_collect(self):
+        memory = Memory()
+        for term in [TmZero(Info.dummy_info()), location(3), TmZero(Info.dummy_info()), TmZero(Info.dummy_info())]:
+            memory, _ = memory.put(term)
+        term = TmRecord(Info.dummy_info(), OrderedDict([("a", location(1)),
+                                                        ("b", TmReference(Info.dummy_info(), location(1)))]))
+        collector = StoreCollector()
+        state = collector.collect(LambdaProgramState(term, memory))
+        self.assertEqual(state.term.records["a"], location(0))
+        self.assertEqual(state.term.records["b"].arg, location(0))
+        self.assertEqual(list(state.memory), [location(1), TmZero(Info.dummy_info())])
+        self.assertEqual(collector.reclaimed, 2)
+        self.assertIs(collector.collect(state), state)
+
+    def test_loop_allocations(self):
+        program = load("letrec f: Nat -> Nat = \\x: Nat. if iszero x then 0 "
+                       "else (\\r: Ref Nat. (r := succ !r); f (pred x)) (ref x) in f succ succ succ succ 0")
+        without_gc = interpret(program, StoreCollector(0))
+        collector = StoreCollector(2)
+        with_gc = interpret(program, collector)
+        self.assertEqual(len(without_gc.memory), 4)
+        self.assertEqual(with_gc, LambdaProgramState(without_gc.term, Memory()))
+        self.assertEqual(collector.reclaimed, 4)
+        self.assertLessEqual(collector.peak_store_size, 1)
@@ -0,0 +1,132 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.evaluator import TypedLambdaEvaluator, NoEvalRuleApplies
+from src.semantics.macro import MacroSystem
+from src.lambda_program import LambdaProgramState
+from src.trace import TracePrinter, SampledTracePrinter
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+def trace(program, printer: TracePrinter) -> list[str]:
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state = program.state
+    output = StringIO()
+    with redirect_stdout(output):
+        printer.program(program)
+        while True:
+            try:
+                transition = evaluator.single_step(state)
+            except NoEvalRuleApplies:
+                return output.getvalue().splitlines()
+            printer.transition(transition)
+            state = transition.new_state
+
+
+def transitions(program) -> list:
+    evaluator = TypedLambdaEvaluator(program.name_context)
+    state, result = program.state, []
+    while True:
+        try:
+            result.append(evaluator.single_step(state))
+        except NoEvalRuleApplies:
+            return result
+        state = result[-1].new_state
+
+
+def sampled_trace(program, spec: str) -> list[str]:
+    printer = SampledTracePrinter.from_spec(spec, TracePrinter())
+    lines = trace(program, printer)
+    output = StringIO()
+    with redirect_stdout(output):
+        printer.message("---- done")
+    return lines + output.getvalue().splitlines()
+
+
+def printed(program, selected: list, with_program: bool) -> list[str]:
+    printer = TracePrinter()
+    output = StringIO()
+    with redirect_stdout(output):
+        if with_program:
+            printer.program(program)
+        for transition in selected:
+            printer.transition(transition)
+        printer.message("---- done")
+    return output.getvalue().splitlines()
+
+class TestTracePrinter(TestCase):
+
+    def test_delta_memory(self):
+        program = load("let r = ref 0 in let s = ref unit in (r := succ !r); !s")
+        full = trace(program, TracePrinter('full'))
+        delta = trace(program, TracePrinter('delta'))
+        self.assertEqual(len(full), len(delta))
+        self.assertEqual(full[0], delta[0])
+        self.assertIn("| +{@0 <- 0})  [Let]", delta[1])
+        self.assertIn("| +{@1 <- unit})  [Let]", delta[4])
+        self.assertTrue(any(line.endswith("| +{@0 <- succ 0})  [App2]") for line in delta))
+        self.assertTrue(delta[-1].endswith("(unit | +{})  [DerefLoc]"))
+        for full_line, delta_line in zip(full, delta):
+            self.assertEqual(full_line.split(" | ")[0], delta_line.split(" | ")[0])
+
+
+class TestSampledTracePrinter(TestCase):
+    PROGRAM = "let r = ref 0 in let s = ref unit in (r := succ !r); !s"
+
+    @parameterized.expand([
+        ('full', lambda ts: ts, True),
+        ('none', lambda ts: [], False),
+        ('final', lambda ts: ts[-1:], False),
+        ('tail:3', lambda ts: ts[-3:], False),
+        ('tail:1000', lambda ts: ts, False),
+        ('every:2', lambda ts: ts[1::2] + ([] if len(ts) % 2 == 0 else ts[-1:]), True),
+        ('every:1000', lambda ts: ts[-1:], True),
+    ])
+    def test_sampling(self, spec, selected, with_program):
+        program = load(self.PROGRAM)
+        expected = printed(program, selected(transitions(program)), with_program)
+        self.assertEqual(expected, sampled_trace(program, spec))
+
+    @parameterized.expand([
+        ('none', lambda ts: [], False),
+        ('final', lambda ts: ts[-1:], False),
+        ('tail:2', lambda ts: ts[-2:], False),
+        ('every:3', lambda ts: ts[2::3] + ([] if len(ts) % 3 == 0 else ts[-1:]), True),
+    ])
+    def test_skipped_states_are_not_formatted(self, spec, selected, with_program):
+        program = load(self.PROGRAM)
+        formatted = []
+        pretty_str = LambdaProgramState.pretty_str
+
+        def counting(state, name_context):
+            formatted.append(state)
+            return pretty_str(state, name_context)
+
+        with patch.object(LambdaProgramState, 'pretty_str', counting):
+            sampled_trace(program, spec)
+            sampled = len(formatted)
+            formatted.clear()
+            printed(program, selected(transitions(program)), with_program)
+            expected = len(formatted)
+            formatted.clear()
+            sampled_trace(program, 'full')
+        self.assertEqual(expected, sampled)
+        self.assertLess(sampled, len(formatted))
+
+    @parameterized.expand([('every',), ('every:0',), ('tail:x',), ('final:2',), ('some',)])
+    def test_invalid_spec(self, spec):
+        with self.assertRaises(ValueError):
+            SampledTracePrinter.from_spec(spec, TracePrinter())
+
+    @parameterized.expand([('none', False), ('final', True), ('tail:2', True), ('every:3', True), ('full', True)])
+    def test_reads_old_states(self, spec, reads_old_states):
+        self.assertEqual(SampledTracePrinter.from_spec(spec, TracePrinter()).reads_old_states, reads_old_states)
@@ -0,0 +1,231 @@
+import pickle
+from collections import OrderedDict
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from src.parser import TypedLambdaParser
+from src.semantics.debruijn_indexer import DebruijnIndexer
+from src.semantics.macro import MacroSystem
+from src.semantics.typechecker import TypedLambdaTypechecker, LambdaTypeError, LambdaTypeErrorType, TypeContext
+from src.term import Info, TmAbs, TmApp, TmIsZero, TmLet, TmSucc, TmTrue, TmUnit, TmVar, TmZero
+from src.type import BaseType, ArrowType, RecordType, VariantType, FieldMap, InvalidType, ReferenceType
+
+Nat, Bool, Unit, Top = BaseType.Nat, BaseType.Bool, BaseType.Unit, BaseType.Top
+
+
+def load(raw_program: str):
+    return MacroSystem().expand(DebruijnIndexer().remove_names(TypedLambdaParser().parse(raw_program)))
+
+
+DEPTH = 100_000
+INFO = Info.dummy_info()
+
+
+def record(**fields):
+    return RecordType(OrderedDict(fields))
+
+
+def variant(**cases):
+    return VariantType(OrderedDict(cases))
+
+
+class TestFieldMap(TestCase):
+
+    def test_records_are_hashable(self):
+        self.assertEqual(hash(record(a=Nat, b=Bool)), hash(RecordType(FieldMap([('a', Nat), ('b', Bool)]))))
+        self.assertEqual(1, len({record(a=Nat, b=Bool), record(a=Nat, b=Bool)}))
+        self.assertNotEqual(record(a=Nat, b=Bool), record(b=Bool, a=Nat))
+
+    def test_mapping_interface(self):
+        fields = record(a=Nat, b=variant(c=Unit)).records_types
+        self.assertEqual(['a', 'b'], list(fields.keys()))
+        self.assertIn('b', fields)
+        self.assertNotIn('c', fields)
+        self.assertEqual(variant(c=Unit), fields['b'])
+        self.assertEqual("{a: Nat,b: <c: Unit>}", str(record(a=Nat, b=variant(c=Unit))))
+
+    def test_merge(self):
+        left = FieldMap([('c', Nat), ('a', Bool)])
+        right = FieldMap([('b', Unit), ('c', Bool), ('d', Nat)])
+        self.assertEqual([('a', Bool, None), ('b', None, Unit), ('c', Nat, Bool), ('d', None, Nat)],
+                         list(left.merge(right)))
+        self.assertEqual((('a', Bool), ('c', Nat)), left.sorted_fields)
+
+    def test_pickle(self):
+        t = ArrowType(record(a=Nat), variant(b=record(c=Bool)))
+        self.assertEqual(t, pickle.loads(pickle.dumps(t)))
+
+
+class TestTypeContext(TestCase):
+
+    def test_extension_shares_bindings(self):
+        outer = TypeContext.empty().extend_with_type(Nat)
+        left = outer.extend_with_type(Bool)
+        right = outer.extend_with_type(record(a=Unit))
+        self.assertEqual([Nat], list(outer))
+        self.assertEqual((Bool, Nat, None), (left.type_of(0), left.type_of(1), left.type_of(2)))
+        self.assertEqual((record(a=Unit), Nat), (right.type_of(0), right.type_of(1)))
+        self.assertEqual("['{a: Unit}', 'Nat']", str(right))
+        self.assertEqual("[]", str(TypeContext.empty()))
+
+    def test_long_context(self):
+        contexts = []
+        for _ in range(2):
+            context = TypeContext.empty()
+            for i in range(200_000):
+                context = context.extend_with_type(Nat if i % 2 else Bool)
+            contexts.append(context)
+        left, right = contexts
+        self.assertEqual(left, right)
+        self.assertEqual(hash(left), hash(right))
+        self.assertNotEqual(left, right.extend_with_type(Nat))
+        self.assertNotEqual(left.extend_with_type(Bool), right.extend_with_type(Nat))
+        self.assertTrue(repr(left).startswith("TypeContext(['Nat', 'Bool', "))
+
+    def test_type_error_context(self):
+        with self.assertRaises(LambdaTypeError) as error:
+            TypedLambdaTypechecker().typecheck(load(r"\x:Nat.\y:Bool.succ y"))
+        self.assertIn("- type context: ['Bool', 'Nat']", str(error.exception))
+
+
+class TestTypechecker(TestCase):
+
+    @parameterized.expand([
+        (r"(\x:{0:Nat, label:Bool}. {0 = x.0, new_label = x.label}) {0 = 0, succ 0, label = true}",
+         record(**{'0': Nat, 'new_label': Bool})),
+        (r"(\x:<u:Unit, b:Bool, n:Nat>. case x of <u = x> => 0 | <b = x> => 0 | <n = x> => x) <u = unit>", Nat),
+        (r"(\x:<u:Unit, b:Bool>. case x of <u = x> => {f = x, g = 0} | <b = x> => {f = x}) <u = unit>",
+         record(f=Top)),
+        (r"(\x:<u:Unit, b:Bool>. case x of <u = x> => <a = x> | <b = x> => <c = x>) <b = true>",
+         variant(a=Unit, c=Bool)),
+        (r"if true then {u = unit, b = true} else {b = false}", record(b=Bool)),
+        (r"if true then \x:{a:Nat}.x else \x:{b:Bool}.x", ArrowType(record(a=Nat, b=Bool), record())),
+    ])
+    def test_typecheck(self, raw_program, expected):
+        self.assertEqual(expected, TypedLambdaTypechecker().typecheck(load(raw_program)))
+
+    @parameterized.expand([
+        (record(b=Nat, a=Bool, c=Unit), record(c=Unit, a=Bool), record(c=Unit, a=Bool), record(b=Nat, a=Bool, c=Unit)),
+        (record(b=Nat, a=Bool), record(a=Nat, c=Unit), record(a=Top), None),
+        (record(b=Nat, a=Bool), record(c=Unit, a=Top), record(a=Top), record(b=Nat, a=Bool, c=Unit)),
+        (variant(b=Nat, a=Bool), variant(c=Unit, a=Top), variant(b=Nat, a=Top, c=Unit), variant(a=Bool)),
+        (variant(b=Nat), variant(a=Bool, b=Nat), variant(a=Bool, b=Nat), variant(b=Nat)),
+        (ArrowType(record(a=Nat), Nat), ArrowType(record(b=Nat), Bool), ArrowType(record(a=Nat, b=Nat), Top),
+         None),
+        (ArrowType(variant(a=Nat), Nat), ArrowType(variant(b=Nat), Nat), ArrowType(variant(), Nat),
+         ArrowType(variant(a=Nat, b=Nat), Nat)),
+    ])
+    def test_join_and_meet(self, left, right, join, meet):
+        typechecker = TypedLambdaTypechecker()
+        self.assertIs(join, typechecker._join(left, right))
+        self.assertIs(meet, typechecker._meet(left, right))
+        _, is_sub, is_super = typechecker._join_relate(left, right)
+        self.assertEqual((typechecker._is_subtype(left, right), typechecker._is_subtype(right, left)),
+                         (is_sub, is_super))
+
+    def test_annotate(self):
+        program = load(r"(\x:{a:Nat}. x.a) {a = 0, b = true}")
+        types = TypedLambdaTypechecker().annotate(program)
+        application = program.state.term
+        self.assertIs(Nat, types.type_of(application))
+        self.assertIs(record(a=Nat, b=Bool), types.type_of(application.arg))
+        self.assertIs(record(a=Nat), types.type_of(application.function.body.record))
+        self.assertIsNone(types.type_of(load("0").state.term))
+        self.assertEqual(7, len(types))
+
+    def test_invalid_argument(self):
+        with self.assertRaises(LambdaTypeError):
+            TypedLambdaTypechecker().typecheck(load(r"(\x:{a:Nat, b:Bool}.x) {a = 0}"))
+
+    def test_memo_stats(self):
+        typechecker = TypedLambdaTypechecker()
+        program = load(r"let f = \x:{a:Nat}.x.a in {f {a = 0, b = true}, f {a = succ 0, b = false}, f {a = 0, b = true}}")
+        self.assertEqual(record(**{'1': Nat, '2': Nat, '3': Nat}), typechecker.typecheck(program))
+        stats = typechecker.memo_stats()['is_subtype']
+        self.assertEqual(2, stats['hits'])
+        self.assertEqual(round(stats['hits'] / (stats['hits'] + stats['misses']), 4), stats['hit_rate'])
+
+    def test_memo_eviction(self):
+        typechecker = TypedLambdaTypechecker(memo_size=1)
+        self.assertTrue(typechecker._is_subtype(record(a=Nat, b=Bool), record(a=Nat)))
+        self.assertTrue(typechecker._is_subtype(record(a=Nat, b=Bool), record(a=Nat)))
+        stats = typechecker.memo_stats()['is_subtype']
+        self.assertEqual(1, stats['hits'])
+        self.assertGreater(stats['evictions'], 0)
+
+
+class TestInternedTypes(TestCase):
+
+    def test_structurally_equal_types_are_identical(self):
+        self.assertIs(ArrowType(Nat, record(a=Bool)), ArrowType(Nat, RecordType(FieldMap([('a', Bool)]))))
+        self.assertIs(variant(a=Unit, b=Nat), variant(a=Unit, b=Nat))
+        self.assertIsNot(variant(a=Unit, b=Nat), variant(b=Nat, a=Unit))
+
+    def test_copies_are_interned(self):
+        t = ArrowType(record(a=Nat), variant(b=record(c=Bool)))
+        self.assertIs(t, pickle.loads(pickle.dumps(t)))
+
+    @parameterized.expand([
+        (Nat, False),
+        (InvalidType("Foo"), True),
+        (ArrowType(Nat, record(a=variant(b=InvalidType("Foo")))), True),
+        (ReferenceType(ArrowType(Nat, record(a=variant(b=Unit)))), False),
+    ])
+    def test_validity_flag(self, t, invalid):
+        self.assertEqual(invalid, t.invalid)
+
+    def test_parsed_annotations_share_types(self):
+        program = load(r"(\x:{a:Nat}.\y:{a:Nat}.x) {a = 0}")
+        abstraction = program.state.term.function
+        self.assertIs(abstraction.arg_type, abstraction.body.arg_type)
+
+
+class TestDeepTerms(TestCase):
+
+    @staticmethod
+    def succ_tower(n):
+        term = TmZero(INFO)
+        for _ in range(n):
+            term = TmSucc(INFO, term)
+        return term
+
+    @staticmethod
+    def identity_applications(n, argument):
+        term = argument
+        for _ in range(n):
+            term = TmApp(INFO, TmAbs(INFO, "u", Unit, TmVar(INFO, 0, 1)), term)
+        return term
+
+    def test_succ_tower(self):
+        self.assertIs(Nat, TypedLambdaTypechecker()._typecheck(self.succ_tower(DEPTH), TypeContext.empty()))
+
+    def test_let_chain(self):
+        term = TmVar(INFO, 0, DEPTH)
+        for i in reversed(range(1, DEPTH)):
+            term = TmLet(INFO, f"x{i}", TmSucc(INFO, TmVar(INFO, 0, i)), term)
+        term = TmLet(INFO, "x0", TmZero(INFO), term)
+        self.assertIs(Nat, TypedLambdaTypechecker()._typecheck(term, TypeContext.empty()))
+
+    def test_nested_applications(self):
+        term = self.identity_applications(DEPTH, TmUnit(INFO))
+        self.assertIs(Unit, TypedLambdaTypechecker()._typecheck(term, TypeContext.empty()))
+
+    def test_deep_error(self):
+        guard = TmIsZero(INFO, self.succ_tower(DEPTH))
+        with self.assertRaises(LambdaTypeError) as error:
+            TypedLambdaTypechecker()._typecheck(self.identity_applications(DEPTH, TmSucc(INFO, guard)),
+                                                TypeContext.empty())
+        self.assertEqual(LambdaTypeErrorType.UnnaturalArg, error.exception.error_type)
+        self.assertIs(guard, error.exception.term.number)
+
+    def test_deep_error_context(self):
+        application = TmApp(INFO, TmVar(INFO, 0, DEPTH), TmTrue(INFO))
+        term = application
+        for i in range(DEPTH):
+            term = TmAbs(INFO, f"x{i}", Nat if i else ArrowType(Nat, Nat), term)
+        with self.assertRaises(LambdaTypeError) as error:
+            TypedLambdaTypechecker()._typecheck(term, TypeContext.empty())
+        self.assertIs(application, error.exception.term)
+        self.assertEqual(DEPTH, len(error.exception.type_context))
+        self.assertEqual(ArrowType(Nat, Nat), error.exception.type_context.type_of(0))
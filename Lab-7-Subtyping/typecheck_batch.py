@@ -0,0 +1,50 @@
+#  Copyright (c) 2021. Created by Mateusz Slazynski for the educational purposes.
+#     Feel free to use/modify this code for any greater good.
+#     It would be nice however if you mentioned me somewhere.
+#     Still, no pressure - have a nice day!
+
+import json
+import os
+import sys
+from itertools import chain
+from typing import Iterator, TextIO
+
+import click
+
+from src.batch import typecheck_batch, Source
+
+
+def read_files(paths: tuple[str, ...]) -> Iterator[Source]:
+    for path in paths:
+        with open(path) as file:
+            yield path, file.read()
+
+
+def read_jsonl(stream: TextIO) -> Iterator[Source]:
+    for lineno, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            yield str(item.get('name', lineno)), item['program']
+        except (ValueError, KeyError, AttributeError) as error:
+            raise click.ClickException(f"line {lineno}: expected an object with a 'program' field ({error})")
+
+
+@click.command()
+@click.argument('files', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option('--jsonl', type=click.File('r'),
+              help='Read the programs from a JSONL file ("-" for stdin) of {"name": ..., "program": ...} objects.')
+@click.option('--workers', type=click.IntRange(min=0), default=os.cpu_count() or 1,
+              help='Number of the worker processes, 0 typechecks in the current process.')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=8,
+              help='Number of the programs sent to a worker at once.')
+def typecheck_files(files: tuple[str, ...], jsonl: TextIO | None, workers: int, chunk_size: int) -> None:
+    """ Typechecks the FILES (and the --jsonl programs), printing a JSON line per program in the input order. """
+    sources = read_jsonl(jsonl) if jsonl is not None else iter(())
+    for result in typecheck_batch(chain(read_files(files), sources), workers, chunk_size):
+        sys.stdout.write(json.dumps(result) + "\n")
+
+
+if __name__ == '__main__':
+    typecheck_files()